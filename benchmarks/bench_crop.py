@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark for --crop-tables (table-region cropping and page pre-screening).
+
+Generates a synthetic estimate with letterheads, footers and photo, recap
+and summary pages (synthetic.py --extras), then extracts it with and without
+crop_tables and compares wall time, pages parsed and characters handed to
+the line parser. Exits non-zero if the two runs produce different items:
+
+    python3 benchmarks/bench_crop.py --items 2000 --format state_farm
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import xactparse  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def run(pdf_path, crop_tables, repeat=1):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        texts = [text for _, text in xactparse.iter_page_texts(pdf_path, crop_tables=crop_tables)]
+        timings.append(time.perf_counter() - start)
+    extract_s = min(timings)
+    start = time.perf_counter()
+    items = list(xactparse._iter_items_from_texts(enumerate(texts, 1)))
+    parse_s = time.perf_counter() - start
+    return {
+        "extract_s": extract_s,
+        "parse_s": parse_s,
+        "pages": sum(1 for text in texts if text is not None),
+        "chars": sum(len(text or "") for text in texts),
+        "lines": sum(text.count("\n") + 1 for text in texts if text),
+    }, items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark xactparse table cropping.")
+    parser.add_argument("--items", type=int, default=2000, help="Line items (default: %(default)s)")
+    parser.add_argument("--format", default="state_farm", choices=synthetic.FORMATS)
+    parser.add_argument("--repeat", type=int, default=3, help="Extraction runs, best is reported")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "xactparse-bench"),
+                        help="Where generated PDFs are kept between runs")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    pdf_path = os.path.join(args.workdir, f"{args.format}-{args.items}-extras.pdf")
+    if not os.path.exists(pdf_path):
+        synthetic.generate_estimate(pdf_path, args.format, args.items, extras=True)
+
+    full, full_items = run(pdf_path, crop_tables=False, repeat=args.repeat)
+    cropped, cropped_items = run(pdf_path, crop_tables=True, repeat=args.repeat)
+    for name, result in (("full", full), ("crop_tables", cropped)):
+        print(f"{name:>12}: extract {result['extract_s']:.2f}s  parse {result['parse_s'] * 1000:6.1f} ms  "
+              f"{result['pages']} pages  {result['lines']:,} lines  {result['chars']:,} chars")
+    print(f"chars processed: {cropped['chars'] / full['chars']:.0%} of full extraction")
+    start = time.perf_counter()
+    page_count, skipped = xactparse._screen_table_pages(pdf_path)
+    print(f"pdfium pre-screen: {(time.perf_counter() - start) * 1000:.0f} ms, "
+          f"{len(skipped)} of {page_count} pages never opened with pdfplumber")
+    if cropped_items != full_items:
+        print(f"MISMATCH: {len(full_items)} items in full extraction, {len(cropped_items)} cropped")
+        return 1
+    print(f"{len(full_items)} items identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
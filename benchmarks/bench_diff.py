@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark and sanity check for diff_estimates() (xactparse diff).
+
+Builds a synthetic original estimate and a "supplement" of it with known
+edits (removed items, added items, changed quantities, reworded
+descriptions), times diff_estimates() on the two and reports how the edits
+were classified. Exits non-zero if any untouched line isn't "unchanged":
+
+    python3 benchmarks/bench_diff.py --items 2000
+"""
+import argparse
+import decimal
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import xactparse  # noqa: E402
+import synthetic  # noqa: E402
+
+QUALIFIERS = ["", " - High grade", " - Standard grade", " - Premium grade", " - per LF",
+              " - bid item", " - after hours", " - 2nd floor"]
+
+# Rewordings a supplement typically makes to an otherwise unchanged line
+REWORDINGS = [("Detach & reset", "Detach and reset"), (" - ", " "), ("coat", "coats"),
+              ("Remove", "Tear out"), ("&", "and")]
+
+
+def random_item(rng, number):
+    description = rng.choice(synthetic.DESCRIPTIONS) + rng.choice(QUALIFIERS)
+    quantity = decimal.Decimal(rng.randint(100, 50000)) / 100
+    price = rng.randint(50, 150000)
+    rcv = int(quantity * price)
+    deprec = rng.choice([0, rng.randint(0, rcv)])
+    return xactparse.LineItem(number, description, xactparse.assign_trade(description), quantity,
+                              rng.choice(synthetic.UNITS), price, 0, 0, rcv, deprec, rcv - deprec)
+
+
+def reword(rng, description):
+    for old, new in rng.sample(REWORDINGS, len(REWORDINGS)):
+        if old in description:
+            return description.replace(old, new, 1)
+    return description + " (revised)"
+
+
+def make_pair(count, seed=0, edit_rate=0.05):
+    """Return (original, revised, expected) where expected counts each edit kind."""
+    rng = random.Random(seed)
+    original = [random_item(rng, number) for number in range(1, count + 1)]
+    revised = []
+    expected = {"added": 0, "removed": 0, "changed": 0, "unchanged": 0}
+    for item in original:
+        roll = rng.random()
+        if roll < edit_rate:
+            expected["removed"] += 1
+            continue
+        if roll < edit_rate * 3:
+            quantity = item.quantity + 1
+            rcv = int(quantity * item.unit_price)
+            item = item._replace(quantity=quantity, rcv=rcv, acv=rcv - item.deprec)
+            expected["changed"] += 1
+        elif roll < edit_rate * 4:
+            item = item._replace(description=reword(rng, item.description))
+            expected["changed"] += 1
+        else:
+            expected["unchanged"] += 1
+        revised.append(item)
+        if rng.random() < edit_rate:
+            revised.append(random_item(rng, 0))
+            expected["added"] += 1
+    revised = [item._replace(line_number=number) for number, item in enumerate(revised, 1)]
+    return original, revised, expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark xactparse.diff_estimates().")
+    parser.add_argument("--items", type=int, default=2000, help="Items per estimate (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    original, revised, expected = make_pair(args.items, seed=args.seed)
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        diffs = xactparse.diff_estimates(original, revised)
+        timings.append(time.perf_counter() - start)
+    summary = xactparse.diff_summary(diffs)
+    try:
+        import rapidfuzz  # noqa: F401
+        backend = "rapidfuzz"
+    except ImportError:
+        backend = "difflib"
+
+    print(f"{len(original)} vs {len(revised)} items ({backend}): best {min(timings) * 1000:.1f} ms")
+    # An added item that resembles a removed one in the same trade/unit is
+    # (correctly) reported as a change, so added/removed can come in under
+    # the number of edits made; untouched lines must all be unchanged.
+    for status in xactparse.DIFF_STATUSES:
+        print(f"  {status:>9}: {summary[status]:5d} (edits made: {expected[status]})")
+    return 0 if summary["unchanged"] == expected["unchanged"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
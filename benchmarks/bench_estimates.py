@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark over synthetic estimates.
+
+For each layout and size, generates a synthetic text-layer PDF (cached in
+--workdir) and times each stage separately:
+
+  text_extraction   pdfplumber page.extract_text() over every page
+  line_matching     combining lines and matching the item patterns
+  trade_assignment  assign_trades() over every description, cold cache
+  excel_writing     save_to_excel_with_budget()
+
+then runs the whole pipeline again under tracemalloc for peak memory.
+Results are written as JSON so runs can be compared between versions:
+
+    python3 benchmarks/bench_estimates.py --sizes 10 1000 --output bench.json
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pdfplumber  # noqa: E402
+
+import xactparse  # noqa: E402
+import synthetic  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 50000]
+
+
+def _no_trade(description):
+    return "Other"
+
+
+def run_case(pdf_path, excel_path, measure_memory=True):
+    result = {}
+
+    start = time.perf_counter()
+    texts = [text for _, text in xactparse.iter_page_texts(pdf_path)]
+    result["text_extraction_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stats = {}
+    items = list(xactparse._iter_items_from_texts(enumerate(texts, 1), stats, classify=_no_trade))
+    result["line_matching_s"] = time.perf_counter() - start
+
+    xactparse._classify_normalized.cache_clear()
+    start = time.perf_counter()
+    trades = xactparse.assign_trades([item.description for item in items])
+    result["trade_assignment_s"] = time.perf_counter() - start
+    items = [item._replace(trade=trade) for item, trade in zip(items, trades)]
+
+    start = time.perf_counter()
+    xactparse.save_to_excel_with_budget([xactparse.HEADERS] + items, excel_path, quiet=True)
+    result["excel_writing_s"] = time.perf_counter() - start
+
+    result["total_s"] = sum(result.values())
+    result.update(pages=stats["pages"], items=stats["items"], no_match=stats["no_match"],
+                  detected_format=stats["format"], text_chars=sum(len(text or "") for text in texts))
+    result["items_per_s"] = result["items"] / result["total_s"] if result["total_s"] else 0.0
+
+    if measure_memory:
+        xactparse._classify_normalized.cache_clear()
+        tracemalloc.start()
+        data = xactparse.extract_xactimate_items(pdf_path)
+        xactparse.save_to_excel_with_budget(data, excel_path, quiet=True)
+        result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark xactparse on synthetic estimates.")
+    parser.add_argument("--formats", nargs="+", default=synthetic.FORMATS, choices=synthetic.FORMATS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES,
+                        help="Line items per estimate (default: %(default)s)")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "xactparse-bench"),
+                        help="Where generated PDFs are kept between runs")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--output", help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    os.makedirs(args.workdir, exist_ok=True)
+    report = {
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "parser_version": xactparse.PARSER_VERSION,
+        "python": platform.python_version(),
+        "pdfplumber": pdfplumber.__version__,
+        "cases": [],
+    }
+    for fmt in args.formats:
+        for size in args.sizes:
+            pdf_path = os.path.join(args.workdir, f"{fmt}-{size}.pdf")
+            if not os.path.exists(pdf_path):
+                synthetic.generate_estimate(pdf_path, fmt, size)
+            excel_path = os.path.join(args.workdir, f"{fmt}-{size}.xlsx")
+            case = {"format": fmt, "size": size}
+            case.update(run_case(pdf_path, excel_path, measure_memory=not args.no_memory))
+            report["cases"].append(case)
+            print(f"{fmt:>15} {size:>6} items: {case['total_s']:8.3f}s "
+                  f"({case['items_per_s']:,.0f} items/s)", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
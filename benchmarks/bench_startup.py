@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the xactparse CLI.
+
+Every case runs in a fresh interpreter, so the numbers include interpreter
+start-up and imports, which dominate for small estimates:
+
+  import          python -c "import xactparse"
+  help            xactparse.py --help
+  summary         xactparse.py summary on a small estimate, no cache
+  summary_cached  xactparse.py summary on the same estimate, warm parse cache
+  excel           xactparse.py estimate.pdf out.xlsx, no cache
+
+For each case the median and best wall time over --repeat runs are reported,
+along with which heavy modules (pdfplumber, openpyxl, pandas) it imported:
+
+    python3 benchmarks/bench_startup.py --repeat 20 --output startup.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(BENCH_DIR, "..", "xactparse.py")
+sys.path.insert(0, BENCH_DIR)
+
+import synthetic  # noqa: E402
+
+HEAVY_MODULES = ["pdfplumber", "openpyxl", "pandas"]
+
+
+def cases(pdf_path, excel_path):
+    return {
+        "import": ["-c", "import xactparse"],
+        "help": [SCRIPT, "--help"],
+        "summary": [SCRIPT, "summary", pdf_path, "--no-cache"],
+        "summary_cached": [SCRIPT, "summary", pdf_path],
+        "excel": [SCRIPT, pdf_path, excel_path, "--no-cache"],
+    }
+
+
+def run_once(args, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def heavy_imports(args, env):
+    """Top-level heavy modules the command imports, from -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime"] + args, env=env, check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    loaded = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:"):
+            loaded.add(line.rsplit("|", 1)[-1].strip().split(".")[0])
+    return [name for name in HEAVY_MODULES if name in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark xactparse cold-start time.")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per case (default: %(default)s)")
+    parser.add_argument("--items", type=int, default=50,
+                        help="Line items in the sample estimate (default: %(default)s)")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "xactparse-bench"),
+                        help="Where generated PDFs are kept between runs")
+    parser.add_argument("--output", help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    pdf_path = os.path.join(args.workdir, f"state_farm-{args.items}.pdf")
+    if not os.path.exists(pdf_path):
+        synthetic.generate_estimate(pdf_path, "state_farm", args.items)
+    excel_path = os.path.join(args.workdir, f"startup-{args.items}.xlsx")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, XACTPARSE_CACHE_DIR=cache_dir)
+        report = {
+            "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "items": args.items,
+            "cases": [],
+        }
+        for name, case_args in cases(pdf_path, excel_path).items():
+            if name == "summary_cached":
+                run_once(case_args, env)  # warm the cache
+            times = [run_once(case_args, env) for _ in range(args.repeat)]
+            case = {
+                "case": name,
+                "median_s": statistics.median(times),
+                "best_s": min(times),
+                "heavy_imports": heavy_imports(case_args, env),
+            }
+            report["cases"].append(case)
+            print(f"{name:>15}: {case['median_s'] * 1000:7.1f} ms median, "
+                  f"{case['best_s'] * 1000:7.1f} ms best  imports: {', '.join(case['heavy_imports']) or '-'}",
+                  file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
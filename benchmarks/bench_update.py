@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark and sanity check for --update (update_excel_workbook()).
+
+Writes a workbook for a synthetic estimate, adds a NOTES column to Master
+(as a user would), then revises the estimate by changing a few quantities
+and times an in-place update against regenerating the workbook. Exits
+non-zero if the updated workbook's generated cells differ from the
+regenerated one or a note didn't follow its item:
+
+    python3 benchmarks/bench_update.py --items 20000 --edits 5
+    python3 benchmarks/bench_update.py --items 20000 --renumber   # a line removed, the rest renumbered
+"""
+import argparse
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import xactparse  # noqa: E402
+from bench_diff import random_item  # noqa: E402
+
+
+def revise(items, rng, edits, renumber):
+    revised = list(items)
+    for idx in rng.sample(range(len(revised)), edits):
+        item = revised[idx]
+        quantity = item.quantity + 1
+        rcv = int(quantity * item.unit_price)
+        revised[idx] = item._replace(quantity=quantity, rcv=rcv, acv=rcv - item.deprec)
+    if renumber:
+        del revised[len(revised) // 10]
+        revised = [item._replace(line_number=number) for number, item in enumerate(revised, 1)]
+    return revised
+
+
+def add_notes(path, every):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path)
+    ws = wb["Master"]
+    ws.cell(row=1, column=len(xactparse.HEADERS) + 1, value="NOTES")
+    notes = {}
+    for row in range(2, ws.max_row + 1, every):
+        description = ws.cell(row=row, column=1).value.partition(". ")[2]
+        notes[description] = f"checked {description}"
+        ws.cell(row=row, column=len(xactparse.HEADERS) + 1, value=notes[description])
+    wb.save(path)
+    return notes
+
+
+def sheet_values(path):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    values = {ws.title: [row for row in ws.iter_rows(values_only=True)] for ws in wb.worksheets}
+    wb.close()
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark xactparse --update against a full rewrite.")
+    parser.add_argument("--items", type=int, default=20000, help="Line items (default: %(default)s)")
+    parser.add_argument("--edits", type=int, default=5, help="Quantities changed in the revision")
+    parser.add_argument("--renumber", action="store_true",
+                        help="Also remove a line so every later line is renumbered")
+    parser.add_argument("--notes-every", type=int, default=50, metavar="N",
+                        help="Note every Nth Master row (0: no NOTES column)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    # Unique descriptions, so each note can be checked against its item
+    items = [random_item(rng, number)._replace(page=number // 40 + 1) for number in range(1, args.items + 1)]
+    items = [item._replace(description=f"{item.description} #{item.line_number}") for item in items]
+    revised = [xactparse.HEADERS] + revise(items, rng, args.edits, args.renumber)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        original = os.path.join(workdir, "original.xlsx")
+        updated = os.path.join(workdir, "updated.xlsx")
+        rewritten = os.path.join(workdir, "rewritten.xlsx")
+        xactparse.save_to_excel_with_budget([xactparse.HEADERS] + items, original, quiet=True)
+        notes = add_notes(original, args.notes_every) if args.notes_every else {}
+        shutil.copy(original, updated)
+
+        metrics = xactparse.ParseMetrics()
+        start = time.perf_counter()
+        xactparse.update_excel_workbook(revised, updated, quiet=True, metrics=metrics)
+        update_s = time.perf_counter() - start
+        start = time.perf_counter()
+        xactparse.save_to_excel_with_budget(revised, rewritten, quiet=True)
+        rewrite_s = time.perf_counter() - start
+
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in metrics.stages.items())
+        print(f"{args.items} items, {args.edits} edits{', renumbered' if args.renumber else ''}, "
+              f"{len(notes)} notes")
+        print(f"  full rewrite: {rewrite_s:6.2f}s")
+        print(f"        update: {update_s:6.2f}s ({update_s / rewrite_s:.0%}; {stages})")
+
+        got, expected = sheet_values(updated), sheet_values(rewritten)
+        width = {name: len(rows[0]) for name, rows in expected.items()}
+        mismatched = [name for name in expected
+                      if [row[:width[name]] for row in got.get(name, [])] != expected[name]]
+        misplaced = sum(1 for row in got["Master"][1:] if len(row) > width["Master"] and row[-1] is not None
+                        and row[-1] != notes.get(row[0].partition(". ")[2]))
+        kept = sum(1 for row in got["Master"][1:] if len(row) > width["Master"] and row[-1] is not None)
+    # Notes on lines the revision removed go with them
+    remaining = {item.description for item in revised[1:]}
+    expected_notes = sum(1 for description in notes if description in remaining)
+    print(f"  {len(expected) - len(mismatched)}/{len(expected)} sheets identical to the rewrite, "
+          f"{kept}/{expected_notes} notes kept, {misplaced} on the wrong item")
+    return 1 if mismatched or misplaced or kept != expected_notes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the line-item warehouse (xactparse ingest / query).
+
+Fills a fresh warehouse with synthetic estimates through Warehouse.add()
+(the same inserts `xactparse ingest` makes, without the PDF parsing), then
+times every canned query:
+
+    python3 benchmarks/bench_warehouse.py --estimates 2000 --items 250
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import xactparse  # noqa: E402
+from bench_diff import random_item  # noqa: E402
+
+CARRIERS = ["Allstate", "State Farm", "Travelers", "Liberty Mutual", "AmFam"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the xactparse line-item warehouse.")
+    parser.add_argument("--estimates", type=int, default=2000, help="Estimates (default: %(default)s)")
+    parser.add_argument("--items", type=int, default=250, help="Items per estimate (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        warehouse = xactparse.Warehouse(os.path.join(workdir, "warehouse.sqlite"))
+        start = time.perf_counter()
+        for number in range(args.estimates):
+            items = [random_item(rng, line)._replace(page=line // 40 + 1)
+                     for line in range(1, args.items + 1)]
+            stats = {"pages": args.items // 40 + 1, "items": len(items), "no_match": 0, "format": "simple"}
+            created = f"20{rng.randint(20, 25)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            warehouse.add(f"estimate-{number}.pdf", f"{number:064x}", items, stats,
+                          carrier=rng.choice(CARRIERS), created=created)
+        elapsed = time.perf_counter() - start
+        total = args.estimates * args.items
+        size = os.path.getsize(warehouse.path) / 1e6
+        print(f"ingested {args.estimates} estimates, {total:,} items in {elapsed:.1f}s "
+              f"({total / elapsed:,.0f} items/s), {size:.0f} MB")
+
+        for name in xactparse.WAREHOUSE_QUERIES:
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                _, rows = warehouse.query(name, description="R&R Vinyl window")
+                timings.append(time.perf_counter() - start)
+            print(f"{name:>12}: {min(timings) * 1000:8.1f} ms best, {len(rows)} rows")
+        warehouse.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
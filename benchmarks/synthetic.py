@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Synthetic Xactimate-style estimates with a real text layer.
+
+Writes minimal PDFs by hand (Helvetica, one text line per row), so no PDF
+library is needed. Every layout the parser supports can be generated at any
+size:
+
+    python3 benchmarks/synthetic.py state_farm 5000 /tmp/sf-5000.pdf
+"""
+import argparse
+import random
+import sys
+
+FORMATS = ["with_age_life", "state_farm", "tax_no_op", "no_tax_op", "simple", "angle_brackets"]
+
+DESCRIPTIONS = [
+    "Remove Laminated - comp. shingle rfg. - w/out felt",
+    "Laminated - comp. shingle rfg. - w/out felt",
+    "R&R Vinyl window - double hung, 9-12 sf",
+    "Paint trim - one coat",
+    "Paint door slab only - 2 coats (per side)",
+    "Drywall patch / small repair, ready for paint",
+    "Tape joint for new to existing drywall - per LF",
+    "Seal/prime then paint the walls and ceiling (2 coats)",
+    "Baseboard - 3 1/4\"",
+    "Carpet pad",
+    "Tandem axle dump trailer - per load - including dump fees",
+    "Final cleaning - construction - Residential",
+    "Detach & Reset Toilet",
+    "Vanity - Detach & reset",
+    "Clean floor and prep for tile",
+    "Content Manipulation charge - per hour",
+    "Batt insulation - 6\" - R19 - unfaced batt",
+    "Floor protection - self-adhesive plastic film",
+    "Water extraction from carpeted floor",
+    "Light fixture - Detach & reset",
+]
+
+UNITS = ["SF", "LF", "EA", "SQ", "HR", "SY"]
+
+ROOMS = ["Kitchen", "Living Room", "Bedroom 2", "Hallway", "Roof", "Bathroom"]
+
+COLUMN_HEADER = "DESCRIPTION QUANTITY UNIT PRICE TAX O&P RCV AGE/LIFE COND. DEP % DEPREC. ACV"
+
+
+def money(cents):
+    return f"{cents / 100:,.2f}"
+
+
+def item_lines(fmt, number, rng):
+    """Text lines for one line item in the given layout."""
+    description = rng.choice(DESCRIPTIONS)
+    unit = rng.choice(UNITS)
+    quantity = rng.randint(100, 50000) / 100
+    price = rng.randint(50, 150000)
+    tax = rng.randint(0, 5000) if fmt not in ("no_tax_op",) else 0
+    o_p = rng.randint(0, 20000) if fmt not in ("no_tax_op", "tax_no_op") else 0
+    rcv = round(quantity * price) + tax + o_p
+    deprec = rng.choice([0, 0, rng.randint(0, rcv)])
+    acv = rcv - deprec
+    age_life = f"{rng.randint(0, 20)}/{rng.choice(['NA', '15', '25', '30'])}"
+    condition = f"{rng.choice([0, 10, 20, 26.67, 40])}%"
+    qty = f"{quantity:,.2f}"
+
+    if fmt == "with_age_life":
+        return [f"{number}. {description} {qty}{unit} {money(price)} {money(tax)} {money(o_p)} {money(rcv)} "
+                f"{age_life} Avg. {condition} ({money(deprec)}) {money(acv)}"]
+    if fmt == "state_farm":
+        return [f"{number}. {description} {qty}{unit} {money(price)} {money(tax)} {money(o_p)} {money(rcv)} "
+                f"{age_life} yrs ({money(deprec)}) {money(acv)}",
+                f"Avg. {condition}"]
+    if fmt == "tax_no_op":
+        return [f"{number}. {description}",
+                f"{qty}{unit} {money(price)} {money(tax)} {money(rcv)} {age_life} Avg. NA ({money(deprec)}) {money(acv)}"]
+    if fmt == "no_tax_op":
+        return [f"{number}. {description} {qty}{unit} {money(price)} {money(rcv)} "
+                f"{age_life} yrs Avg. {condition} ({money(deprec)}) {money(acv)}"]
+    if fmt == "simple":
+        return [f"{number}. {description} {qty}{unit} {money(price)} {money(tax)} {money(o_p)} {money(rcv)} "
+                f"({money(deprec)}) {money(acv)}"]
+    if fmt == "angle_brackets":
+        return [f"{number}. {description} {qty} {unit} {money(price)} {money(tax)} {money(o_p)} {money(rcv)} "
+                f"<{money(deprec)}> {money(acv)}"]
+    raise ValueError(f"Unknown format: {fmt}")
+
+
+LETTERHEAD = ["Synthetic Insurance Company", "1 Example Plaza, Springfield, IL 62701",
+              "Insured: Jane Sample    Claim Number: 000-SYNTH-0001    Policy Number: SYN-0000001",
+              "Type of Loss: Wind    Date of Loss: 3/14/2026    Price List: ILSP8X_MAR26"]
+
+
+def extra_pages(item_count, rng, photos=4):
+    """Photo sheets and the recap / summary pages that follow the line items."""
+    pages = []
+    for number in range(1, photos + 1):
+        pages.append(LETTERHEAD + [""] + [
+            line for photo in range(2 * number - 1, 2 * number + 1) for line in (
+                f"{photo} {rng.choice(ROOMS)} - {rng.choice(['overview', 'damage', 'detail'])}",
+                f"Date Taken: 3/{rng.randint(15, 28)}/2026", "Taken By: Adjuster",
+                "Water staining and damaged materials, see line items for repairs.", "")])
+    recap = LETTERHEAD + ["", "Recap by Room", "", "Estimate: SYNTHETIC"]
+    for room in ROOMS:
+        recap.append(f"{room} {money(rng.randint(10000, 9000000))} {rng.randint(1, 40)}.00%")
+    recap += ["Subtotal of Areas " + money(rng.randint(10000000, 90000000)), "",
+              "Recap by Category", ""]
+    for category in ["DRYWALL", "PAINTING", "ROOFING", "GENERAL DEMOLITION", "FLOOR COVERING"]:
+        recap.append(f"{category} {money(rng.randint(10000, 9000000))} {rng.randint(1, 40)}.00%")
+    summary = LETTERHEAD + ["", "Summary for Dwelling", "",
+                            f"Line Item Total {money(rng.randint(10000000, 90000000))}",
+                            f"Material Sales Tax {money(rng.randint(10000, 900000))}",
+                            f"Replacement Cost Value {money(rng.randint(10000000, 90000000))}",
+                            f"Less Depreciation ({money(rng.randint(10000, 9000000))})",
+                            f"Actual Cash Value {money(rng.randint(10000000, 90000000))}",
+                            f"Less Deductible ({money(100000)})", "",
+                            f"{item_count} line items. Payments are subject to the policy terms."]
+    return pages + [recap, summary]
+
+
+def estimate_pages(fmt, item_count, seed=0, lines_per_page=70, extras=False):
+    """
+    Lay out a cover page and item pages (column header on every page).
+
+    With ``extras`` every page also gets a letterhead and a footer, and photo,
+    recap and summary pages follow the items, as in a real estimate.
+    """
+    rng = random.Random(seed)
+    pages = [["INSURED: Jane Sample", "Claim Number: 000-SYNTH-0001",
+              f"Synthetic {fmt} estimate, {item_count} line items", "", "Type of Loss: Wind"]]
+    heading = (LETTERHEAD + [""] if extras else []) + [COLUMN_HEADER]
+    page = list(heading)
+    for number in range(1, item_count + 1):
+        lines = item_lines(fmt, number, rng)
+        if number % 40 == 1:
+            lines = ["", rng.choice(ROOMS)] + lines
+        if len(page) + len(lines) > lines_per_page:
+            pages.append(page)
+            page = list(heading)
+        page.extend(lines)
+    pages.append(page)
+    if extras:
+        pages += extra_pages(item_count, rng)
+        pages = [lines + ["", f"SYNTHETIC 3/30/2026 Page: {number}"]
+                 for number, lines in enumerate(pages, 1)]
+    return pages
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    """Write ``pages`` (lists of text lines) as a PDF with a text layer."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for lines in pages:
+        body = "BT /F1 7 Tf 9 TL 20 770 Td " + " ".join(f"({_escape(line)}) Tj T*" for line in lines) + " ET"
+        data = body.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate_estimate(path, fmt, item_count, seed=0, extras=False):
+    pages = estimate_pages(fmt, item_count, seed=seed, extras=extras)
+    write_pdf(path, pages)
+    return len(pages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Xactimate estimate PDF.")
+    parser.add_argument("format", choices=FORMATS)
+    parser.add_argument("items", type=int)
+    parser.add_argument("output")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--extras", action="store_true",
+                        help="Add letterheads, footers and photo/recap/summary pages")
+    args = parser.parse_args()
+    pages = generate_estimate(args.output, args.format, args.items, seed=args.seed, extras=args.extras)
+    print(f"Wrote {args.output}: {args.items} items on {pages} pages")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,36 @@
+"""
+Tests for AsyncEstimateParser on a thread pool with a shared parse cache.
+
+    python3 -m pytest tests
+"""
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+
+import xactparse  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def test_thread_pool_jobs_share_the_cache(tmp_path):
+    pdfs = []
+    for idx, fmt in enumerate(["state_farm", "simple", "tax_no_op", "angle_brackets", "state_farm"]):
+        pdf = str(tmp_path / f"{idx}.pdf")
+        synthetic.generate_estimate(pdf, fmt, 60, seed=idx)
+        pdfs.append(pdf)
+    cache = xactparse.ParseCache(str(tmp_path / "cache.sqlite"))
+
+    async def parse_all():
+        with ThreadPoolExecutor(4) as executor:
+            parser = xactparse.AsyncEstimateParser(executor=executor, cache=cache)
+            first = await asyncio.gather(*(parser.parse(pdf) for pdf in pdfs))
+            again = await asyncio.gather(*(parser.parse(pdf) for pdf in pdfs))
+        return first, again
+
+    first, again = asyncio.run(parse_all())
+    assert [len(result.items) for result in first] == [60] * len(pdfs)
+    assert [result.items for result in again] == [result.items for result in first]
+    assert all(cache.get_items(xactparse.pdf_sha256(pdf)) is not None for pdf in pdfs)
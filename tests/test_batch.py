@@ -0,0 +1,58 @@
+"""
+Tests for the batch pool (run_pool_jobs(), run_batch()) when a worker dies.
+
+    python3 -m pytest tests
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import xactparse  # noqa: E402
+
+
+def square_or_crash(number):
+    """Square ``number``, or kill the worker process outright for 5."""
+    time.sleep(0.05)
+    if number == 5:
+        os._exit(1)
+    return number * number
+
+
+def fake_process_estimate(pdf_path, excel_path, *args):
+    if os.path.basename(pdf_path) == "crash.pdf":
+        os._exit(1)
+    time.sleep(0.05)
+    return xactparse._manifest_row(pdf_path, excel_path)
+
+
+def test_only_the_job_that_kills_its_worker_fails():
+    jobs = [(number, (number,)) for number in range(12)]
+    results = {key: (result, error) for key, result, error in
+               xactparse.run_pool_jobs(square_or_crash, jobs, workers=2)}
+
+    assert sorted(results) == list(range(12))
+    failed = {key for key, (_, error) in results.items() if error is not None}
+    assert failed == {5}
+    assert type(results[5][1]).__name__ == "BrokenProcessPool"
+    assert all(results[key][0] == key * key for key in results if key != 5)
+
+
+def test_batch_survives_a_crashed_worker(tmp_path, monkeypatch):
+    names = ["a.pdf", "b.pdf", "crash.pdf", "d.pdf", "e.pdf", "f.pdf", "g.pdf", "h.pdf"]
+    pdfs = []
+    for name in names:
+        path = tmp_path / "in" / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b"%PDF-1.4\n")
+        pdfs.append(str(path))
+    monkeypatch.setattr(xactparse, "process_estimate", fake_process_estimate)
+
+    rows = xactparse.run_batch(pdfs, str(tmp_path / "out"), workers=2)
+
+    assert [row["pdf"] for row in rows] == pdfs
+    statuses = {os.path.basename(row["pdf"]): row["status"] for row in rows}
+    assert statuses == {name: "error" if name == "crash.pdf" else "ok" for name in names}
+    assert "BrokenProcessPool" in rows[2]["error"]
+    assert os.path.exists(tmp_path / "out" / "manifest.csv")
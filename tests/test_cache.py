@@ -0,0 +1,54 @@
+"""
+Tests for the parse cache keys (parser_fingerprint(), _cache_variant()).
+
+    python3 -m pytest tests
+"""
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+
+import xactparse  # noqa: E402
+import synthetic  # noqa: E402
+
+
+@pytest.mark.parametrize("name", ["SKIP_LINE_REGEX", "DIMENSION_HEADER_REGEX"])
+def test_skip_patterns_change_the_fingerprint(monkeypatch, name):
+    before = xactparse.parser_fingerprint()
+    monkeypatch.setattr(xactparse, name, re.compile(getattr(xactparse, name).pattern + "|xyzzy"))
+    assert xactparse.parser_fingerprint() != before
+
+
+@pytest.mark.parametrize("name", ["TABLE_HEADER_REGEX", "TABLE_ROW_REGEX"])
+def test_crop_patterns_change_the_tables_variant(monkeypatch, name):
+    before = xactparse._cache_variant(crop_tables=True)
+    monkeypatch.setattr(xactparse, name, re.compile(getattr(xactparse, name).pattern + "|xyzzy"))
+    assert xactparse._cache_variant(crop_tables=True) != before
+    assert xactparse._cache_variant() == ""
+
+
+def test_streamed_cache_miss_yields_before_the_last_page(tmp_path):
+    pdf = str(tmp_path / "estimate.pdf")
+    synthetic.generate_estimate(pdf, "state_farm", 300)
+    full_stats = {}
+    expected = xactparse.extract_xactimate_items(pdf, stats=full_stats)[1:]
+    cache = xactparse.ParseCache(str(tmp_path / "cache.sqlite"))
+
+    stats = {}
+    items = xactparse.iter_estimate_items(pdf, stats=stats, cache=cache)
+    first = next(items)
+    assert stats["pages"] < full_stats["pages"]
+    assert [first] + list(items) == expected
+    assert stats == full_stats
+
+    metrics = xactparse.ParseMetrics()
+    cached_stats = {}
+    assert list(xactparse.iter_estimate_items(pdf, stats=cached_stats, cache=cache, metrics=metrics)) == expected
+    assert metrics.counters["cache_hits"] == 1
+    assert cached_stats == stats
+    pdf_hash = xactparse.pdf_sha256(pdf)
+    assert len(cache.get_page_texts(pdf_hash)) == stats["pages"]
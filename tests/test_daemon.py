@@ -0,0 +1,56 @@
+"""
+Tests for the parse daemon (ParseServer) when a worker process dies.
+
+    python3 -m pytest tests
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import xactparse  # noqa: E402
+
+
+def fake_parse_job(pdf_path, excel_path=None, cache=None, ocr=None):
+    if os.path.basename(pdf_path) == "crash.pdf":
+        time.sleep(0.2)
+        os._exit(1)
+    time.sleep(0.5 if os.path.basename(pdf_path) == "slow.pdf" else 0.01)
+    return {"status": "ok", "pdf": pdf_path, "pid": os.getpid()}
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    monkeypatch.setattr(xactparse, "run_parse_job", fake_parse_job)
+    socket_path = str(tmp_path / "xactparse.sock")
+    server = xactparse.ParseServer(socket_path, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield socket_path
+    server.shutdown()
+    server.server_close()
+
+
+def parse(socket_path, path):
+    path.write_bytes(b"%PDF-1.4\n")
+    return xactparse.send_request({"command": "parse", "pdf": str(path)}, socket_path, timeout=30)
+
+
+def test_pool_is_replaced_after_a_crash(tmp_path, daemon):
+    statuses = [parse(daemon, tmp_path / name)["status"]
+                for name in ["f1.pdf", "crash.pdf", "f2.pdf", "f3.pdf", "f4.pdf"]]
+    assert statuses == ["ok", "crashed", "ok", "ok", "ok"]
+
+
+def test_jobs_in_flight_with_a_crash_still_succeed(tmp_path, daemon):
+    with ThreadPoolExecutor(2) as clients:
+        slow = clients.submit(parse, daemon, tmp_path / "slow.pdf")
+        time.sleep(0.05)
+        crash = clients.submit(parse, daemon, tmp_path / "crash.pdf")
+        assert crash.result()["status"] == "crashed"
+        assert slow.result()["status"] == "ok"
@@ -0,0 +1,242 @@
+"""
+Equivalence tests for the line-item and trade matchers.
+
+match_line_item() replaced six regexes with a lazy "(.+?)" description, and
+TradeMatcher replaced an any(keyword in description) scan per trade. Both
+originals are kept here as the reference: the sample lines and a seeded
+fuzz of random lines (near misses included) must give the same results, so
+editing LINE_LAYOUTS, LINE_TOKENS or TRADE_KEYWORDS can't silently change
+the output. benchmarks/bench_matcher.py times the two against each other.
+
+    python3 -m pytest tests
+"""
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import xactparse  # noqa: E402
+
+# Pattern 1: Full format with AGE/LIFE and CONDITION
+# Format: NUMBER. DESCRIPTION QTY+UNIT UNIT_PRICE TAX O&P RCV AGE/LIFE [yrs] Text COND% (DEPREC) ACV
+# Example: 1. Remove... 13.49SQ 7.27 0.00 9.80 107.87 9/NA Avg. 0% (0.00) 107.87
+PATTERN_WITH_AGE_LIFE = re.compile(
+    r"^(\d+\.)\s+"  # Line number with period
+    r"(.+?)\s+"  # Description (non-greedy, allow special chars)
+    r"([\d,.]+)([A-Z]{2,4})\s+"  # Quantity+unit combined (no space): 13.49SQ
+    r"([\d,.]+)\s+"  # Unit price
+    r"([\d,.]+)\s+"  # Tax
+    r"([\d,.]+)\s+"  # O&P
+    r"([\d,.]+)\s+"  # RCV
+    r"[\d/NA]+\s+"  # AGE/LIFE (e.g., "9/30" or "9/NA" or "0/30")
+    r"(?:yrs?\s+)?"  # Optional "yrs" or "yr"
+    r"[A-Za-z.]+\s+"  # Text like "Avg."
+    r"\d+(?:\.\d+)?%\s+"  # CONDITION percentage (e.g., "30%" or "25.71%")
+    r"(?:\[M\]\s+)?"  # Optional depreciation marker [M]
+    r"\(([\d,.]+)\)\s+"  # Depreciation in parentheses
+    r"([\d,.]+)"  # ACV
+    r"(?:\s|$)"  # End with whitespace or end of line
+)
+
+# Pattern 6: State Farm 3-line format (CONDITION on separate line AFTER deprec/ACV)
+# Format: NUMBER. DESCRIPTION QTY+UNIT UNIT_PRICE TAX O&P RCV AGE/LIFE [yrs] (DEPREC) ACV
+# Next line: Text COND%
+# Example: 2. Laminated... 19.67SQ 433.28 310.68 1,766.66 10,599.96 8/30 yrs (2,826.65) 7,773.31
+#          Avg. 26.67%
+PATTERN_STATE_FARM = re.compile(
+    r"^(\d+\.)\s+"  # Line number with period
+    r"(.+?)\s+"  # Description (non-greedy, allow special chars)
+    r"([\d,.]+)([A-Z]{2,4})\s+"  # Quantity+unit combined (no space): 19.67SQ
+    r"([\d,.]+)\s+"  # Unit price
+    r"([\d,.]+)\s+"  # Tax
+    r"([\d,.]+)\s+"  # O&P
+    r"([\d,.]+)\s+"  # RCV
+    r"[\d/NA]+\s+"  # AGE/LIFE (e.g., "8/30")
+    r"(?:yrs?\s+)?"  # Optional "yrs" or "yr"
+    r"\(([\d,.]+)\)\s+"  # Depreciation in parentheses (NO CONDITION before this!)
+    r"([\d,.]+)"  # ACV
+    r"(?:\s|$)"  # End with whitespace or end of line
+)
+
+# Pattern 2: Simple format without AGE/LIFE columns
+# Format: NUMBER. DESCRIPTION QTY+UNIT UNIT_PRICE TAX O&P RCV (DEPREC) ACV
+# Example: 52. R&R Vinyl window... 3.00EA 895.87 195.90 288.36 3,171.87 (951.56) 2,220.31
+PATTERN_SIMPLE = re.compile(
+    r"^(\d+\.)\s+"  # Line number with period
+    r"(.+?)\s+"  # Description (non-greedy, allow special chars)
+    r"([\d,.]+)([A-Z]{2,4})\s+"  # Quantity+unit combined (no space)
+    r"([\d,.]+)\s+"  # Unit price
+    r"([\d,.]+)\s+"  # Tax
+    r"([\d,.]+)\s+"  # O&P
+    r"([\d,.]+)\s+"  # RCV
+    r"[\(<]([\d,.]+)[\)>]\s+"  # Depreciation (parentheses or angle brackets)
+    r"([\d,.]+)"  # ACV
+    r"(?:\s|$)"  # End with whitespace or end of line
+)
+
+# Pattern 3: Alternative format with angle brackets for depreciation
+# Format: NUMBER. DESCRIPTION QTY UNIT UNIT_PRICE TAX O&P RCV <DEPREC> ACV
+PATTERN_ANGLE_BRACKETS = re.compile(
+    r"^(\d+\.)\s+"  # Line number with period
+    r"(.+?)\s+"  # Description (non-greedy)
+    r"([\d,.]+)\s+"  # Quantity
+    r"([A-Z]{2,4})\s+"  # Unit (separate from quantity)
+    r"([\d,.]+)\s+"  # Unit price
+    r"([\d,.]+)\s+"  # Tax
+    r"([\d,.]+)\s+"  # O&P
+    r"([\d,.]+)\s+"  # RCV
+    r"<([\d,.]+)>\s+"  # Depreciation in angle brackets
+    r"([\d,.]+)"  # ACV
+    r"(?:\s|$)"  # End with whitespace or end of line
+)
+
+# Pattern 4: No TAX/O&P columns (Allstate LS format)
+# Format: NUMBER. DESCRIPTION QTY+UNIT UNIT_PRICE RCV AGE/LIFE [yrs] Text COND% (DEPREC) ACV
+# Example: 19. Paint trim - one coat 18.00LF 1.06 19.08 0/15 yrs Avg. 0% (0.00) 19.08
+# Alt:     1. Remove Laminated... 13.74SQ 82.16 1,128.88 0/30 yrs Avg. NA (0.00) 1,128.88
+PATTERN_NO_TAX_OP = re.compile(
+    r"^(\d+\.)\s+"  # Line number with period
+    r"(.+?)\s+"  # Description (non-greedy, allow special chars)
+    r"([\d,.]+)([A-Z]{2,4})\s+"  # Quantity+unit combined (no space): 18.00LF
+    r"([\d,.]+)\s+"  # Unit price
+    r"([\d,.]+)\s+"  # RCV (no tax, no O&P!)
+    r"[\d/NA]+\s+"  # AGE/LIFE (e.g., "0/15" or "6/30")
+    r"(?:yrs?\s+)?"  # Optional "yrs" or "yr"
+    r"[A-Za-z.]+\s+"  # Text like "Avg."
+    r"(?:\d+(?:\.\d+)?%|NA)\s+"  # CONDITION: percentage (e.g., "0%" or "20%") OR "NA"
+    r"(?:\[M\]\s+)?"  # Optional depreciation marker [M]
+    r"[\(<]([\d,.]+)[\)>]\s+"  # Depreciation (parentheses or angle brackets)
+    r"([\d,.]+)"  # ACV
+    r"(?:\s|$)"  # End with whitespace or end of line
+)
+
+# Pattern 5: Has TAX but NO O&P (State Farm/Travelers multi-line)
+# Format: NUMBER. DESCRIPTION QTY+UNIT UNIT_PRICE TAX RCV AGE/LIFE [yrs] Text COND (DEPREC) ACV
+# Example: 1. Tandem axle dump... 1.00EA 325.65 0.00 325.65 10/NA Avg. NA (0.00) 325.65
+PATTERN_TAX_NO_OP = re.compile(
+    r"^(\d+\.)\s+"  # Line number with period
+    r"(.+?)\s+"  # Description (non-greedy, allow special chars)
+    r"([\d,.]+)([A-Z]{2,4})\s+"  # Quantity+unit combined (no space): 1.00EA
+    r"([\d,.]+)\s+"  # Unit price
+    r"([\d,.]+)\s+"  # TAX (has tax!)
+    r"([\d,.]+)\s+"  # RCV (NO O&P!)
+    r"[\d/NA]+\s+"  # AGE/LIFE (e.g., "10/NA" or "10/25")
+    r"(?:yrs?\s+)?"  # Optional "yrs" or "yr"
+    r"[A-Za-z.]+\s+"  # Text like "Avg."
+    r"(?:\d+(?:\.\d+)?%|NA)\s+"  # CONDITION: percentage (e.g., "40%") OR "NA"
+    r"(?:\[M\]\s+)?"  # Optional depreciation marker [M]
+    r"[\(<]([\d,.]+)[\)>]\s+"  # Depreciation (parentheses or angle brackets)
+    r"([\d,.]+)"  # ACV
+    r"(?:\s|$)"  # End with whitespace or end of line
+)
+
+# Tried in this order; the first that matches wins
+LEGACY_PATTERNS = [
+    ("with_age_life", PATTERN_WITH_AGE_LIFE, "tax_op"),  # Has tax AND O&P, inline CONDITION
+    ("state_farm", PATTERN_STATE_FARM, "tax_op"),  # State Farm 3-line (CONDITION on line 3)
+    ("tax_no_op", PATTERN_TAX_NO_OP, "tax_only"),  # Has tax but NO O&P
+    ("no_tax_op", PATTERN_NO_TAX_OP, "no_tax_op"),  # NO tax, NO O&P
+    ("simple", PATTERN_SIMPLE, "tax_op"),  # Has tax AND O&P
+    ("angle_brackets", PATTERN_ANGLE_BRACKETS, "tax_op")  # Has tax AND O&P
+]
+
+
+SAMPLE_LINES = [
+    # with_age_life
+    "1. Remove Laminated - comp. shingle rfg. - w/out felt 13.49SQ 7.27 0.00 9.80 107.87 9/NA Avg. 0% (0.00) 107.87",
+    # state_farm
+    "2. Laminated - comp. shingle rfg. 19.67SQ 433.28 310.68 1,766.66 10,599.96 8/30 yrs (2,826.65) 7,773.31",
+    # tax_no_op
+    "3. Tandem axle dump trailer - per load 1.00EA 325.65 0.00 325.65 10/NA Avg. NA (0.00) 325.65",
+    # no_tax_op
+    "4. Paint trim - one coat 18.00LF 1.06 19.08 0/15 yrs Avg. 0% (0.00) 19.08",
+    # simple
+    "5. R&R Vinyl window - double hung, 9-12 sf (3 lites) 3.00EA 895.87 195.90 288.36 3,171.87 (951.56) 2,220.31",
+    # angle_brackets
+    "6. Paint door slab only - 2 coats (per side) 2.00 EA 45.00 1.50 5.00 103.00 <10.30> 92.70",
+    # Lines that match nothing: notes merged into a numbered item
+    "7. Contractor to verify all measurements (per adjuster) before ordering 12 materials, 3 openings, 2.5 sq",
+    "8. " + "Note: the insured reports prior repairs (2019) to the north slope and 4 skylights, " * 6,
+    "9. Tear off, haul and dispose of comp. shingles - Laminated 24.33SQ 62.17 0.00 302.52",
+]
+
+# Tokens that random lines are built from: every column kind, plus near misses
+FUZZ_TOKENS = [
+    "Paint", "trim", "-", "one", "coat", "R&R", "(3", "lites)", "sf", "Avg.", "avg", "yrs", "yr",
+    "NA", "9/NA", "8/30", "0/15", "10/25", "0%", "26.67%", "40%", "5.%", "[M]", "[m]",
+    "13.49SQ", "1.00EA", "18.00LF", "2.00", "EA", "SF", "SQFT", "ABCDE", "7.27", "0.00",
+    "1,766.66", "10,599.96", "1.2.3", "(0.00)", "(2,826.65)", "<10.30>", "(10.30>", "<5)", "()",
+    "(abc)", "12.", "3.", "107.87", "x", "(per", "side)",
+]
+
+
+def legacy_match(line):
+    """First LEGACY_PATTERNS match, as match_line_item() would report it."""
+    for name, pattern, layout in LEGACY_PATTERNS:
+        match = pattern.match(line)
+        if match:
+            groups = list(match.groups())
+            groups[1] = " ".join(groups[1].split())
+            if layout == "tax_only":
+                groups.insert(6, "0.00")
+            elif layout == "no_tax_op":
+                groups[5:5] = ["0.00", "0.00"]
+            return name, xactparse.LineColumns(*groups), layout
+    return None, None, None
+
+
+def fuzz_line(rng):
+    """A random numbered line, often ending in a real layout's columns."""
+    tokens = [f"{rng.randint(1, 300)}."] + rng.choices(FUZZ_TOKENS, k=rng.randint(0, 12))
+    if rng.random() < 0.7:
+        sample = rng.choice(SAMPLE_LINES[:6]).split()[1:]
+        cut = rng.randint(0, len(sample))
+        tokens += sample[cut:] if rng.random() < 0.5 else sample
+        tokens += rng.choices(FUZZ_TOKENS, k=rng.randint(0, 4))
+    return rng.choice([" ", "  ", "\t"]).join(tokens)
+
+
+def legacy_assign_trade(description):
+    """The original classifier: the first trade with any keyword in the description."""
+    desc = description.lower()
+    for trade, keywords in xactparse.TRADE_KEYWORDS.items():
+        if any(keyword in desc for keyword in keywords):
+            return trade
+    return "Other"
+
+
+def fuzz_description(rng):
+    """A random description mixing keywords (often cut short or run together) and filler."""
+    keywords = [keyword for keywords in xactparse.TRADE_KEYWORDS.values() for keyword in keywords]
+    words = []
+    for _ in range(rng.randint(0, 8)):
+        roll = rng.random()
+        if roll < 0.3:
+            keyword = rng.choice(keywords)
+            words.append(keyword[:rng.randint(1, len(keyword))] if rng.random() < 0.3 else keyword)
+        elif roll < 0.5:
+            words.append(rng.choice(keywords).upper())
+        else:
+            words.append(rng.choice(FUZZ_TOKENS))
+    return rng.choice([" ", ""]).join(words)
+
+
+def test_sample_lines_match_the_reference_regexes():
+    for line in SAMPLE_LINES:
+        assert xactparse.match_line_item(line) == legacy_match(line), line
+
+
+def test_fuzzed_lines_match_the_reference_regexes():
+    rng = random.Random(0)
+    for _ in range(20000):
+        line = fuzz_line(rng)
+        assert xactparse.match_line_item(line) == legacy_match(line), line
+
+
+def test_fuzzed_descriptions_get_the_reference_trade():
+    rng = random.Random(0)
+    for _ in range(20000):
+        description = fuzz_description(rng)
+        assert xactparse.assign_trade(description) == legacy_assign_trade(description), description
@@ -0,0 +1,33 @@
+"""
+Tests for triage (triage_pdf(), triage_main()).
+
+    python3 -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+
+import xactparse  # noqa: E402
+import synthetic  # noqa: E402
+
+
+@pytest.mark.parametrize("sample_pages", [0, -3])
+def test_a_sample_of_no_pages_still_reads_one(tmp_path, sample_pages):
+    pdf = str(tmp_path / "estimate.pdf")
+    synthetic.generate_estimate(pdf, "state_farm", 300)
+
+    result = xactparse.triage_pdf(pdf, sample_pages=sample_pages)
+
+    assert result.sampled == 1
+    assert result.route != "ocr"
+
+
+@pytest.mark.parametrize("value", ["0", "-1"])
+def test_sample_pages_below_one_is_rejected(tmp_path, value):
+    with pytest.raises(SystemExit) as exc:
+        xactparse.triage_main([str(tmp_path), "--sample-pages", value])
+    assert exc.value.code == 2
@@ -0,0 +1,229 @@
+"""
+Round-trip tests for --update (update_excel_workbook()) on workbooks that
+openpyxl has loaded and saved again, as a user's spreadsheet program would.
+
+    python3 -m pytest tests
+"""
+import os
+import re
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import xactparse  # noqa: E402
+
+NOTE_COLUMN = len(xactparse.HEADERS) + 1
+
+
+def item(number, description, trade, quantity="10.00", price=2500):
+    quantity = xactparse.parse_quantity(quantity)
+    rcv = int(quantity * price)
+    return xactparse.LineItem(number, description, trade, quantity, "SF", price, 0, 0, rcv, 0, rcv)
+
+
+def estimate():
+    return [
+        item(1, "Remove drywall", "Drywall"),
+        item(2, "Hang drywall", "Drywall", "120.00"),
+        item(3, "Seal/prime walls", "Painting"),
+        item(4, "Paint walls - two coats", "Painting", "1,234.50"),
+        item(5, "Tear out carpet pad", "Flooring"),
+        item(6, "Carpet", "Flooring", "45.00"),
+    ]
+
+
+def renumber(items):
+    return [entry._replace(line_number=number) for number, entry in enumerate(items, 1)]
+
+
+def write(path, items):
+    xactparse.save_to_excel_with_budget([xactparse.HEADERS] + items, path, quiet=True)
+
+
+def resave(path, edit=None):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path)
+    if edit is not None:
+        edit(wb)
+    wb.save(path)
+
+
+def row_label(ws, row):
+    """The DESCRIPTION (or, on total rows, TRADE) of a row."""
+    return ws.cell(row=row, column=1).value or ws.cell(row=row, column=2).value
+
+
+def note(ws, description, text, column=NOTE_COLUMN):
+    """Put ``text`` beside the row labelled ``description`` (its line number aside)."""
+    for row in range(2, ws.max_row + 1):
+        value = row_label(ws, row)
+        if isinstance(value, str) and (value == description or value.endswith(". " + description)):
+            ws.cell(row=row, column=column, value=text)
+            return
+    raise AssertionError(f"no {description!r} row on {ws.title}")
+
+
+def notes(path, sheet, column=NOTE_COLUMN):
+    """{row label: note} for the rows of ``sheet`` with something in ``column``."""
+    from openpyxl import load_workbook
+
+    ws = load_workbook(path)[sheet]
+    return {row_label(ws, row): ws.cell(row=row, column=column).value
+            for row in range(2, ws.max_row + 1) if ws.cell(row=row, column=column).value is not None}
+
+
+def values(path):
+    """Sheet name -> rows of generated values (the first len(header) columns)."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path)
+    sheets = {}
+    for ws in wb.worksheets:
+        width = len(xactparse.TOTALS_HEADERS if ws.title == "Totals" else xactparse.HEADERS)
+        sheets[ws.title] = [row[:width] for row in ws.iter_rows(values_only=True)
+                            if any(value is not None for value in row[:width])]
+    return sheets
+
+
+def chart_refs(path):
+    """The cell references of the Totals pie chart."""
+    with zipfile.ZipFile(path) as package:
+        charts = [name for name in package.namelist() if name.startswith("xl/charts/chart")]
+        assert len(charts) == 1
+        return re.findall(r"<(?:c:)?f>([^<]*)</(?:c:)?f>", package.read(charts[0]).decode("utf-8"))
+
+
+def assert_matches_rewrite(tmp_path, updated, items):
+    rewritten = str(tmp_path / "rewritten.xlsx")
+    write(rewritten, items)
+    assert values(updated) == values(rewritten)
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / "estimate.xlsx")
+    write(path, estimate())
+    return path
+
+
+def test_notes_on_master_follow_their_items(tmp_path, workbook):
+    def edit(wb):
+        wb["Master"].cell(row=1, column=NOTE_COLUMN, value="NOTES")
+        note(wb["Master"], "Hang drywall", "ask about the ceiling")
+        note(wb["Master"], "Carpet", "owner picked the colour")
+    resave(workbook, edit)
+
+    revised = estimate()
+    revised[1] = item(2, "Hang drywall", "Drywall", "130.00")
+    del revised[0]
+    revised = renumber(revised)
+    xactparse.update_excel_workbook([xactparse.HEADERS] + revised, workbook, quiet=True)
+
+    assert notes(workbook, "Master") == {"1. Hang drywall": "ask about the ceiling",
+                                         "5. Carpet": "owner picked the colour"}
+    assert_matches_rewrite(tmp_path, workbook, revised)
+
+
+def test_unheaded_notes_are_kept_and_counted(tmp_path, workbook, caplog):
+    resave(workbook, lambda wb: (note(wb["Master"], "Seal/prime walls", "primer on site"),
+                                 note(wb["Master"], "Remove drywall", "done")))
+
+    revised = renumber([entry for entry in estimate() if entry.description != "Remove drywall"])
+    with caplog.at_level("WARNING"):
+        xactparse.update_excel_workbook([xactparse.HEADERS] + revised, workbook, quiet=True)
+
+    assert notes(workbook, "Master") == {"2. Seal/prime walls": "primer on site"}
+    assert "1 rows with notes" in caplog.text
+
+
+def test_notes_on_a_trade_sheet(tmp_path, workbook):
+    def edit(wb):
+        wb["Painting"].cell(row=1, column=NOTE_COLUMN, value="NOTES")
+        note(wb["Painting"], "Paint walls - two coats", "color SW 7005")
+        note(wb["Painting"], "TOTAL", "approved")
+    resave(workbook, edit)
+
+    revised = estimate()
+    revised[3] = item(4, "Paint walls - two coats", "Painting", "1,300.00")
+    xactparse.update_excel_workbook([xactparse.HEADERS] + revised, workbook, quiet=True)
+
+    assert notes(workbook, "Painting") == {"4. Paint walls - two coats": "color SW 7005", "TOTAL": "approved"}
+    assert_matches_rewrite(tmp_path, workbook, revised)
+
+
+def test_notes_on_totals_follow_their_trade(tmp_path, workbook):
+    column = len(xactparse.TOTALS_HEADERS) + 1
+
+    def edit(wb):
+        note(wb["Totals"], "Flooring", "sub: ABC Floors", column)
+        note(wb["Totals"], "GRAND TOTAL", "signed", column)
+    resave(workbook, edit)
+
+    revised = estimate()
+    revised[5] = item(6, "Carpet", "Flooring", "50.00")
+    xactparse.update_excel_workbook([xactparse.HEADERS] + revised, workbook, quiet=True)
+
+    assert notes(workbook, "Totals", column) == {"Flooring": "sub: ABC Floors", "GRAND TOTAL": "signed"}
+    assert_matches_rewrite(tmp_path, workbook, revised)
+
+
+def test_added_trade(tmp_path, workbook):
+    resave(workbook, lambda wb: note(wb["Master"], "Carpet", "owner picked the colour"))
+
+    revised = estimate() + [item(7, "Detach & reset toilet", "Plumbing")]
+    xactparse.update_excel_workbook([xactparse.HEADERS] + revised, workbook, quiet=True)
+
+    from openpyxl import load_workbook
+
+    sheetnames = load_workbook(workbook).sheetnames
+    assert sheetnames.index("Plumbing") == sheetnames.index("Painting") + 1
+    assert notes(workbook, "Master") == {"6. Carpet": "owner picked the colour"}
+    assert_matches_rewrite(tmp_path, workbook, revised)
+    assert chart_refs(workbook) == ["'Totals'!E1", "'Totals'!$A$2:$A$5", "'Totals'!$E$2:$E$5"]
+
+
+def test_removed_trade(tmp_path, workbook):
+    resave(workbook, lambda wb: note(wb["Master"], "Hang drywall", "ask about the ceiling"))
+
+    revised = renumber([entry for entry in estimate() if entry.trade != "Flooring"])
+    xactparse.update_excel_workbook([xactparse.HEADERS] + revised, workbook, quiet=True)
+
+    from openpyxl import load_workbook
+
+    assert "Flooring" not in load_workbook(workbook).sheetnames
+    assert notes(workbook, "Master") == {"2. Hang drywall": "ask about the ceiling"}
+    assert_matches_rewrite(tmp_path, workbook, revised)
+    assert chart_refs(workbook) == ["'Totals'!E1", "'Totals'!$A$2:$A$3", "'Totals'!$E$2:$E$3"]
+
+
+def test_chart_range_kept_when_trades_unchanged(tmp_path, workbook):
+    resave(workbook)
+    before = chart_refs(workbook)
+
+    revised = estimate()
+    revised[0] = item(1, "Remove drywall", "Drywall", "12.00")
+    xactparse.update_excel_workbook([xactparse.HEADERS] + revised, workbook, quiet=True)
+
+    assert chart_refs(workbook) == before == ["'Totals'!E1", "'Totals'!$A$2:$A$4", "'Totals'!$E$2:$E$4"]
+    assert_matches_rewrite(tmp_path, workbook, revised)
+
+
+def test_unchanged_sheets_are_copied_as_they_are(workbook):
+    resave(workbook)
+    with zipfile.ZipFile(workbook) as package:
+        before = {info.filename: package.read(info) for info in package.infolist()}
+
+    revised = estimate()
+    revised[2] = item(3, "Seal/prime walls", "Painting", "11.00")
+    xactparse.update_excel_workbook([xactparse.HEADERS] + revised, workbook, quiet=True)
+
+    with zipfile.ZipFile(workbook) as package:
+        after = {info.filename: package.read(info) for info in package.infolist()}
+    changed = {name for name in before if before[name] != after.get(name)}
+    # Master, Painting, Totals and the digests in the custom properties
+    assert changed == {"xl/worksheets/sheet1.xml", "xl/worksheets/sheet4.xml",
+                       "xl/worksheets/sheet5.xml", "docProps/custom.xml"}
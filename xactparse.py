@@ -1,15 +1,39 @@
-import pdfplumber
 import csv
+import datetime
 import re
+import os
+import posixpath
+import sys
+import glob
+import json
+import time
+import zlib
+import decimal
+import difflib
+import hashlib
+import sqlite3
+import shutil
+import subprocess
+import io
+import signal
+import socket
+import socketserver
+import struct
+import threading
+import weakref
 import argparse
+import bisect
+import cProfile
+import collections
+import contextlib
+import functools
+import itertools
 import logging
-import pandas as pd
-from openpyxl.utils import get_column_letter
-from openpyxl import load_workbook
-from openpyxl.styles import Font
-from openpyxl.chart import PieChart, Reference
+from concurrent.futures import Future
 
-logging.basicConfig(level=logging.INFO)
+# pdfplumber, openpyxl, asyncio and ProcessPoolExecutor are imported inside
+# the functions that use them: together they are most of the start-up time,
+# and `xactparse summary` (or a cache hit) needs neither of the first two.
 
 # ... (TRADE_KEYWORDS, assign_trade, is_line_item, extract_xactimate_items as before) ...
 TRADE_KEYWORDS = {
@@ -38,557 +62,4177 @@ TRADE_KEYWORDS = {
 
 HEADERS = ["DESCRIPTION", "TRADE", "QUANTITY", "UNIT PRICE", "TAX", "O&P", "RCV", "DEPREC.", "ACV"]
 
+# LineItem fields holding money, in integer cents, in HEADERS order
+MONEY_FIELDS = ["unit_price", "tax", "o_p", "rcv", "deprec", "acv"]
+
+CENT = decimal.Decimal("0.01")
+
+
+def parse_cents(text):
+    """Parse an extracted money string like "$1,766.66" to integer cents."""
+    amount = decimal.Decimal(text.replace("$", "").replace(",", ""))
+    return int(amount.quantize(CENT, rounding=decimal.ROUND_HALF_UP) * 100)
+
+
+def parse_quantity(text):
+    return decimal.Decimal(text.replace(",", ""))
+
+
+def cents_to_float(cents):
+    return cents / 100
+
+
+def cents_to_decimal(cents):
+    """Exact dollars, e.g. 1234 -> Decimal("12.34")."""
+    return decimal.Decimal(cents).scaleb(-2)
+
+
+class LineItem(collections.namedtuple("LineItem", [
+        "line_number", "description", "trade", "quantity", "unit",
+        "unit_price", "tax", "o_p", "rcv", "deprec", "acv", "page"], defaults=(0,))):
+    """
+    One parsed estimate line.
+
+    Numbers are parsed once, at match time: ``quantity`` is a Decimal and the
+    money fields (MONEY_FIELDS) are exact integer cents, so totals never pick
+    up float rounding drift. ``description`` excludes the "12." line number.
+    """
+    __slots__ = ()
+
+    @property
+    def label(self):
+        """Description as shown in the workbook, e.g. "12. Paint trim - one coat"."""
+        return f"{self.line_number}. {self.description}"
+
+    @property
+    def quantity_text(self):
+        """Quantity and unit as printed in the estimate, e.g. "1,234.56SF"."""
+        return f"{self.quantity:,}{self.unit}"
+
+    def row(self):
+        """Values in HEADERS order, money as floats (for spreadsheets)."""
+        return [self.label, self.trade, self.quantity_text,
+                *(cents_to_float(getattr(self, field)) for field in MONEY_FIELDS)]
+
+    def to_json(self):
+        return [*self[:3], str(self.quantity), *self[4:]]
+
+    @classmethod
+    def from_json(cls, values):
+        return cls(*values[:3], decimal.Decimal(values[3]), *values[4:])
+
+    @classmethod
+    def from_row(cls, row):
+        """Build from a legacy list of strings in HEADERS order."""
+        label, trade, quantity_unit = row[:3]
+        number, _, description = label.partition(". ")
+        quantity, unit = re.match(r"^([\d,.]+)\s*(\S*)$", quantity_unit).groups()
+        return cls(int(number), description, trade, parse_quantity(quantity), unit,
+                   *(parse_cents(str(value)) for value in row[3:9]))
+
 LINE_ITEM_REGEX = re.compile(
     r"^(\d+\.\s+.+?)\s+(\d+\.\d+\s+(?:SF|LF|EA|HR|DA|SY))\s+([\d,.]+)\s+([\d,.]+)\s+([\d,.]+)\s+([\d,.]+)\s+\(([\d,.]+)\)\s+([\d,.]+)"
 )
 
 
+class TradeMatcher:
+    """
+    Aho-Corasick automaton over every keyword in TRADE_KEYWORDS.
+
+    One left-to-right walk over a description finds all keyword occurrences.
+    Each keyword carries the position of its trade in TRADE_KEYWORDS, and the
+    lowest position seen wins, which is the same first-trade-wins priority as
+    checking the trades in order.
+    """
+
+    def __init__(self, trade_keywords):
+        self.trades = list(trade_keywords)
+        self.goto = [{}]
+        self.fail = [0]
+        self.priority = [None]
+
+        for rank, keywords in enumerate(trade_keywords.values()):
+            for keyword in keywords:
+                state = 0
+                for ch in keyword:
+                    if ch not in self.goto[state]:
+                        self.goto.append({})
+                        self.fail.append(0)
+                        self.priority.append(None)
+                        self.goto[state][ch] = len(self.goto) - 1
+                    state = self.goto[state][ch]
+                if self.priority[state] is None or rank < self.priority[state]:
+                    self.priority[state] = rank
+
+        # Breadth-first pass to set failure links and inherit the best
+        # priority of any keyword that ends at the same position
+        queue = collections.deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(ch, 0) if state else 0
+                inherited = self.priority[self.fail[child]]
+                if inherited is not None and (self.priority[child] is None or inherited < self.priority[child]):
+                    self.priority[child] = inherited
+
+    def classify(self, text):
+        """Return the highest-priority trade with a keyword in ``text`` (already lowercased)."""
+        goto, fail, priority = self.goto, self.fail, self.priority
+        state = 0
+        best = None
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            rank = priority[state]
+            if rank is not None and (best is None or rank < best):
+                best = rank
+                if best == 0:
+                    break
+        return self.trades[best] if best is not None else "Other"
+
+
+def normalize_description(description):
+    """Lowercase, drop the leading "12." line number and collapse whitespace."""
+    return " ".join(re.sub(r"^\s*\d+\.\s", " ", description).lower().split())
+
+
+@functools.lru_cache(maxsize=1)
+def _trade_matcher():
+    return TradeMatcher(TRADE_KEYWORDS)
+
+
+@functools.lru_cache(maxsize=65536)
+def _classify_normalized(normalized):
+    return _trade_matcher().classify(normalized)
+
+
 def assign_trade(description):
-    desc = description.lower()
-    for trade, keywords in TRADE_KEYWORDS.items():
-        if any(keyword in desc for keyword in keywords):
-            return trade
-    return "Other"
+    return _classify_normalized(normalize_description(description))
+
+
+def assign_trades(descriptions):
+    """
+    Classify a whole column of descriptions in one call.
+
+    Each distinct normalized description is classified once; returns a list
+    of trades in input order.
+    """
+    normalized = [normalize_description(description) for description in descriptions]
+    trades = {key: _classify_normalized(key) for key in dict.fromkeys(normalized)}
+    return [trades[key] for key in normalized]
 
 
 def is_line_item(line):
     return bool(re.match(r"^\d+\.", line.strip()))
 
 
+# Dimension lines, totals, section headers and receipt instructions, matched
+# against the lowercased line in one pass
+SKIP_LINE_REGEX = re.compile(
+    r"dimension"
+    r"|total:|grand total|line item total"
+    r"|\*\*(?:contents|claim info|summary)\*\*|estimate summary|adjuster summary"
+    r"|receipts must be|items on receipts|the receipt should contain|additional documentation")
+
+# Lines with "SF" or other units but no numbers are dimension headers
+DIMENSION_HEADER_REGEX = re.compile(r'^\s*[A-Z\s]+(?:SF|LF|EA)\s*$', re.IGNORECASE)
+
+
 def should_skip_line(line):
     """
     Determine if a line should be skipped (not a line item).
     Returns True for dimensions, totals, notes, headers, etc.
     """
-    line_lower = line.lower()
+    return (SKIP_LINE_REGEX.search(line.lower()) is not None
+            or DIMENSION_HEADER_REGEX.match(line) is not None)
 
-    # Skip dimension headers and dimension lines
-    if 'dimension' in line_lower:
-        return True
 
-    # Skip total/subtotal lines
-    if any(keyword in line_lower for keyword in ['total:', 'subtotal:', 'grand total', 'line item total']):
-        return True
+# Line-item layouts, tried in this order (first match wins).
+#
+# A line item is "NUMBER. DESCRIPTION" followed by numeric columns and ending
+# in "(DEPREC) ACV" (or "<DEPREC> ACV"). Rather than regexes with a lazy
+# "(.+?)" description, which backtrack badly on long merged lines that don't
+# match, a line is split into whitespace-separated tokens once and each
+# "(DEPREC) ACV" pair is used as an anchor: the columns are read right to left
+# from it, one token each, and whatever precedes them is the description.
+# Each layout lists its columns left to right, from the quantity to the
+# depreciation; a "?" suffix marks an optional token.
+#
+# with_age_life: full format with AGE/LIFE and CONDITION
+#   1. Remove... 13.49SQ 7.27 0.00 9.80 107.87 9/NA Avg. 0% (0.00) 107.87
+# state_farm: State Farm 3-line, CONDITION on the line after deprec/ACV
+#   2. Laminated... 19.67SQ 433.28 310.68 1,766.66 10,599.96 8/30 yrs (2,826.65) 7,773.31
+#   Avg. 26.67%
+# tax_no_op: TAX but no O&P (State Farm/Travelers multi-line)
+#   1. Tandem axle dump... 1.00EA 325.65 0.00 325.65 10/NA Avg. NA (0.00) 325.65
+# no_tax_op: no TAX or O&P columns (Allstate LS)
+#   19. Paint trim - one coat 18.00LF 1.06 19.08 0/15 yrs Avg. 0% (0.00) 19.08
+# simple: no AGE/LIFE columns
+#   52. R&R Vinyl window... 3.00EA 895.87 195.90 288.36 3,171.87 (951.56) 2,220.31
+# angle_brackets: quantity and unit separated, depreciation in angle brackets
+#   6. Paint door slab only 2.00 EA 45.00 1.50 5.00 103.00 <10.30> 92.70
+# The third field says which money columns are present (see LAYOUT_FIELDS).
+LINE_LAYOUTS = [
+    ("with_age_life", ["qty_unit", "number", "number", "number", "number",
+                       "age_life", "yrs?", "text", "condition", "marker?", "deprec"], "tax_op"),
+    ("state_farm", ["qty_unit", "number", "number", "number", "number",
+                    "age_life", "yrs?", "deprec"], "tax_op"),
+    ("tax_no_op", ["qty_unit", "number", "number", "number",
+                   "age_life", "yrs?", "text", "condition_or_na", "marker?", "deprec_any"], "tax_only"),
+    ("no_tax_op", ["qty_unit", "number", "number",
+                   "age_life", "yrs?", "text", "condition_or_na", "marker?", "deprec_any"], "no_tax_op"),
+    ("simple", ["qty_unit", "number", "number", "number", "number", "deprec_any"], "tax_op"),
+    ("angle_brackets", ["number", "unit", "number", "number", "number", "number", "deprec_angle"],
+     "tax_op"),
+]
 
-    # Skip section headers and notes
-    if any(keyword in line_lower for keyword in ['**contents**', '**claim info**', '**summary**', 'estimate summary', 'adjuster summary']):
-        return True
+# What one token of each column kind looks like. Kinds with a group, or
+# "number"/"unit", are captured; the rest are only checked.
+LINE_TOKENS = {
+    "line_number": re.compile(r"\d+\."),
+    "number": re.compile(r"[\d,.]+"),
+    "qty_unit": re.compile(r"([\d,.]+)([A-Z]{2,4})"),  # 13.49SQ
+    "unit": re.compile(r"[A-Z]{2,4}"),
+    "age_life": re.compile(r"[\d/NA]+"),  # 9/30, 9/NA
+    "yrs": re.compile(r"yrs?"),
+    "text": re.compile(r"[A-Za-z.]+"),  # Avg.
+    "condition": re.compile(r"\d+(?:\.\d+)?%"),  # 26.67%
+    "condition_or_na": re.compile(r"\d+(?:\.\d+)?%|NA"),
+    "marker": re.compile(r"\[M\]"),  # Depreciation marker
+    "deprec": re.compile(r"\(([\d,.]+)\)"),
+    "deprec_angle": re.compile(r"<([\d,.]+)>"),
+    "deprec_any": re.compile(r"[\(<]([\d,.]+)[\)>]"),
+}
+_CAPTURED_TOKENS = {"number", "qty_unit", "unit", "deprec", "deprec_angle", "deprec_any"}
 
-    # Skip lines that are just headers or instructions
-    if any(keyword in line_lower for keyword in ['receipts must be', 'items on receipts', 'the receipt should contain', 'additional documentation']):
-        return True
+# Captured columns per layout, from the quantity to the depreciation
+LAYOUT_FIELDS = {
+    "tax_op": ("quantity", "unit", "unit_price", "tax", "o_p", "rcv", "deprec"),
+    "tax_only": ("quantity", "unit", "unit_price", "tax", "rcv", "deprec"),
+    "no_tax_op": ("quantity", "unit", "unit_price", "rcv", "deprec"),
+}
 
-    # Skip lines with "SF" or other units but no leading number (these are dimension headers)
-    if re.match(r'^\s*[A-Z\s]+(?:SF|LF|EA)\s*$', line, re.IGNORECASE):
-        return True
 
-    return False
+class LineColumns(collections.namedtuple("LineColumns", [
+        "line_number", "description", "quantity", "unit",
+        "unit_price", "tax", "o_p", "rcv", "deprec", "acv"])):
+    """
+    The text of each column of a matched line item, as printed ("1,766.66").
+    Columns the layout doesn't have (TAX, O&P) are "0.00".
+    """
+    __slots__ = ()
 
 
-def extract_xactimate_items(pdf_path):
-    extracted_items = []
+def _compile_layout(columns):
+    """Right-to-left matching plan: (token regex, optional, captured) per column."""
+    plan = []
+    for column in reversed(columns):
+        kind = column.rstrip("?")
+        plan.append((LINE_TOKENS[kind], column.endswith("?"), kind in _CAPTURED_TOKENS))
+    return plan
 
-    # Multiple regex patterns to try in order (fallback logic)
-    # Pattern 1: Full format with AGE/LIFE and CONDITION
-    # Format: NUMBER. DESCRIPTION QTY+UNIT UNIT_PRICE TAX O&P RCV AGE/LIFE [yrs] Text COND% (DEPREC) ACV
-    # Example: 1. Remove... 13.49SQ 7.27 0.00 9.80 107.87 9/NA Avg. 0% (0.00) 107.87
-    pattern_with_age_life = re.compile(
-        r"^(\d+\.)\s+"  # Line number with period
-        r"(.+?)\s+"  # Description (non-greedy, allow special chars)
-        r"([\d,.]+)([A-Z]{2,4})\s+"  # Quantity+unit combined (no space): 13.49SQ
-        r"([\d,.]+)\s+"  # Unit price
-        r"([\d,.]+)\s+"  # Tax
-        r"([\d,.]+)\s+"  # O&P
-        r"([\d,.]+)\s+"  # RCV
-        r"[\d/NA]+\s+"  # AGE/LIFE (e.g., "9/30" or "9/NA" or "0/30")
-        r"(?:yrs?\s+)?"  # Optional "yrs" or "yr"
-        r"[A-Za-z.]+\s+"  # Text like "Avg."
-        r"\d+(?:\.\d+)?%\s+"  # CONDITION percentage (e.g., "30%" or "25.71%")
-        r"(?:\[M\]\s+)?"  # Optional depreciation marker [M]
-        r"\(([\d,.]+)\)\s+"  # Depreciation in parentheses
-        r"([\d,.]+)"  # ACV
-        r"(?:\s|$)"  # End with whitespace or end of line
-    )
-
-    # Pattern 6: State Farm 3-line format (CONDITION on separate line AFTER deprec/ACV)
-    # Format: NUMBER. DESCRIPTION QTY+UNIT UNIT_PRICE TAX O&P RCV AGE/LIFE [yrs] (DEPREC) ACV
-    # Next line: Text COND%
-    # Example: 2. Laminated... 19.67SQ 433.28 310.68 1,766.66 10,599.96 8/30 yrs (2,826.65) 7,773.31
-    #          Avg. 26.67%
-    pattern_state_farm = re.compile(
-        r"^(\d+\.)\s+"  # Line number with period
-        r"(.+?)\s+"  # Description (non-greedy, allow special chars)
-        r"([\d,.]+)([A-Z]{2,4})\s+"  # Quantity+unit combined (no space): 19.67SQ
-        r"([\d,.]+)\s+"  # Unit price
-        r"([\d,.]+)\s+"  # Tax
-        r"([\d,.]+)\s+"  # O&P
-        r"([\d,.]+)\s+"  # RCV
-        r"[\d/NA]+\s+"  # AGE/LIFE (e.g., "8/30")
-        r"(?:yrs?\s+)?"  # Optional "yrs" or "yr"
-        r"\(([\d,.]+)\)\s+"  # Depreciation in parentheses (NO CONDITION before this!)
-        r"([\d,.]+)"  # ACV
-        r"(?:\s|$)"  # End with whitespace or end of line
-    )
-
-    # Pattern 2: Simple format without AGE/LIFE columns
-    # Format: NUMBER. DESCRIPTION QTY+UNIT UNIT_PRICE TAX O&P RCV (DEPREC) ACV
-    # Example: 52. R&R Vinyl window... 3.00EA 895.87 195.90 288.36 3,171.87 (951.56) 2,220.31
-    pattern_simple = re.compile(
-        r"^(\d+\.)\s+"  # Line number with period
-        r"(.+?)\s+"  # Description (non-greedy, allow special chars)
-        r"([\d,.]+)([A-Z]{2,4})\s+"  # Quantity+unit combined (no space)
-        r"([\d,.]+)\s+"  # Unit price
-        r"([\d,.]+)\s+"  # Tax
-        r"([\d,.]+)\s+"  # O&P
-        r"([\d,.]+)\s+"  # RCV
-        r"[\(<]([\d,.]+)[\)>]\s+"  # Depreciation (parentheses or angle brackets)
-        r"([\d,.]+)"  # ACV
-        r"(?:\s|$)"  # End with whitespace or end of line
-    )
-
-    # Pattern 3: Alternative format with angle brackets for depreciation
-    # Format: NUMBER. DESCRIPTION QTY UNIT UNIT_PRICE TAX O&P RCV <DEPREC> ACV
-    pattern_angle_brackets = re.compile(
-        r"^(\d+\.)\s+"  # Line number with period
-        r"(.+?)\s+"  # Description (non-greedy)
-        r"([\d,.]+)\s+"  # Quantity
-        r"([A-Z]{2,4})\s+"  # Unit (separate from quantity)
-        r"([\d,.]+)\s+"  # Unit price
-        r"([\d,.]+)\s+"  # Tax
-        r"([\d,.]+)\s+"  # O&P
-        r"([\d,.]+)\s+"  # RCV
-        r"<([\d,.]+)>\s+"  # Depreciation in angle brackets
-        r"([\d,.]+)"  # ACV
-        r"(?:\s|$)"  # End with whitespace or end of line
-    )
-
-    # Pattern 4: No TAX/O&P columns (Allstate LS format)
-    # Format: NUMBER. DESCRIPTION QTY+UNIT UNIT_PRICE RCV AGE/LIFE [yrs] Text COND% (DEPREC) ACV
-    # Example: 19. Paint trim - one coat 18.00LF 1.06 19.08 0/15 yrs Avg. 0% (0.00) 19.08
-    # Alt:     1. Remove Laminated... 13.74SQ 82.16 1,128.88 0/30 yrs Avg. NA (0.00) 1,128.88
-    pattern_no_tax_op = re.compile(
-        r"^(\d+\.)\s+"  # Line number with period
-        r"(.+?)\s+"  # Description (non-greedy, allow special chars)
-        r"([\d,.]+)([A-Z]{2,4})\s+"  # Quantity+unit combined (no space): 18.00LF
-        r"([\d,.]+)\s+"  # Unit price
-        r"([\d,.]+)\s+"  # RCV (no tax, no O&P!)
-        r"[\d/NA]+\s+"  # AGE/LIFE (e.g., "0/15" or "6/30")
-        r"(?:yrs?\s+)?"  # Optional "yrs" or "yr"
-        r"[A-Za-z.]+\s+"  # Text like "Avg."
-        r"(?:\d+(?:\.\d+)?%|NA)\s+"  # CONDITION: percentage (e.g., "0%" or "20%") OR "NA"
-        r"(?:\[M\]\s+)?"  # Optional depreciation marker [M]
-        r"[\(<]([\d,.]+)[\)>]\s+"  # Depreciation (parentheses or angle brackets)
-        r"([\d,.]+)"  # ACV
-        r"(?:\s|$)"  # End with whitespace or end of line
-    )
-
-    # Pattern 5: Has TAX but NO O&P (State Farm/Travelers multi-line)
-    # Format: NUMBER. DESCRIPTION QTY+UNIT UNIT_PRICE TAX RCV AGE/LIFE [yrs] Text COND (DEPREC) ACV
-    # Example: 1. Tandem axle dump... 1.00EA 325.65 0.00 325.65 10/NA Avg. NA (0.00) 325.65
-    pattern_tax_no_op = re.compile(
-        r"^(\d+\.)\s+"  # Line number with period
-        r"(.+?)\s+"  # Description (non-greedy, allow special chars)
-        r"([\d,.]+)([A-Z]{2,4})\s+"  # Quantity+unit combined (no space): 1.00EA
-        r"([\d,.]+)\s+"  # Unit price
-        r"([\d,.]+)\s+"  # TAX (has tax!)
-        r"([\d,.]+)\s+"  # RCV (NO O&P!)
-        r"[\d/NA]+\s+"  # AGE/LIFE (e.g., "10/NA" or "10/25")
-        r"(?:yrs?\s+)?"  # Optional "yrs" or "yr"
-        r"[A-Za-z.]+\s+"  # Text like "Avg."
-        r"(?:\d+(?:\.\d+)?%|NA)\s+"  # CONDITION: percentage (e.g., "40%") OR "NA"
-        r"(?:\[M\]\s+)?"  # Optional depreciation marker [M]
-        r"[\(<]([\d,.]+)[\)>]\s+"  # Depreciation (parentheses or angle brackets)
-        r"([\d,.]+)"  # ACV
-        r"(?:\s|$)"  # End with whitespace or end of line
-    )
-
-    # List of patterns to try in order
-    patterns = [
-        ("with_age_life", pattern_with_age_life, "tax_op"),  # Has tax AND O&P, inline CONDITION
-        ("state_farm", pattern_state_farm, "tax_op"),  # State Farm 3-line (CONDITION on line 3)
-        ("tax_no_op", pattern_tax_no_op, "tax_only"),  # Has tax but NO O&P
-        ("no_tax_op", pattern_no_tax_op, "no_tax_op"),  # NO tax, NO O&P
-        ("simple", pattern_simple, "tax_op"),  # Has tax AND O&P
-        ("angle_brackets", pattern_angle_brackets, "tax_op")  # Has tax AND O&P
-    ]
-
-    with pdfplumber.open(pdf_path) as pdf:
-        for page_number, page in enumerate(pdf.pages, 1):
-            text = page.extract_text()
-            if not text:
-                continue
 
-            lines = text.split('\n')
-            i = 0
+_LAYOUT_PLANS = [(name, _compile_layout(columns), layout) for name, columns, layout in LINE_LAYOUTS]
 
-            while i < len(lines):
-                line = lines[i].strip()
 
-                # Check if this line should be skipped
-                if should_skip_line(line):
-                    i += 1
+def _match_layout(tokens, anchors, plan):
+    """
+    Columns for the first anchor (index of a "(DEPREC)" token followed by an
+    ACV token) whose preceding tokens fit ``plan``, or None.
+
+    Each anchor costs at most len(plan) token checks, so this is linear in the
+    number of tokens. The first anchor that fits leaves the shortest
+    description, which is what the lazy "(.+?)" regexes picked.
+    """
+    for anchor in anchors:
+        pos = anchor
+        values = [tokens[anchor + 1]]
+        for token_regex, optional, captured in plan:
+            # Keep tokens[0] (line number) and at least one description token
+            match = token_regex.fullmatch(tokens[pos]) if pos >= 2 else None
+            if match is None:
+                if optional:
                     continue
+                break
+            if captured:
+                values.extend(reversed(match.groups() or (match.group(),)))
+            pos -= 1
+        else:
+            values.append(" ".join(tokens[1:pos + 1]))
+            values.reverse()
+            return values  # [description, captured columns..., acv]
+    return None
 
-                # Detect start of a new item (number. ...)
-                if re.match(r"^\d+\.\s", line):
-                    # Check if this might be a multi-line format (State Farm/Travelers style)
-                    # Where description is on one line and numbers are on the next
-                    is_multiline = False
-                    if i + 1 < len(lines):
-                        next_line = lines[i + 1].strip()
-                        # If next line starts with quantity+unit pattern (e.g., "1.00EA"), it's multi-line
-                        if re.match(r"^[\d,.]+[A-Z]{2,4}\s", next_line):
-                            is_multiline = True
-                            combined_line = line + " " + next_line
-                            j = i + 2  # Skip both lines
-                        else:
-                            # Standard multi-line combining
-                            combined_line = line
-                            j = i + 1
-
-                            # Combine with following lines that are not new items
-                            # Stop if we hit another numbered item, a skip pattern, or empty line
-                            while j < len(lines):
-                                next_line = lines[j].strip()
-
-                                # Stop if new numbered item
-                                if re.match(r"^\d+\.\s", next_line):
-                                    break
-
-                                # Stop if this is a skip pattern
-                                if should_skip_line(next_line):
-                                    break
-
-                                # Stop if empty line
-                                if not next_line:
-                                    break
-
-                                # Continue combining if it looks like a continuation
-                                combined_line += " " + next_line
-                                j += 1
-                    else:
-                        combined_line = line
-                        j = i + 1
-
-                    # Try each pattern in order until one matches
-                    match = None
-                    matched_pattern = None
-                    has_tax_op = True
-
-                    for pattern_name, pattern, has_tax in patterns:
-                        match = pattern.match(combined_line)
-                        if match:
-                            matched_pattern = pattern_name
-                            has_tax_op = has_tax
-                            break
 
-                    if match:
-                        # Extract fields - pattern structure varies
-                        line_num = match.group(1)
-                        description = match.group(2).strip()
-                        quantity = match.group(3)
-                        unit = match.group(4)
-                        unit_price = match.group(5)
-
-                        # Special handling for State Farm 3-line format
-                        # Check if next line (after combined_line) contains CONDITION percentage
-                        if matched_pattern == "state_farm":
-                            # j points to the line after the combined line
-                            # Check if that line has "Avg. XX%"
-                            if j < len(lines):
-                                condition_line = lines[j].strip()
-                                # Match lines like "Avg. 26.67%" or "Avg. 0%"
-                                if re.match(r'^[A-Za-z.]+\s+\d+(?:\.\d+)?%', condition_line):
-                                    # Found CONDITION line, skip it
-                                    j += 1
-                                # Also skip blank lines after CONDITION
-                                while j < len(lines) and not lines[j].strip():
-                                    j += 1
-
-                        if has_tax_op == "tax_op":
-                            # Patterns with TAX and O&P columns
-                            tax = match.group(6)
-                            o_p = match.group(7)
-                            rcv = match.group(8)
-                            deprec = match.group(9)
-                            acv = match.group(10)
-                        elif has_tax_op == "tax_only":
-                            # Pattern with TAX but NO O&P (pattern_tax_no_op)
-                            tax = match.group(6)
-                            o_p = "0.00"  # No O&P column
-                            rcv = match.group(7)
-                            deprec = match.group(8)
-                            acv = match.group(9)
-                        else:  # "no_tax_op"
-                            # Pattern without TAX/O&P (pattern_no_tax_op)
-                            tax = "0.00"  # No tax column
-                            o_p = "0.00"  # No O&P column
-                            rcv = match.group(6)
-                            deprec = match.group(7)
-                            acv = match.group(8)
-
-                        # Combine quantity and unit
-                        quantity_unit = f"{quantity}{unit}"
-
-                        # Clean up description (remove excessive whitespace)
-                        description = re.sub(r'\s+', ' ', description)
-                        description = f"{line_num} {description}"
-
-                        # Assign trade category
-                        trade = assign_trade(description)
-
-                        extracted_items.append([
-                            description, trade, quantity_unit, unit_price, tax, o_p, rcv, deprec, acv
-                        ])
-                    else:
-                        # Only print NO MATCH for lines that start with numbers (potential line items)
-                        if re.match(r"^\d+\.\s", combined_line):
-                            print("NO MATCH (combined):", repr(combined_line[:200]))  # Truncate for readability
-
-                    i = j  # Skip to next item
-                else:
-                    i += 1
+def match_line_item(combined_line, prefer=None):
+    """
+    Match a combined item line against the line-item layouts.
 
-    return [HEADERS] + extracted_items
+    Layouts are tried in LINE_LAYOUTS order (``prefer`` names one to try
+    first, see FormatDetector). Runs in time linear in the line's length, so
+    long notes merged into an item line cost no more than a scan.
 
+    Returns (layout_name, LineColumns, column_layout) or (None, None, None).
+    The description has its whitespace collapsed.
+    """
+    tokens = combined_line.split()
+    if len(tokens) < 4 or not LINE_TOKENS["line_number"].fullmatch(tokens[0]):
+        return None, None, None
+    deprec_any = LINE_TOKENS["deprec_any"]
+    number = LINE_TOKENS["number"]
+    anchors = [idx for idx in range(2, len(tokens) - 1)
+               if tokens[idx][-1] in ")>" and deprec_any.fullmatch(tokens[idx])
+               and number.fullmatch(tokens[idx + 1])]
+    if not anchors:
+        return None, None, None
 
-def auto_fit_excel_columns(filename):
-    wb = load_workbook(filename)
-    for ws in wb.worksheets:
-        for column_cells in ws.columns:
-            max_length = 0
-            column = column_cells[0].column_letter
-            for cell in column_cells:
-                try:
-                    cell_length = len(str(cell.value))
-                    if cell_length > max_length:
-                        max_length = cell_length
-                except:
-                    pass
-            adjusted_width = max_length + 2
-            ws.column_dimensions[column].width = adjusted_width
-    wb.save(filename)
+    plans = _LAYOUT_PLANS
+    if prefer is not None:
+        plans = ([entry for entry in plans if entry[0] == prefer]
+                 + [entry for entry in plans if entry[0] != prefer])
+    for name, plan, layout in plans:
+        values = _match_layout(tokens, anchors, plan)
+        if values is not None:
+            description, *columns, acv = values
+            fields = dict(zip(LAYOUT_FIELDS[layout], columns))
+            return name, LineColumns(tokens[0], description, fields["quantity"], fields["unit"],
+                                     fields["unit_price"], fields.get("tax", "0.00"),
+                                     fields.get("o_p", "0.00"), fields["rcv"], fields["deprec"],
+                                     acv), layout
+    return None, None, None
 
 
-def bold_total_rows(filename):
-    wb = load_workbook(filename)
-    for ws in wb.worksheets:
-        for row in ws.iter_rows():
-            for cell in row:
-                # For trade sheets, look for "TOTAL" in the TRADE column
-                if (cell.value == "TOTAL" or cell.value == "GRAND TOTAL"):
-                    for c in row:
-                        c.font = Font(bold=True)
-                    break
-    wb.save(filename)
+# Matched items used to fingerprint a document's layout
+FORMAT_SAMPLE_SIZE = 3
 
 
-def add_total_budget_rows(filename):
-    wb = load_workbook(filename)
-    for ws in wb.worksheets:
-        # Only apply to trade sheets (not Master or Totals)
-        if ws.title in ["Master", "Totals"]:
-            continue
-        max_row = ws.max_row
-        rcv_col = None
-        # Find the RCV column (header row is 1)
-        for idx, cell in enumerate(ws[1], 1):
-            if cell.value == "RCV":
-                rcv_col = idx
-                break
-        if not rcv_col:
+class FormatDetector:
+    """
+    Per-document pattern preference.
+
+    The carrier layout almost never changes within one estimate, so after the
+    first FORMAT_SAMPLE_SIZE matched items the most common pattern is locked
+    in and tried first for every later line. Other patterns are still tried
+    when it misses.
+    """
+
+    def __init__(self, sample_size=FORMAT_SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self.hits = collections.Counter()
+        self.locked = None
+
+    @property
+    def format(self):
+        """Detected pattern name (locked or leading so far), or None."""
+        if self.locked:
+            return self.locked
+        if self.hits:
+            return self.hits.most_common(1)[0][0]
+        return None
+
+    def match(self, combined_line):
+        result = match_line_item(combined_line, prefer=self.locked)
+        if result[0]:
+            self.hits[result[0]] += 1
+            if self.locked is None and sum(self.hits.values()) >= self.sample_size:
+                self.locked = self.hits.most_common(1)[0][0]
+        return result
+
+
+def _parse_page_text(text, detector=None, page_number=0, classify=assign_trade, log_misses=True):
+    """
+    Parse the text of one page into LineItem records.
+
+    ``detector`` is the document's FormatDetector; pass the same one for every
+    page of a document. ``classify`` maps a description to its trade.
+
+    Items never span pages: continuation lines are only combined within the
+    page they appear on. Returns (items, no_match_count); each miss is also
+    logged as a NO MATCH warning unless ``log_misses`` is false.
+    """
+    if detector is None:
+        detector = FormatDetector()
+    extracted_items = []
+    no_match = 0
+
+    lines = text.split('\n')
+    i = 0
+
+    while i < len(lines):
+        line = lines[i].strip()
+
+        # Check if this line should be skipped
+        if should_skip_line(line):
+            i += 1
             continue
-        # Find the "TOTAL" row
-        for row in range(2, max_row+1):
-            if ws.cell(row=row, column=2).value == "TOTAL":
-                total_row = row
-                break
+
+        # Detect start of a new item (number. ...)
+        if re.match(r"^\d+\.\s", line):
+            # Check if this might be a multi-line format (State Farm/Travelers style)
+            # Where description is on one line and numbers are on the next
+            is_multiline = False
+            if i + 1 < len(lines):
+                next_line = lines[i + 1].strip()
+                # If next line starts with quantity+unit pattern (e.g., "1.00EA"), it's multi-line
+                if re.match(r"^[\d,.]+[A-Z]{2,4}\s", next_line):
+                    is_multiline = True
+                    combined_line = line + " " + next_line
+                    j = i + 2  # Skip both lines
+                else:
+                    # Standard multi-line combining
+                    combined_line = line
+                    j = i + 1
+
+                    # Combine with following lines that are not new items
+                    # Stop if we hit another numbered item, a skip pattern, or empty line
+                    while j < len(lines):
+                        next_line = lines[j].strip()
+
+                        # Stop if new numbered item
+                        if re.match(r"^\d+\.\s", next_line):
+                            break
+
+                        # Stop if this is a skip pattern
+                        if should_skip_line(next_line):
+                            break
+
+                        # Stop if empty line
+                        if not next_line:
+                            break
+
+                        # Continue combining if it looks like a continuation
+                        combined_line += " " + next_line
+                        j += 1
+            else:
+                combined_line = line
+                j = i + 1
+
+            # Try the document's format first
+            matched_pattern, columns, _ = detector.match(combined_line)
+
+            if columns:
+                # Special handling for State Farm 3-line format
+                # Check if next line (after combined_line) contains CONDITION percentage
+                if matched_pattern == "state_farm":
+                    # j points to the line after the combined line
+                    # Check if that line has "Avg. XX%"
+                    if j < len(lines):
+                        condition_line = lines[j].strip()
+                        # Match lines like "Avg. 26.67%" or "Avg. 0%"
+                        if re.match(r'^[A-Za-z.]+\s+\d+(?:\.\d+)?%', condition_line):
+                            # Found CONDITION line, skip it
+                            j += 1
+                        # Also skip blank lines after CONDITION
+                        while j < len(lines) and not lines[j].strip():
+                            j += 1
+
+                description = columns.description
+
+                # Assign trade category
+                trade = classify(description)
+
+                try:
+                    item = LineItem(
+                        int(columns.line_number[:-1]), description, trade,
+                        parse_quantity(columns.quantity), columns.unit,
+                        *(parse_cents(value) for value in columns[4:]),
+                        page=page_number,
+                    )
+                except decimal.InvalidOperation:
+                    # Matched the column shape but a number is garbled (e.g. "1.2.3")
+                    no_match += 1
+                    if log_misses:
+                        logging.warning(f"NO MATCH (numbers): {combined_line[:200]!r}")
+                else:
+                    extracted_items.append(item)
+            else:
+                # Only print NO MATCH for lines that start with numbers (potential line items)
+                if re.match(r"^\d+\.\s", combined_line):
+                    no_match += 1
+                    if log_misses:
+                        logging.warning(f"NO MATCH (combined): {combined_line[:200]!r}")  # Truncate for readability
+
+            i = j  # Skip to next item
         else:
-            continue
-        # Add TOTAL BUDGET row
-        budget_row = total_row + 1
-        ws.cell(row=budget_row, column=2, value="TOTAL BUDGET")
-        rcv_total_cell = f"{get_column_letter(rcv_col)}{total_row}"
-        ws.cell(row=budget_row, column=rcv_col, value=f"={rcv_total_cell}*0.6")
-        # Bold the TOTAL BUDGET row
-        for c in ws[budget_row]:
-            c.font = Font(bold=True)
-    wb.save(filename)
+            i += 1
 
+    return extracted_items, no_match
 
-def add_totals_pie_chart(filename):
-    wb = load_workbook(filename)
-    ws = wb["Totals"]
-    max_row = ws.max_row
 
-    # Find the RCV column index robustly
-    rcv_col = None
-    for idx, cell in enumerate(ws[1], 1):
-        if cell.value and cell.value.strip().upper() == "RCV":
-            rcv_col = idx
-            break
-    if not rcv_col:
-        print("No RCV column found!")
+def open_pdf(source, **kwargs):
+    """pdfplumber.open() a PDF given as a path or as in-memory bytes."""
+    import pdfplumber
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    return pdfplumber.open(source, **kwargs)
+
+
+def pdf_sha256(source):
+    """Content hash of a PDF path or in-memory bytes (the parse cache key)."""
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+    return file_sha256(source)
+
+
+def _pdf_name(source):
+    return f"<{len(source)}-byte PDF>" if isinstance(source, bytes) else source
+
+
+# The line-item table's column header row, matched on a row's characters
+# with spaces removed: DESCRIPTION QUANTITY UNIT PRICE TAX O&P RCV ... ACV
+TABLE_HEADER_REGEX = re.compile(r"DESCRIPTION.*(?:QUANTITY|QTY).*[RA]CV")
+
+
+def find_table_top(page):
+    """
+    Return the top of a pdfplumber page's line-item table (its column header
+    row), or None if the page has no such header.
+
+    Only called on pages the pdfium pre-screen (_screen_table_pages) let
+    through. The page's raw chars are searched for "DESCRIPTION" in drawing
+    order, and only rows where it occurs are checked, without the word and
+    line layout extract_text() does.
+    """
+    chars = page.chars
+    offsets = list(itertools.accumulate(len(char["text"]) for char in chars))
+    text = "".join(char["text"] for char in chars).upper()
+    start = text.find("DESCRIPTION")
+    while start != -1:
+        top = chars[bisect.bisect_right(offsets, start)]["top"]
+        row = sorted((char for char in chars if abs(char["top"] - top) < 1),
+                     key=lambda char: char["x0"])
+        if TABLE_HEADER_REGEX.search("".join(char["text"] for char in row).upper().replace(" ", "")):
+            return min(char["top"] for char in row)
+        start = text.find("DESCRIPTION", start + 1)
+    return None
+
+
+# A line item's "(DEPREC)" or "<DEPREC>" column, the anchor every layout ends on
+TABLE_ROW_REGEX = re.compile(r"[(<][\d,.]+[)>]")
+
+
+def find_table_bottom(page, top):
+    """
+    Return the top of the last row below ``top`` that carries a line item's
+    depreciation column (the table's last item row), or None if there is none.
+
+    Like find_table_top, only the raw chars are searched.
+    """
+    chars = page.chars
+    offsets = list(itertools.accumulate(len(char["text"]) for char in chars))
+    text = "".join(char["text"] for char in chars)
+    bottom = None
+    for match in TABLE_ROW_REGEX.finditer(text):
+        row_top = chars[bisect.bisect_right(offsets, match.start())]["top"]
+        if row_top > top and (bottom is None or row_top > bottom):
+            bottom = row_top
+    return bottom
+
+
+def extract_page_text(page, crop_tables=False):
+    """
+    Text of one pdfplumber page.
+
+    With ``crop_tables`` only the line-item table region is extracted: from
+    the column header row down to the last item row, across the full page
+    width, so letterheads, footers and totals blocks below the table are left
+    out. Pages with text but no column header (cover, photo, recap and
+    summary pages) return None; pages with no text at all return "" so OCR
+    can still pick them up.
+    """
+    if not crop_tables:
+        return page.extract_text()
+    if not page.chars:
+        return ""
+    top = find_table_top(page)
+    if top is None:
+        return None
+    bottom = find_table_bottom(page, top)
+    if bottom is None:
+        # A header with no item rows below it yet (e.g. a description wrapping
+        # onto the next page): keep everything under the header
+        return page.filter(lambda obj: obj["top"] >= top).extract_text()
+    return page.filter(lambda obj: top <= obj["top"] < bottom + 1).extract_text()
+
+
+# Pre-screen for crop_tables, over a whole page's text: the column header
+# words in order, on one line or not. Lenient on purpose; find_table_top()
+# then decides on the pages it lets through.
+TABLE_HEADER_SCREEN_REGEX = re.compile(r"DESCRIPTION.*(?:QUANTITY|QTY).*[RA]CV", re.S)
+
+
+def _screen_table_pages(source, first_page=1, last_page=None):
+    """
+    Pre-screen pages first_page..last_page (1-based, default: to the end)
+    for crop_tables on pdfium's page text, about a millisecond a page where
+    pdfplumber's chars cost a full pdfminer layout. Returns (last_page,
+    {page_number: text}) for the pages that can't hold a line-item table, as
+    extract_page_text() would return them: "" without a text layer, None
+    with text but no column header. Only the other pages need pdfplumber.
+    """
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(source)
+    try:
+        last_page = len(pdf) if last_page is None else last_page
+        skipped = {}
+        for page_number in range(first_page, last_page + 1):
+            page = pdf[page_number - 1]
+            textpage = page.get_textpage()
+            if not textpage.count_chars():
+                skipped[page_number] = ""
+            elif not TABLE_HEADER_SCREEN_REGEX.search(textpage.get_text_range().upper().replace(" ", "")):
+                skipped[page_number] = None
+            textpage.close()
+            page.close()
+        return last_page, skipped
+    finally:
+        pdf.close()
+
+
+def _iter_page_range(pdf_path, first_page=1, last_page=None, crop_tables=False):
+    """
+    Yield (page_number, text) for pages first_page..last_page (1-based,
+    default: to the end). With ``crop_tables``, pages the pdfium pre-screen
+    rules out are never opened with pdfplumber.
+    """
+    skipped = {}
+    page_numbers = range(first_page, last_page + 1) if last_page is not None else None
+    if crop_tables:
+        last_page, skipped = _screen_table_pages(pdf_path, first_page, last_page)
+        page_numbers = [number for number in range(first_page, last_page + 1) if number not in skipped]
+    if page_numbers is None or page_numbers:
+        with open_pdf(pdf_path, pages=page_numbers) as pdf:
+            for page in pdf.pages:
+                while skipped and min(skipped) < page.page_number:
+                    number = min(skipped)
+                    yield number, skipped.pop(number)
+                text = extract_page_text(page, crop_tables)
+                page.close()
+                yield page.page_number, text
+    for number in sorted(skipped):
+        yield number, skipped[number]
+
+
+def _extract_page_range(pdf_path, first_page, last_page, crop_tables=False):
+    """Page-parallel worker: extract text for pages first_page..last_page (1-based)."""
+    return [text for _, text in _iter_page_range(pdf_path, first_page, last_page, crop_tables)]
+
+
+def iter_page_texts(pdf_path, workers=None, ocr=None, crop_tables=False):
+    """
+    Yield (page_number, text) for every page, in page order.
+
+    With ``workers`` > 1 the page range is split into chunks and each chunk is
+    extracted by a separate process that opens the PDF on its own.
+
+    Each page's cached layout objects (chars, words, textmap) are released as
+    soon as its text has been extracted, so memory does not grow with page
+    count.
+
+    ``ocr`` is an optional OcrEngine; pages without a text layer are then
+    OCRed (see OcrEngine.fill_missing). With ``crop_tables`` only each page's
+    line-item table is extracted and pages without one are skipped, with
+    None as their text (see extract_page_text).
+    """
+    pages = _iter_text_layer(pdf_path, workers, crop_tables)
+    if ocr is not None:
+        pages = ocr.fill_missing(pdf_path, pages)
+    skipped = 0
+    for page_number, text in pages:
+        skipped += text is None
+        yield page_number, text
+    if skipped:
+        logging.info(f"Skipped {skipped} page(s) without a line-item table in {_pdf_name(pdf_path)}")
+
+
+def _iter_text_layer(pdf_path, workers=None, crop_tables=False):
+    if not workers or workers <= 1:
+        yield from _iter_page_range(pdf_path, crop_tables=crop_tables)
         return
 
-    # Exclude GRAND TOTAL row (last row)
-    data = Reference(ws, min_col=rcv_col, min_row=1, max_row=max_row-1)
-    labels = Reference(ws, min_col=1, min_row=2, max_row=max_row-1)
+    with open_pdf(pdf_path) as pdf:
+        page_total = len(pdf.pages)
+    # Several chunks per worker so one slow chunk doesn't leave the pool idle
+    chunk_size = max(1, -(-page_total // (workers * 4)))
+    ranges = [(first, min(first + chunk_size - 1, page_total))
+              for first in range(1, page_total + 1, chunk_size)]
+    from concurrent.futures import ProcessPoolExecutor
 
-    # Check data for debugging
-    print("Pie chart data values:", [
-          ws.cell(row=r, column=rcv_col).value for r in range(2, max_row)])
-    print("Pie chart labels:", [ws.cell(row=r, column=1).value for r in range(2, max_row)])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_extract_page_range, pdf_path, first, last, crop_tables)
+                   for first, last in ranges]
+        for (first, _), future in zip(ranges, futures):
+            for offset, text in enumerate(future.result()):
+                yield first + offset, text
 
-    chart = PieChart()
-    chart.add_data(data, titles_from_data=True)
-    chart.set_categories(labels)
-    chart.title = "RCV by Trade"
-    chart.height = 10  # default is 7.5
-    chart.width = 16  # default is 15
 
-    # Place the chart offset rows below the table, in column C
-    offset = 3
-    chart_cell = f"C{max_row + offset}"
-    ws.add_chart(chart, chart_cell)
-    wb.save(filename)
+class OcrEngine:
+    """
+    OCR fallback for pages with no text layer, using a local Tesseract.
 
+    Only pages whose text layer is empty are rasterized and OCRed, on a
+    process pool of ``workers`` (1 runs them inline). OCR text is cached by
+    a hash of the rendered page image when a ParseCache is given, so re-runs
+    skip Tesseract. Picklable, so batch workers can use it.
+    """
 
-def update_totals_with_budget(filename):
-    wb = load_workbook(filename)
-    ws = wb["Totals"]
-    # Add "BUDGET" header
-    ws.insert_cols(ws.max_column + 1)
-    ws.cell(row=1, column=ws.max_column, value="BUDGET")
-    for row in range(2, ws.max_row):  # skip header, skip GRAND TOTAL
-        trade = ws.cell(row=row, column=1).value
-        if trade and trade != "GRAND TOTAL":
-            # Budget is always in ACV column, TOTAL BUDGET row (last row) of each trade sheet
-            trade_ws = wb[trade[:31]]
-            acv_col = None
-            for idx, cell in enumerate(trade_ws[1], 1):
-                if cell.value == "ACV":
-                    acv_col = idx
-                    break
-            if not acv_col:
-                continue
-            # Find "TOTAL BUDGET" row
-            for r in range(2, trade_ws.max_row+1):
-                if trade_ws.cell(row=r, column=2).value == "TOTAL BUDGET":
-                    budget_cell = f"'{trade[:31]}'!{get_column_letter(acv_col)}{r}"
-                    ws.cell(row=row, column=ws.max_column, value=f"={budget_cell}")
-                    break
-    # Add grand total for BUDGET
-    ws.cell(row=1, column=ws.max_column).value = "BUDGET"
-    last_data_row = ws.max_row - 1
-    ws.cell(row=ws.max_row, column=ws.max_column,
-            value=f"=SUM({get_column_letter(ws.max_column)}2:{get_column_letter(ws.max_column)}{last_data_row})")
-    wb.save(filename)
+    def __init__(self, workers=None, cache=None, resolution=300, language="eng"):
+        self.workers = workers
+        self.cache = cache
+        self.resolution = resolution
+        self.language = language
 
+    @staticmethod
+    def available():
+        return shutil.which("tesseract") is not None
 
-def save_to_excel_with_budget(data, excel_path):
-    df = pd.DataFrame(data[1:], columns=data[0])
-
-    # Convert numeric columns to float for calculations
-    for col in ["UNIT PRICE", "TAX", "O&P", "RCV", "DEPREC.", "ACV"]:
-        df[col] = df[col].replace(r'[\$,]', '', regex=True).astype(float)
-
-    with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-        # Master sheet (all items)
-        df.to_excel(writer, sheet_name="Master", index=False)
-
-        # Trade sheets with TOTAL and TOTAL BUDGET rows
-        trade_totals = []
-        for trade, group in df.groupby('TRADE'):
-            group = group.copy()
-            # Calculate totals for numeric columns
-            totals = {col: group[col].sum()
-                      for col in ["UNIT PRICE", "TAX", "O&P", "RCV", "DEPREC.", "ACV"]}
-            # TOTAL row
-            total_row = [""] * len(group.columns)
-            total_row[group.columns.get_loc("TRADE")] = "TOTAL"
-            for col, val in totals.items():
-                total_row[group.columns.get_loc(col)] = val
-            # TOTAL BUDGET row (60% of RCV)
-            budget_row = [""] * len(group.columns)
-            budget_row[group.columns.get_loc("TRADE")] = "TOTAL BUDGET"
-            # Add TOTAL and TOTAL BUDGET rows to DataFrame
-            group = pd.concat([
-                group,
-                pd.DataFrame([total_row], columns=group.columns),
-                pd.DataFrame([budget_row], columns=group.columns)
-            ], ignore_index=True)
-            group.to_excel(writer, sheet_name=trade[:31], index=False)
-            # For Totals sheet
-            trade_totals.append({
-                "TRADE": trade,
-                **{col: float(totals[col]) for col in ["UNIT PRICE", "TAX", "O&P", "RCV", "DEPREC.", "ACV"]}
-            })
-
-        # Totals sheet (summary of all trades)
-        totals_df = pd.DataFrame(trade_totals)
-        totals_df["RCV"] = pd.to_numeric(totals_df["RCV"], errors="coerce")
-        # Add BUDGET column as 60% of RCV
-        totals_df["BUDGET"] = totals_df["RCV"] * 0.6
-        # Add GRAND TOTAL row
-        grand_total = {"TRADE": "GRAND TOTAL"}
-        for col in ["UNIT PRICE", "TAX", "O&P", "RCV", "DEPREC.", "ACV", "BUDGET"]:
-            grand_total[col] = totals_df[col].sum()
-        totals_df = pd.concat([totals_df, pd.DataFrame([grand_total])], ignore_index=True)
-        totals_df.to_excel(writer, sheet_name="Totals", index=False)
+    @property
+    def variant(self):
+        """Cache-key tag for results that include OCR text."""
+        return f"ocr-{self.language}-{self.resolution}"
 
-    # Display key contractor information
-    print("\n" + "="*60)
-    print("CONTRACTOR SUMMARY")
-    print("="*60)
-    grand_total_row = totals_df[totals_df["TRADE"] == "GRAND TOTAL"].iloc[0]
-    print(f"\n💰 INITIAL CHECK (ACV):        ${grand_total_row['ACV']:,.2f}")
-    print(f"💵 TOTAL JOB VALUE (RCV):      ${grand_total_row['RCV']:,.2f}")
-    print(f"⏳ HELD BACK (Depreciation):   ${grand_total_row['DEPREC.']:,.2f}")
-    if grand_total_row['DEPREC.'] == 0:
-        print("   ✅ No depreciation - Full replacement cost coverage")
-    else:
-        pct = (grand_total_row['DEPREC.'] / grand_total_row['RCV']) * 100
-        print(f"   ⚠️  {pct:.1f}% of total held back as depreciation")
-    print(f"\n📊 BUDGET (60% of RCV):        ${grand_total_row['BUDGET']:,.2f}")
-    print("="*60)
-    print("\nDetailed breakdown by trade:")
-    print(totals_df[["TRADE", "RCV", "ACV", "DEPREC.", "BUDGET"]].to_string(index=False))
+    def ocr_page(self, pdf_path, page_number):
+        """Rasterize one page and return its OCR text."""
+        with open_pdf(pdf_path, pages=[page_number]) as pdf:
+            page = pdf.pages[0]
+            image = page.to_image(resolution=self.resolution).original
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            page.close()
+        png = buffer.getvalue()
 
-    # Auto-fit columns for all sheets
-    auto_fit_excel_columns(excel_path)
+        image_hash = hashlib.sha256(png).hexdigest()
+        if self.cache is not None:
+            text = self.cache.get_ocr_text(image_hash, self.language)
+            if text is not None:
+                return text
 
-    # Bold totals
-    bold_total_rows(excel_path)
+        # --psm 6 treats the page as one block, which keeps table rows on one line
+        result = subprocess.run(
+            ["tesseract", "stdin", "stdout", "-l", self.language, "--psm", "6"],
+            input=png, capture_output=True, check=True)
+        text = result.stdout.decode("utf-8", errors="replace")
+        if self.cache is not None:
+            self.cache.put_ocr_text(image_hash, self.language, text)
+        return text
 
-    # Add budget row
-    add_total_budget_rows(excel_path)
+    def fill_missing(self, pdf_path, page_texts):
+        """
+        Pass (page_number, text) pairs through, replacing pages with an empty
+        text layer by their OCR text. Page order is preserved; text-layer
+        pages are yielded as soon as every earlier OCR page has finished.
+        Pages skipped by the table pre-screen (text None) are not OCRed.
+        """
+        if not self.available():
+            logging.warning("tesseract not found on PATH; pages without a text layer are skipped")
+            yield from page_texts
+            return
 
-    # Add hyperlinks
-    # add_trade_hyperlinks(excel_path)
+        pending = collections.deque()
+        pool = None
+        ocr_pages = 0
+        try:
+            for page_number, text in page_texts:
+                if text is None or text.strip():
+                    pending.append((page_number, text))
+                elif self.workers == 1:
+                    pending.append((page_number, self.ocr_page(pdf_path, page_number)))
+                    ocr_pages += 1
+                else:
+                    if pool is None:
+                        from concurrent.futures import ProcessPoolExecutor
+                        pool = ProcessPoolExecutor(max_workers=self.workers)
+                    pending.append((page_number, pool.submit(self.ocr_page, pdf_path, page_number)))
+                    ocr_pages += 1
+                while pending and not (isinstance(pending[0][1], Future) and not pending[0][1].done()):
+                    yield self._resolve(pending.popleft())
+            while pending:
+                yield self._resolve(pending.popleft())
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+        if ocr_pages:
+            logging.info(f"OCRed {ocr_pages} page(s) without a text layer in {_pdf_name(pdf_path)}")
 
-    # Add pie chart
-    add_totals_pie_chart(excel_path)
+    @staticmethod
+    def _resolve(entry):
+        page_number, text = entry
+        if isinstance(text, Future):
+            text = text.result()
+        return page_number, text
 
-    # Add budget totals to totals column
-    # update_totals_with_budget(excel_path)
 
-    logging.info(f"Saved Excel file with trades, master, and totals to {excel_path}")
+def iter_xactimate_items(pdf_path, stats=None, workers=None, metrics=None, ocr=None,
+                         crop_tables=False):
+    """
+    Yield LineItem records page by page.
 
+    Only one page's text and items are held at a time. If a ``stats`` dict is
+    given its counters (pages, items, no_match) and the detected ``format``
+    (pattern name, e.g. "state_farm") are kept current as pages are consumed.
+    ``workers``, ``ocr`` and ``crop_tables`` are passed through to
+    iter_page_texts(). ``metrics`` is an optional ParseMetrics to record
+    timings and counters into.
+    """
+    pages = iter_page_texts(pdf_path, workers=workers, ocr=ocr, crop_tables=crop_tables)
+    yield from _iter_items_from_texts(pages, stats, metrics=metrics)
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Extract Xactimate line items from PDF to Excel by trade with totals.")
-    parser.add_argument("pdf_file", help="Path to the input PDF file")
-    parser.add_argument("excel_file", help="Path to the output Excel file")
-    args = parser.parse_args()
 
-    logging.info(f"Extracting line items from {args.pdf_file} ...")
-    data = extract_xactimate_items(args.pdf_file)
-    if len(data) <= 1:
-        logging.warning("No line items extracted.")
-    else:
-        save_to_excel_with_budget(data, args.excel_file)
+def _iter_items_from_texts(page_texts, stats=None, classify=assign_trade, metrics=None):
+    """Parse (page_number, text) pairs from one document into line items."""
+    detector = FormatDetector()
+    if stats is not None:
+        stats.update(pages=0, items=0, no_match=0, format=None)
+    if metrics is not None:
+        classify = metrics.timed("classification", classify)
+        ready = time.perf_counter()
+
+    for page_number, text in page_texts:
+        if metrics is not None:
+            # Time spent waiting on the page text generator is extraction
+            arrived = time.perf_counter()
+            classified = metrics.stages["classification"]
+        if stats is not None:
+            stats["pages"] += 1
+        if text:
+            items, misses = _parse_page_text(text, detector, page_number, classify)
+        else:
+            items, misses = [], 0
+        if stats is not None:
+            stats["items"] += len(items)
+            stats["no_match"] += misses
+            stats["format"] = detector.format
+        if metrics is not None:
+            parsed = time.perf_counter()
+            metrics.record_page(page_number, arrived - ready, parsed - arrived,
+                                metrics.stages["classification"] - classified,
+                                len(items), misses, len(text or ""))
+        yield from items
+        if metrics is not None:
+            ready = time.perf_counter()
+
+    if metrics is not None:
+        metrics.pattern_hits.update(detector.hits)
+        metrics.format = detector.format
+
+
+def _cache_variant(ocr=None, crop_tables=False):
+    """
+    Cache-key tag for the extraction options that change page text. Cropped
+    text is tagged with a hash of the crop patterns, so editing them
+    invalidates it.
+    """
+    parts = [ocr.variant] if ocr is not None else []
+    if crop_tables:
+        parts.append("tables-" + _crop_fingerprint())
+    return "+".join(parts)
+
+
+def _crop_fingerprint():
+    patterns = [TABLE_HEADER_REGEX.pattern, TABLE_ROW_REGEX.pattern]
+    return hashlib.sha256(json.dumps(patterns).encode()).hexdigest()[:8]
+
+
+def extract_xactimate_items(pdf_path, stats=None, workers=None, cache=None, metrics=None, ocr=None,
+                            crop_tables=False):
+    """
+    Extract line items from a Xactimate PDF (a path, or the PDF's bytes).
+
+    Returns a list whose first row is HEADERS, followed by LineItem records.
+    If a ``stats`` dict is given it is filled in with parse counters (pages,
+    items, no_match) and the detected format. ``workers`` > 1 extracts page
+    text on a process pool; the result is identical to the serial path.
+    ``ocr`` (an OcrEngine) OCRs pages that have no text layer.
+    ``crop_tables`` extracts only each page's line-item table and skips
+    pages without one (see extract_page_text).
+
+    With a ParseCache, a PDF whose content hash was parsed before by the same
+    parser version is returned without opening it. If only the page text is
+    cached (e.g. TRADE_KEYWORDS changed) it is re-parsed from that text.
+    """
+    if cache is None:
+        return [HEADERS] + list(iter_xactimate_items(pdf_path, stats=stats, workers=workers,
+                                                     metrics=metrics, ocr=ocr,
+                                                     crop_tables=crop_tables))
+
+    variant = _cache_variant(ocr, crop_tables)
+    with ParseMetrics.maybe(metrics, "cache_lookup"):
+        pdf_hash = pdf_sha256(pdf_path)
+        hit = cache.get_items(pdf_hash, variant)
+    if hit is not None:
+        items, cached_stats = hit
+        if stats is not None:
+            stats.update(cached_stats)
+        if metrics is not None:
+            metrics.counters["cache_hits"] += 1
+            metrics.format = cached_stats.get("format")
+        return [HEADERS] + items
+
+    with ParseMetrics.maybe(metrics, "cache_lookup"):
+        texts = cache.get_page_texts(pdf_hash, variant)
+    if texts is None:
+        with ParseMetrics.maybe(metrics, "extraction"):
+            texts = [text for _, text in iter_page_texts(pdf_path, workers=workers, ocr=ocr,
+                                                         crop_tables=crop_tables)]
+        cache.put_page_texts(pdf_hash, texts, variant)
+    elif metrics is not None:
+        metrics.counters["cache_text_hits"] += 1
+    run_stats = {}
+    items = list(_iter_items_from_texts(enumerate(texts, 1), run_stats, metrics=metrics))
+    cache.put_items(pdf_hash, items, run_stats, variant)
+    if stats is not None:
+        stats.update(run_stats)
+    return [HEADERS] + items
+
+
+class _JsonListWriter:
+    """
+    The zlib-compressed JSON of a list, built one element at a time (as
+    ParseCache._put() would store the whole list), so a streamed document's
+    cache entry only takes its compressed size in memory.
+    """
+
+    def __init__(self, prefix=b""):
+        self._compressor = zlib.compressobj()
+        self._chunks = [self._compressor.compress(prefix + b"[")]
+        self._separator = b""
+
+    def append(self, value):
+        data = self._separator + json.dumps(value, separators=(",", ":")).encode()
+        self._chunks.append(self._compressor.compress(data))
+        self._separator = b","
+
+    def finish(self, suffix=b""):
+        self._chunks.append(self._compressor.compress(b"]" + suffix))
+        self._chunks.append(self._compressor.flush())
+        return b"".join(self._chunks)
+
+
+def iter_estimate_items(pdf_path, stats=None, workers=None, cache=None, metrics=None, ocr=None,
+                        crop_tables=False):
+    """
+    Iterate a PDF's LineItems, streamed page by page.
+
+    With a ParseCache, a cache hit yields the cached items (the cache stores
+    whole documents, so those are in memory). On a miss the items are still
+    yielded as each page is parsed; the cache entries are built compressed
+    on the way and written once the last page is done.
+    """
+    if cache is None:
+        return iter_xactimate_items(pdf_path, stats=stats, workers=workers, metrics=metrics, ocr=ocr,
+                                    crop_tables=crop_tables)
+    return _iter_cached_items(pdf_path, stats, workers, cache, metrics, ocr, crop_tables)
+
+
+def _iter_cached_items(pdf_path, stats, workers, cache, metrics, ocr, crop_tables):
+    variant = _cache_variant(ocr, crop_tables)
+    with ParseMetrics.maybe(metrics, "cache_lookup"):
+        pdf_hash = pdf_sha256(pdf_path)
+        hit = cache.get_items(pdf_hash, variant)
+    if hit is not None:
+        items, cached_stats = hit
+        if stats is not None:
+            stats.update(cached_stats)
+        if metrics is not None:
+            metrics.counters["cache_hits"] += 1
+            metrics.format = cached_stats.get("format")
+        yield from items
+        return
+
+    with ParseMetrics.maybe(metrics, "cache_lookup"):
+        texts = cache.get_page_texts(pdf_hash, variant)
+    if texts is not None:
+        if metrics is not None:
+            metrics.counters["cache_text_hits"] += 1
+        pages = enumerate(texts, 1)
+        text_entry = None
+    else:
+        pages = iter_page_texts(pdf_path, workers=workers, ocr=ocr, crop_tables=crop_tables)
+        text_entry = _JsonListWriter()
+
+    def recorded(pages):
+        for page_number, text in pages:
+            if text_entry is not None:
+                text_entry.append(text)
+            yield page_number, text
+
+    run_stats = stats if stats is not None else {}
+    items_entry = _JsonListWriter(b'{"items":')
+    for item in _iter_items_from_texts(recorded(pages), run_stats, metrics=metrics):
+        items_entry.append(item.to_json())
+        yield item
+    if text_entry is not None:
+        cache.put_page_texts_data(pdf_hash, text_entry.finish(), variant)
+    cached_stats = {key: run_stats[key] for key in ("pages", "items", "no_match", "format")}
+    cache.put_items_data(pdf_hash, items_entry.finish(b',"stats":' + json.dumps(cached_stats).encode() + b"}"),
+                         variant)
+
+
+class ParseMetrics:
+    """
+    Optional instrumentation for one run: stage timers, per-pattern hit
+    counts, and per-page latency and NO MATCH counts.
+
+    Every instrumented function takes ``metrics=None`` and only does extra
+    work when given one, so a disabled run costs nothing.
+    """
+
+    def __init__(self):
+        self.stages = collections.defaultdict(float)
+        self.counters = collections.Counter()
+        self.pattern_hits = collections.Counter()
+        self.pages = []
+        self.format = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    @staticmethod
+    def maybe(metrics, name):
+        """metrics.stage(name), or a no-op context when metrics is None."""
+        return metrics.stage(name) if metrics is not None else contextlib.nullcontext()
+
+    def timed(self, name, func):
+        """Wrap ``func`` so its run time accumulates into stage ``name``."""
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.stages[name] += time.perf_counter() - start
+        return wrapper
+
+    def record_page(self, page_number, extract_s, parse_s, classify_s, items, no_match, chars):
+        self.stages["extraction"] += extract_s
+        self.stages["matching"] += parse_s - classify_s
+        self.counters["pages"] += 1
+        self.counters["items"] += items
+        self.counters["no_match"] += no_match
+        self.counters["chars"] += chars
+        self.pages.append({
+            "page": page_number, "latency_s": extract_s + parse_s, "extract_s": extract_s,
+            "parse_s": parse_s, "items": items, "no_match": no_match, "chars": chars,
+        })
+
+    def to_dict(self):
+        return {
+            "format": self.format,
+            "stages_s": dict(self.stages),
+            "counters": dict(self.counters),
+            "pattern_hits": dict(self.pattern_hits),
+            "pages": self.pages,
+        }
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
+
+
+# Bump when parsing behaviour changes in a way the fingerprint below can't see
+PARSER_VERSION = "3"
+
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parser_fingerprint():
+    """
+    Stamp for cached parse results: PARSER_VERSION plus everything that
+    decides the output (TRADE_KEYWORDS, the line patterns, the skipped-line
+    patterns, the format detector's sample size). Editing any of them
+    invalidates cached items.
+    """
+    state = {
+        "version": PARSER_VERSION,
+        "trade_keywords": TRADE_KEYWORDS,
+        "layouts": LINE_LAYOUTS,
+        "tokens": {kind: regex.pattern for kind, regex in LINE_TOKENS.items()},
+        "skip": [SKIP_LINE_REGEX.pattern, DIMENSION_HEADER_REGEX.pattern, DIMENSION_HEADER_REGEX.flags],
+        "format_sample_size": FORMAT_SAMPLE_SIZE,
+    }
+    return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def default_cache_dir():
+    if os.environ.get("XACTPARSE_CACHE_DIR"):
+        return os.environ["XACTPARSE_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "xactparse")
+
+
+class ParseCache:
+    """
+    Content-addressed on-disk cache of page text and parsed items (SQLite).
+
+    Page text is keyed by the PDF's SHA-256 and the pdfplumber version; parsed
+    items additionally by parser_fingerprint(). Entries are zlib-compressed
+    JSON. When the total stored size exceeds ``max_bytes`` the least recently
+    used entries are evicted.
+
+    Only the path is pickled, so a cache can be handed to batch workers; each
+    process, and each thread within it, opens its own connection (SQLite
+    connections can't be shared between threads).
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.path = path or os.path.join(default_cache_dir(), "parse-cache.sqlite")
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def __getstate__(self):
+        return {"path": self.path, "max_bytes": self.max_bytes}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, data BLOB NOT NULL,"
+                " size INTEGER NOT NULL, last_used REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            conn.commit()
+        return conn
+
+    def _get(self, key):
+        row = self.conn.execute("SELECT data FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def _put(self, key, value):
+        self._put_data(key, zlib.compress(json.dumps(value, separators=(",", ":")).encode()))
+
+    def _put_data(self, key, data):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, data, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()))
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        with self.conn:
+            for key, size in self.conn.execute(
+                    "SELECT key, size FROM entries ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM entries")
+        self.conn.execute("VACUUM")
+
+    # ``variant`` separates results that include OCR text or were cropped to
+    # the line-item tables from plain text-layer ones (see _cache_variant)
+
+    @staticmethod
+    def _text_key(pdf_hash, variant):
+        import pdfplumber
+        return f"text:{pdfplumber.__version__}:{variant}:{pdf_hash}"
+
+    @staticmethod
+    def _items_key(pdf_hash, variant):
+        return f"items:{parser_fingerprint()}:{variant}:{pdf_hash}"
+
+    def get_page_texts(self, pdf_hash, variant=""):
+        return self._get(self._text_key(pdf_hash, variant))
+
+    def put_page_texts(self, pdf_hash, texts, variant=""):
+        self._put(self._text_key(pdf_hash, variant), texts)
+
+    def get_items(self, pdf_hash, variant=""):
+        value = self._get(self._items_key(pdf_hash, variant))
+        if value is None:
+            return None
+        return [LineItem.from_json(item) for item in value["items"]], value["stats"]
+
+    def put_items(self, pdf_hash, items, stats, variant=""):
+        self._put(self._items_key(pdf_hash, variant),
+                  {"items": [item.to_json() for item in items], "stats": stats})
+
+    # Streamed entries (see iter_estimate_items): built up compressed as the
+    # document is parsed, then stored like the ones above
+
+    def put_page_texts_data(self, pdf_hash, data, variant=""):
+        self._put_data(self._text_key(pdf_hash, variant), data)
+
+    def put_items_data(self, pdf_hash, data, variant=""):
+        self._put_data(self._items_key(pdf_hash, variant), data)
+
+    def get_ocr_text(self, image_hash, language):
+        return self._get(f"ocr:{language}:{image_hash}")
+
+    def put_ocr_text(self, image_hash, language, text):
+        self._put(f"ocr:{language}:{image_hash}", text)
+
+
+NUMERIC_COLUMNS = ["UNIT PRICE", "TAX", "O&P", "RCV", "DEPREC.", "ACV"]
+TOTALS_HEADERS = ["TRADE"] + NUMERIC_COLUMNS + ["BUDGET"]
+BUDGET_RATE = 0.6
+
+
+@functools.lru_cache(maxsize=1)
+def _excel_styles():
+    """(bold font, header font, header border, header alignment), built on first use."""
+    from openpyxl.styles import Alignment, Border, Font, Side
+
+    thin = Side(style="thin")
+    # Same header look pandas' ExcelWriter used to give us
+    return (Font(bold=True), Font(bold=True), Border(left=thin, right=thin, top=thin, bottom=thin),
+            Alignment(horizontal="center", vertical="top"))
+
+
+def budget_cents(rcv_cents):
+    """60% of RCV, rounded half up to the cent."""
+    return (rcv_cents * 6 + 5) // 10
+
+
+# Custom document properties holding a digest of each sheet's generated
+# rows, so an --update can tell which sheets changed without reading them
+SHEET_DIGEST_PREFIX = "xactparse:"
+
+
+def _digest_row(digest, row):
+    digest.update(repr(list(row)).encode("utf-8") + b"\n")
+
+
+def _stamp_sheet_digests(wb, digests):
+    """Store ``digests`` (sheet name -> hashlib object) in the workbook's custom properties."""
+    from openpyxl.packaging.custom import StringProperty
+
+    for name, digest in sorted(digests.items()):
+        wb.custom_doc_props.append(StringProperty(name=SHEET_DIGEST_PREFIX + name, value=digest.hexdigest()))
+
+
+class TradeTotals:
+    """
+    Running per-trade and grand totals, kept in integer cents.
+
+    Items are added one at a time, so totals can be accumulated while items
+    stream past without holding them.
+    """
+
+    def __init__(self):
+        self.by_trade = {}
+        self.item_count = 0
+
+    def add(self, item):
+        sums = self.by_trade.get(item.trade)
+        if sums is None:
+            sums = self.by_trade[item.trade] = [0] * len(MONEY_FIELDS)
+        for idx, cents in enumerate(item[5:11]):
+            sums[idx] += cents
+        self.item_count += 1
+
+    def _row(self, trade, sums, budget):
+        row = {"TRADE": trade}
+        for col, cents in zip(NUMERIC_COLUMNS, sums):
+            row[col] = cents_to_float(cents)
+        row["BUDGET"] = cents_to_float(budget)
+        return row
+
+    def trade_rows(self):
+        """One dict per trade (sorted by name) with TOTALS_HEADERS keys, money as floats."""
+        return [self._row(trade, sums, budget_cents(sums[3]))
+                for trade, sums in sorted(self.by_trade.items())]
+
+    def grand_total(self):
+        """The GRAND TOTAL row; BUDGET is the sum of the per-trade budgets."""
+        sums = [sum(column) for column in zip(*self.by_trade.values())] or [0] * len(MONEY_FIELDS)
+        budget = sum(budget_cents(trade_sums[3]) for trade_sums in self.by_trade.values())
+        return self._row("GRAND TOTAL", sums, budget)
+
+
+class _SheetWriter:
+    """
+    Append rows to a worksheet while tracking the widest value per column,
+    so columns can be auto-fitted without re-reading every cell.
+    """
+
+    def __init__(self, wb, title, header):
+        self.ws = wb.create_sheet(title)
+        self.widths = {}
+        self.rows = 0
+        self.bold, header_font, header_border, header_alignment = _excel_styles()
+        self.append(header)
+        for cell in self.ws[1]:
+            cell.font = header_font
+            cell.border = header_border
+            cell.alignment = header_alignment
+
+    def append(self, values, bold=False):
+        self.ws.append(values)
+        for idx, value in enumerate(values, 1):
+            if value is not None:
+                length = len(str(value))
+                if length > self.widths.get(idx, 0):
+                    self.widths[idx] = length
+        # Count rows ourselves: ws.max_row scans every cell, which made
+        # building a sheet quadratic in its length
+        self.rows += 1
+        if bold:
+            for cell in self.ws[self.rows]:
+                cell.font = self.bold
+        return self.rows
+
+    def auto_fit(self):
+        from openpyxl.utils import get_column_letter
+
+        for idx, max_length in self.widths.items():
+            self.ws.column_dimensions[get_column_letter(idx)].width = max_length + 2
+
+
+def add_totals_pie_chart(ws):
+    """Add the RCV-by-trade pie chart below the table on the Totals sheet."""
+    max_row = ws.max_row
+
+    # Find the RCV column index robustly
+    rcv_col = None
+    for idx, cell in enumerate(ws[1], 1):
+        if cell.value and cell.value.strip().upper() == "RCV":
+            rcv_col = idx
+            break
+    if not rcv_col:
+        logging.warning("No RCV column found on Totals sheet; skipping pie chart")
+        return
+
+    # Check data for debugging
+    logging.debug(f"Pie chart data values: {[ws.cell(row=r, column=rcv_col).value for r in range(2, max_row)]}")
+    logging.debug(f"Pie chart labels: {[ws.cell(row=r, column=1).value for r in range(2, max_row)]}")
+
+    _add_rcv_pie_chart(ws, rcv_col, max_row)
+
+
+def _add_rcv_pie_chart(ws, rcv_col, max_row, anchor_row=None):
+    """
+    Pie chart of column ``rcv_col`` over rows 2..max_row-1 (skipping GRAND
+    TOTAL), placed below ``anchor_row`` (default: max_row).
+    """
+    from openpyxl.chart import PieChart, Reference
+
+    # Exclude GRAND TOTAL row (last row)
+    data = Reference(ws, min_col=rcv_col, min_row=1, max_row=max_row-1)
+    labels = Reference(ws, min_col=1, min_row=2, max_row=max_row-1)
+
+    chart = PieChart()
+    chart.add_data(data, titles_from_data=True)
+    chart.set_categories(labels)
+    chart.title = "RCV by Trade"
+    chart.height = 10  # default is 7.5
+    chart.width = 16  # default is 15
+
+    # Place the chart offset rows below the table, in column C
+    offset = 3
+    chart_cell = f"C{(anchor_row or max_row) + offset}"
+    ws.add_chart(chart, chart_cell)
+
+
+def update_totals_with_budget(filename):
+    from openpyxl import load_workbook
+    from openpyxl.utils import get_column_letter
+
+    wb = load_workbook(filename)
+    ws = wb["Totals"]
+    # Add "BUDGET" header
+    ws.insert_cols(ws.max_column + 1)
+    ws.cell(row=1, column=ws.max_column, value="BUDGET")
+    for row in range(2, ws.max_row):  # skip header, skip GRAND TOTAL
+        trade = ws.cell(row=row, column=1).value
+        if trade and trade != "GRAND TOTAL":
+            # Budget is always in ACV column, TOTAL BUDGET row (last row) of each trade sheet
+            trade_ws = wb[trade[:31]]
+            acv_col = None
+            for idx, cell in enumerate(trade_ws[1], 1):
+                if cell.value == "ACV":
+                    acv_col = idx
+                    break
+            if not acv_col:
+                continue
+            # Find "TOTAL BUDGET" row
+            for r in range(2, trade_ws.max_row+1):
+                if trade_ws.cell(row=r, column=2).value == "TOTAL BUDGET":
+                    budget_cell = f"'{trade[:31]}'!{get_column_letter(acv_col)}{r}"
+                    ws.cell(row=row, column=ws.max_column, value=f"={budget_cell}")
+                    break
+    # Add grand total for BUDGET
+    ws.cell(row=1, column=ws.max_column).value = "BUDGET"
+    last_data_row = ws.max_row - 1
+    ws.cell(row=ws.max_row, column=ws.max_column,
+            value=f"=SUM({get_column_letter(ws.max_column)}2:{get_column_letter(ws.max_column)}{last_data_row})")
+    wb.save(filename)
+
+
+def print_contractor_summary(grand_total, trade_totals):
+    """Print the console summary contractors read: ACV, RCV, depreciation, budget."""
+    print("\n" + "="*60)
+    print("CONTRACTOR SUMMARY")
+    print("="*60)
+    print(f"\n💰 INITIAL CHECK (ACV):        ${grand_total['ACV']:,.2f}")
+    print(f"💵 TOTAL JOB VALUE (RCV):      ${grand_total['RCV']:,.2f}")
+    print(f"⏳ HELD BACK (Depreciation):   ${grand_total['DEPREC.']:,.2f}")
+    if grand_total['DEPREC.'] == 0:
+        print("   ✅ No depreciation - Full replacement cost coverage")
+    else:
+        pct = (grand_total['DEPREC.'] / grand_total['RCV']) * 100
+        print(f"   ⚠️  {pct:.1f}% of total held back as depreciation")
+    print(f"\n📊 BUDGET (60% of RCV):        ${grand_total['BUDGET']:,.2f}")
+    print("="*60)
+    print("\nDetailed breakdown by trade:")
+    columns = ["TRADE", "RCV", "ACV", "DEPREC.", "BUDGET"]
+    rows = [[row["TRADE"]] + [f"{row[col]:.2f}" for col in columns[1:]]
+            for row in trade_totals + [grand_total]]
+    widths = [max(len(col), *(len(row[idx]) for row in rows)) for idx, col in enumerate(columns)]
+    print(" ".join(col.rjust(width) for col, width in zip(columns, widths)))
+    for row in rows:
+        print(" ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def _write_trade_sheet(wb, header, items, trade_total):
+    """Add the sheet for one trade: its items, then its TOTAL and TOTAL BUDGET rows."""
+    from openpyxl.utils import get_column_letter
+
+    trade_idx = header.index("TRADE")
+    rcv_col = header.index("RCV") + 1
+    sheet = _SheetWriter(wb, trade_total["TRADE"][:31], header)
+    for item in items:
+        sheet.append(item.row())
+    # TOTAL row
+    total_row = [None] * len(header)
+    total_row[trade_idx] = "TOTAL"
+    for col in NUMERIC_COLUMNS:
+        total_row[header.index(col)] = trade_total[col]
+    total_row_num = sheet.append(total_row, bold=True)
+    # TOTAL BUDGET row (60% of RCV, as a live formula)
+    budget_row = [None] * len(header)
+    budget_row[trade_idx] = "TOTAL BUDGET"
+    budget_row[rcv_col - 1] = f"={get_column_letter(rcv_col)}{total_row_num}*{BUDGET_RATE}"
+    sheet.append(budget_row, bold=True)
+    sheet.auto_fit()
+    return sheet
+
+
+def save_to_excel_with_budget(data, excel_path, quiet=False, metrics=None):
+    """
+    Write the Master, per-trade and Totals sheets to ``excel_path``.
+
+    The whole workbook (totals, bolding, budget formulas, column widths and
+    the pie chart) is built on one in-memory openpyxl workbook and saved once.
+
+    ``data`` is extract_xactimate_items() output: HEADERS then LineItem records
+    (legacy lists of strings in HEADERS order are also accepted). Totals are
+    summed in integer cents.
+
+    Returns the GRAND TOTAL row as a dict. With ``quiet`` the contractor
+    summary is not printed (used by batch workers). Each step is timed into
+    ``metrics`` (a ParseMetrics) if one is given.
+    """
+    from openpyxl import Workbook
+
+    header = data[0]
+
+    wb = Workbook()
+    wb.remove(wb.active)
+
+    # Master sheet (all items), grouping items by trade on the way through
+    with ParseMetrics.maybe(metrics, "excel.master"):
+        master = _SheetWriter(wb, "Master", header)
+        by_trade = {}
+        totals = TradeTotals()
+        digests = collections.defaultdict(hashlib.sha256)
+        for item in data[1:]:
+            if not isinstance(item, LineItem):
+                item = LineItem.from_row(item)
+            row = item.row()
+            master.append(row)
+            _digest_row(digests["Master"], row)
+            _digest_row(digests[item.trade[:31]], row)
+            by_trade.setdefault(item.trade, []).append(item)
+            totals.add(item)
+        master.auto_fit()
+
+    # Trade sheets with TOTAL and TOTAL BUDGET rows
+    with ParseMetrics.maybe(metrics, "excel.trade_sheets"):
+        trade_totals = totals.trade_rows()
+        for trade_total in trade_totals:
+            _write_trade_sheet(wb, header, by_trade[trade_total["TRADE"]], trade_total)
+
+    # Totals sheet (summary of all trades)
+    with ParseMetrics.maybe(metrics, "excel.totals"):
+        grand_total = totals.grand_total()
+        totals_sheet = _SheetWriter(wb, "Totals", TOTALS_HEADERS)
+        for row in trade_totals:
+            totals_sheet.append([row[col] for col in TOTALS_HEADERS])
+        totals_sheet.append([grand_total[col] for col in TOTALS_HEADERS], bold=True)
+        totals_sheet.auto_fit()
+
+    # Display key contractor information
+    if not quiet:
+        print_contractor_summary(grand_total, trade_totals)
+
+    # Add hyperlinks
+    # add_trade_hyperlinks(excel_path)
+
+    # Add pie chart
+    with ParseMetrics.maybe(metrics, "excel.chart"):
+        add_totals_pie_chart(totals_sheet.ws)
+
+    with ParseMetrics.maybe(metrics, "excel.save"):
+        _stamp_sheet_digests(wb, digests)
+        wb.save(excel_path)
+    logging.info(f"Saved Excel file with trades, master, and totals to {excel_path}")
+    return grand_total
+
+
+# Fixed widths for the streaming workbook (write-only sheets can't be auto-fitted)
+STREAMING_COLUMN_WIDTHS = {"DESCRIPTION": 60, "TRADE": 26, "SOURCE": 30}
+STREAMING_DEFAULT_WIDTH = 13
+
+
+class _StreamingSheetWriter:
+    """_SheetWriter counterpart for a write-only workbook: rows go straight to disk."""
+
+    def __init__(self, wb, title, header):
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.utils import get_column_letter
+
+        self.ws = wb.create_sheet(title)
+        self.rows = 0
+        self._cell = WriteOnlyCell
+        self.bold, header_font, header_border, header_alignment = _excel_styles()
+        for idx, name in enumerate(header, 1):
+            width = STREAMING_COLUMN_WIDTHS.get(name, STREAMING_DEFAULT_WIDTH)
+            self.ws.column_dimensions[get_column_letter(idx)].width = width
+        cells = []
+        for name in header:
+            cell = WriteOnlyCell(self.ws, value=name)
+            cell.font = header_font
+            cell.border = header_border
+            cell.alignment = header_alignment
+            cells.append(cell)
+        self.append(cells)
+
+    def append(self, values, bold=False):
+        if bold:
+            values = [self._bold_cell(value) for value in values]
+        self.ws.append(values)
+        self.rows += 1
+        return self.rows
+
+    def _bold_cell(self, value):
+        cell = self._cell(self.ws, value=value)
+        cell.font = self.bold
+        return cell
+
+
+def _finish_streaming_trade_sheets(wb, sheets, trade_totals, header):
+    """
+    Append the TOTAL and TOTAL BUDGET rows to each streamed trade sheet and
+    move the sheets into trade order, right after Master.
+    """
+    from openpyxl.utils import get_column_letter
+
+    trade_idx = header.index("TRADE")
+    rcv_col = header.index("RCV") + 1
+    for position, trade_total in enumerate(trade_totals, 1):
+        sheet = sheets[trade_total["TRADE"]]
+        total_row = [None] * len(header)
+        total_row[trade_idx] = "TOTAL"
+        for col in NUMERIC_COLUMNS:
+            total_row[header.index(col)] = trade_total[col]
+        total_row_num = sheet.append(total_row, bold=True)
+        budget_row = [None] * len(header)
+        budget_row[trade_idx] = "TOTAL BUDGET"
+        budget_row[rcv_col - 1] = f"={get_column_letter(rcv_col)}{total_row_num}*{BUDGET_RATE}"
+        sheet.append(budget_row, bold=True)
+        # Sheets were created in first-seen order; match the sorted order of the other writer
+        wb.move_sheet(sheet.ws.title, position - wb.index(sheet.ws))
+
+
+def save_to_excel_streaming(items, excel_path, quiet=False, metrics=None):
+    """
+    Constant-memory variant of save_to_excel_with_budget().
+
+    ``items`` is any iterable of LineItem records (e.g. iter_xactimate_items()).
+    Uses an openpyxl write-only workbook, so each row is written to its
+    sheet's temp file as the item arrives and memory stays flat however many
+    items there are. Same sheets, totals, budget formulas and chart; column
+    widths are fixed presets because write-only sheets can't be auto-fitted.
+
+    Returns the GRAND TOTAL row as a dict.
+    """
+    from openpyxl import Workbook
+
+    header = HEADERS
+    wb = Workbook(write_only=True)
+    with ParseMetrics.maybe(metrics, "excel.master"):
+        master = _StreamingSheetWriter(wb, "Master", header)
+        sheets = {}
+        totals = TradeTotals()
+        digests = collections.defaultdict(hashlib.sha256)
+        for item in items:
+            row = item.row()
+            master.append(row)
+            _digest_row(digests["Master"], row)
+            _digest_row(digests[item.trade[:31]], row)
+            sheet = sheets.get(item.trade)
+            if sheet is None:
+                sheet = sheets[item.trade] = _StreamingSheetWriter(wb, item.trade[:31], header)
+            sheet.append(row)
+            totals.add(item)
+
+    with ParseMetrics.maybe(metrics, "excel.trade_sheets"):
+        trade_totals = totals.trade_rows()
+        _finish_streaming_trade_sheets(wb, sheets, trade_totals, header)
+
+    with ParseMetrics.maybe(metrics, "excel.totals"):
+        grand_total = totals.grand_total()
+        totals_sheet = _StreamingSheetWriter(wb, "Totals", TOTALS_HEADERS)
+        for row in trade_totals:
+            totals_sheet.append([row[col] for col in TOTALS_HEADERS])
+        last_row = totals_sheet.append([grand_total[col] for col in TOTALS_HEADERS], bold=True)
+
+    if not quiet:
+        print_contractor_summary(grand_total, trade_totals)
+
+    with ParseMetrics.maybe(metrics, "excel.chart"):
+        _add_rcv_pie_chart(totals_sheet.ws, TOTALS_HEADERS.index("RCV") + 1, last_row)
+
+    with ParseMetrics.maybe(metrics, "excel.save"):
+        _stamp_sheet_digests(wb, digests)
+        wb.save(excel_path)
+    logging.info(f"Saved Excel file with trades, master, and totals to {excel_path}")
+    return grand_total
+
+
+# In-place update of an existing workbook (xactparse revised.pdf --update estimate.xlsx).
+# Rows are rewritten at the zip-part level, so sheets that didn't change are
+# copied across byte for byte instead of being loaded and re-serialized.
+XLSX_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+XLSX_RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PACKAGE_RELATIONSHIPS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CONTENT_TYPES_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+CUSTOM_PROPERTIES_NS = "http://schemas.openxmlformats.org/officeDocument/2006/custom-properties"
+CUSTOM_PROPERTIES_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.custom-properties+xml"
+CUSTOM_PROPERTY_FMTID = "{D5CDD505-2E9C-101B-9397-08002B2CF9AE}"
+VT_TYPES_NS = "http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes"
+TRADE_TOTAL_LABELS = ("TOTAL", "TOTAL BUDGET")
+
+
+class _XlsxCell(collections.namedtuple("_XlsxCell", ["style", "kind", "text", "formula"])):
+    """
+    One worksheet cell as stored in the XML: style index, type (the t
+    attribute, "n" if absent; shared strings are read as "inlineStr"),
+    value text and formula.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def of(cls, value, style=None):
+        """Cell for a value as the workbook writers use them; None for an unstyled blank."""
+        if isinstance(value, _XlsxCell):
+            return value._replace(style=style)
+        if value is None:
+            return cls(style, "n", None, None) if style is not None else None
+        if isinstance(value, str):
+            if value.startswith("="):
+                return cls(style, "n", None, value[1:])
+            return cls(style, "inlineStr", value, None)
+        return cls(style, "n", repr(value), None)
+
+    @property
+    def value(self):
+        """The value in the writers' terms: "=formula", a float, a string or None."""
+        if self.formula is not None:
+            return "=" + self.formula
+        if self.kind == "n":
+            return float(self.text) if self.text else None
+        return self.text
+
+    def moved(self):
+        """This cell on another row; a formula may point at the old row, so only its value is kept."""
+        if self.formula is None:
+            return self
+        return self._replace(kind="inlineStr" if self.kind == "str" else self.kind, formula=None)
+
+    def xml(self, ref):
+        from xml.sax.saxutils import escape
+
+        style = f' s="{self.style}"' if self.style is not None else ""
+        if self.kind == "inlineStr":
+            text = self.text or ""
+            space = ' xml:space="preserve"' if text != text.strip() else ""
+            return f'<c r="{ref}"{style} t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+        kind = f' t="{self.kind}"' if self.kind != "n" else ""
+        formula = f"<f>{escape(self.formula)}</f>" if self.formula is not None else ""
+        value = f"<v>{escape(self.text)}</v>" if self.text is not None else ""
+        return f'<c r="{ref}"{style}{kind}>{formula}{value}</c>'
+
+
+def _xlsx_text(elem):
+    """Text of an <si> or <is> element: its <t>, or its rich-text runs joined."""
+    text = elem.findtext(f"{{{XLSX_MAIN_NS}}}t")
+    if text is not None:
+        return text
+    return "".join(run.findtext(f"{{{XLSX_MAIN_NS}}}t") or ""
+                   for run in elem.iterfind(f"{{{XLSX_MAIN_NS}}}r"))
+
+
+def _iter_xlsx_rows(stream, strings, limit=None):
+    """Yield (row number, {column: _XlsxCell}) from worksheet XML, up to row ``limit`` if given."""
+    import xml.etree.ElementTree as ET
+    from openpyxl.utils import column_index_from_string
+
+    ns = f"{{{XLSX_MAIN_NS}}}"
+    number = 0
+    for _, elem in ET.iterparse(stream):
+        if elem.tag != ns + "row":
+            continue
+        number = int(elem.get("r") or number + 1)
+        cells = {}
+        column = 0
+        for cell in elem.iterfind(ns + "c"):
+            ref = cell.get("r")
+            column = column_index_from_string(ref.rstrip("0123456789")) if ref else column + 1
+            kind = cell.get("t", "n")
+            formula = cell.find(ns + "f")
+            # Shared and array formulas only make sense in place; keep their values
+            formula = formula.text if formula is not None and not formula.get("t") and formula.text else None
+            if kind == "inlineStr":
+                inline = cell.find(ns + "is")
+                text = _xlsx_text(inline) if inline is not None else ""
+            else:
+                text = cell.findtext(ns + "v") or None
+                if kind == "s" and text is not None:
+                    kind, text = "inlineStr", strings()[int(text)]
+            cells[column] = _XlsxCell(cell.get("s"), kind, text, formula)
+        elem.clear()
+        yield number, cells
+        if limit is not None and number >= limit:
+            return
+
+
+def _xlsx_sheet_width(stream):
+    """The last column of a worksheet's <dimension> range, or None if it doesn't give one."""
+    import xml.etree.ElementTree as ET
+    from openpyxl.utils import range_boundaries
+
+    for _, elem in ET.iterparse(stream, events=("start",)):
+        if elem.tag == f"{{{XLSX_MAIN_NS}}}dimension":
+            ref = elem.get("ref", "")
+            # A single cell ("A1") is what some writers put for any sheet
+            return range_boundaries(ref)[2] if ":" in ref else None
+        if elem.tag == f"{{{XLSX_MAIN_NS}}}sheetData":
+            return None
+    return None
+
+
+def _rels_part(part):
+    """The relationships part of ``part`` ("" for the package itself)."""
+    folder, name = posixpath.split(part)
+    return posixpath.join(folder, "_rels", name + ".rels")
+
+
+def _remove_elements(root, key, value):
+    for elem in list(root):
+        if elem.get(key) == value:
+            root.remove(elem)
+
+
+class _WorkbookSheet:
+    """
+    A worksheet read back for an update. ``columns`` maps each expected
+    header (``names``) to its column, wherever the user has moved it, and
+    ``added`` lists the other columns that hold anything, headed or not.
+    Rows are (number, cells, values) with ``values`` in ``names`` order;
+    unless ``complete``, only the first data row was read.
+    """
+
+    def __init__(self, rows, names, complete=True):
+        self.complete = complete
+        self.header = rows[0][1] if rows and rows[0][0] == 1 else {}
+        found = {cell.text.strip(): column for column, cell in self.header.items()
+                 if cell.kind == "inlineStr" and cell.text}
+        self.missing = [name for name in names if name not in found]
+        self.columns = [found.get(name) for name in names]
+        used = {column for _, cells in rows for column, cell in cells.items() if cell.value is not None}
+        self.added = sorted(used - set(self.columns))
+        self.rows = []  # rows with generated values
+        self.user_rows = []  # rows the user added (no generated values)
+        for number, cells in rows:
+            if number == 1:
+                continue
+            values = tuple(cells[column].value if column in cells else None for column in self.columns)
+            if any(value is not None for value in values):
+                self.rows.append((number, cells, values))
+            else:
+                self.user_rows.append((number, cells, values))
+
+    def data_styles(self):
+        """Column -> style of the first generated row, for cells that have no old counterpart."""
+        if not self.rows:
+            return {}
+        cells = self.rows[0][1]
+        return {column: cells[column].style for column in self.columns if column in cells}
+
+
+class _XlsxPackage:
+    """
+    An existing .xlsx opened for an in-place update.
+
+    Worksheets are read with ElementTree. A rewritten worksheet only has its
+    <sheetData> and <dimension> replaced, so the rest of the part (column
+    widths, views, merged cells, its drawing) stays as it was. The only other
+    parts changed are the custom document properties holding the sheet
+    digests and, in a workbook Excel has saved, the calculation chain, which
+    is dropped (Excel rebuilds it) with its relationship and content type;
+    those are edited with ElementTree. Adding and removing sheets is left to
+    openpyxl (see _restructure_workbook). save() copies every other part,
+    the workbook part included, unchanged.
+    """
+
+    def __init__(self, path):
+        import xml.etree.ElementTree as ET
+        import zipfile
+
+        self.path = path
+        try:
+            self.zip = zipfile.ZipFile(path)
+        except zipfile.BadZipFile:
+            raise ValueError(f"{path} is not an Excel workbook") from None
+        self.parts = {}  # part name -> new bytes, or None to drop it
+        self._strings = None
+        self.workbook_part = next((target for rel_type, target in self.rels("").values()
+                                   if rel_type.endswith("/officeDocument")), None)
+        if self.workbook_part is None:
+            self.zip.close()
+            raise ValueError(f"{path} is not an Excel workbook")
+        self.workbook_rels = self.rels(self.workbook_part)
+        root = ET.fromstring(self.zip.read(self.workbook_part))
+        self.sheet_parts = {}  # sheet name -> part, in workbook order
+        for elem in root.iter(f"{{{XLSX_MAIN_NS}}}sheet"):
+            self.sheet_parts[elem.get("name")] = self.workbook_rels[elem.get(f"{{{XLSX_RELATIONSHIPS_NS}}}id")][1]
+
+    def read(self, part):
+        data = self.parts.get(part)
+        return data if data is not None else self.zip.read(part)
+
+    def rels(self, part):
+        """Relationship id -> (type, part name) for ``part`` ("" for the package itself)."""
+        import xml.etree.ElementTree as ET
+
+        rels_part = _rels_part(part)
+        if rels_part not in self.parts and rels_part not in self.zip.namelist():
+            return {}
+        folder = posixpath.dirname(part)
+        rels = {}
+        for elem in ET.fromstring(self.read(rels_part)):
+            if elem.get("TargetMode") == "External":
+                continue
+            target = elem.get("Target")
+            target = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(folder, target))
+            rels[elem.get("Id")] = (elem.get("Type"), target)
+        return rels
+
+    def edit_xml(self, part, namespace, edit):
+        """
+        Apply ``edit`` to the ElementTree root of ``part``. Only for parts whose
+        unprefixed elements are all in ``namespace`` and that don't name
+        namespace prefixes in attribute values (mc:Ignorable), since
+        ElementTree renames prefixes.
+        """
+        import xml.etree.ElementTree as ET
+
+        root = ET.fromstring(self.read(part))
+        edit(root)
+        # The part's own namespace as the default one, as Excel writes it
+        # (tostring's default_namespace rejects unprefixed attributes); the
+        # prefixes openpyxl registers are put back afterwards
+        registered = dict(ET._namespace_map)
+        ET.register_namespace("", namespace)
+        try:
+            self.parts[part] = ET.tostring(root, encoding="UTF-8", xml_declaration=True)
+        finally:
+            ET._namespace_map.clear()
+            ET._namespace_map.update(registered)
+
+    def strings(self):
+        """The shared string table, loaded on first use."""
+        if self._strings is None:
+            import xml.etree.ElementTree as ET
+
+            self._strings = []
+            for rel_type, target in self.workbook_rels.values():
+                if rel_type.endswith("/sharedStrings"):
+                    with self.zip.open(target) as stream:
+                        for _, elem in ET.iterparse(stream):
+                            if elem.tag == f"{{{XLSX_MAIN_NS}}}si":
+                                self._strings.append(_xlsx_text(elem))
+                                elem.clear()
+        return self._strings
+
+    def read_sheet(self, name, names, complete=False):
+        """
+        Sheet ``name`` as a _WorkbookSheet (None if there's no such sheet).
+        Only the header and first data row are read unless ``complete`` or
+        the sheet's <dimension> reaches past the generated columns: the user
+        may have added columns, whose notes have to be carried over.
+        """
+        part = self.sheet_parts.get(name)
+        if part is None:
+            return None
+        if not complete:
+            with self.zip.open(part) as stream:
+                width = _xlsx_sheet_width(stream)
+            complete = width is None or width > len(names)
+        with self.zip.open(part) as stream:
+            return _WorkbookSheet(list(_iter_xlsx_rows(stream, self.strings, None if complete else 2)),
+                                  names, complete)
+
+    def sheet_digests(self):
+        """Sheet name -> digest of its rows, as stamped by the workbook writers ({} if none)."""
+        import xml.etree.ElementTree as ET
+
+        part = self._custom_properties_part()
+        if part is None:
+            return {}
+        digests = {}
+        for elem in ET.fromstring(self.read(part)):
+            name = elem.get("name", "")
+            if name.startswith(SHEET_DIGEST_PREFIX) and len(elem):
+                digests[name[len(SHEET_DIGEST_PREFIX):]] = elem[0].text
+        return digests
+
+    def stamp_digests(self, digests):
+        """Replace the sheet digests in the custom document properties, keeping any others."""
+        import xml.etree.ElementTree as ET
+
+        part = self._custom_properties_part()
+        if part is None:
+            part = "docProps/custom.xml"
+            self.parts[part] = f'<Properties xmlns="{CUSTOM_PROPERTIES_NS}"/>'.encode("utf-8")
+
+            def add_relationship(root):
+                ids = {elem.get("Id") for elem in root}
+                rel_id = next(f"rId{n}" for n in itertools.count(1) if f"rId{n}" not in ids)
+                ET.SubElement(root, f"{{{PACKAGE_RELATIONSHIPS_NS}}}Relationship", Id=rel_id,
+                              Type=f"{XLSX_RELATIONSHIPS_NS}/custom-properties", Target=part)
+            self.edit_xml("_rels/.rels", PACKAGE_RELATIONSHIPS_NS, add_relationship)
+            self.edit_xml("[Content_Types].xml", CONTENT_TYPES_NS, lambda root: ET.SubElement(
+                root, f"{{{CONTENT_TYPES_NS}}}Override", PartName="/" + part,
+                ContentType=CUSTOM_PROPERTIES_CONTENT_TYPE))
+
+        def replace_digests(root):
+            for elem in list(root):
+                if elem.get("name", "").startswith(SHEET_DIGEST_PREFIX):
+                    root.remove(elem)
+            first = max((int(elem.get("pid", 1)) for elem in root), default=1) + 1
+            for pid, (name, digest) in enumerate(sorted(digests.items()), first):
+                prop = ET.SubElement(root, f"{{{CUSTOM_PROPERTIES_NS}}}property", fmtid=CUSTOM_PROPERTY_FMTID,
+                                     pid=str(pid), name=SHEET_DIGEST_PREFIX + name)
+                ET.SubElement(prop, f"{{{VT_TYPES_NS}}}lpwstr").text = digest
+        self.edit_xml(part, CUSTOM_PROPERTIES_NS, replace_digests)
+
+    def _custom_properties_part(self):
+        for rel_type, target in self.rels("").values():
+            if rel_type.endswith("/custom-properties"):
+                return target
+        return None
+
+    def write_sheet(self, name, rows):
+        """Replace the rows of sheet ``name`` with ``rows`` (cell dicts, numbered from 1)."""
+        from openpyxl.utils import get_column_letter
+
+        xml = []
+        width = 1
+        for number, cells in enumerate(rows, 1):
+            xml.append(f'<row r="{number}">')
+            for column in sorted(cells):
+                xml.append(cells[column].xml(f"{get_column_letter(column)}{number}"))
+            width = max(width, *cells) if cells else width
+            xml.append("</row>")
+        part = self.sheet_parts[name]
+        text = self.read(part).decode("utf-8")
+        match = re.search(r"<sheetData\s*/>|<sheetData\b.*</sheetData>", text, re.S)
+        if match is None:
+            raise ValueError(f"{self.path}: can't find the rows of sheet {name!r}")
+        text = text[:match.start()] + "<sheetData>" + "".join(xml) + "</sheetData>" + text[match.end():]
+        dimension = f'<dimension ref="A1:{get_column_letter(width)}{len(rows)}"/>'
+        self.parts[part] = re.sub(r"<dimension\b[^>]*/>", dimension, text, count=1).encode("utf-8")
+
+    def save(self, path=None):
+        """
+        Write the updated workbook to ``path``, or over the original (via a
+        temporary file in the same directory).
+        """
+        import tempfile
+        import zipfile
+
+        # Excel's calculation chain lists formula cells by address, and the
+        # rewritten sheets have moved some; Excel rebuilds it when it's missing
+        for rel_id, (rel_type, target) in self.workbook_rels.items():
+            if rel_type.endswith("/calcChain"):
+                self.parts[target] = None
+                self.edit_xml(_rels_part(self.workbook_part), PACKAGE_RELATIONSHIPS_NS,
+                              lambda root: _remove_elements(root, "Id", rel_id))
+                self.edit_xml("[Content_Types].xml", CONTENT_TYPES_NS,
+                              lambda root: _remove_elements(root, "PartName", "/" + target))
+
+        if path is None:
+            fd, temp_path = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(os.path.abspath(self.path)))
+            os.close(fd)
+        else:
+            temp_path = path
+        try:
+            with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as out:
+                for info in self.zip.infolist():
+                    data = self.parts.pop(info.filename, False)
+                    if data is None:
+                        continue
+                    out.writestr(info, self.zip.read(info) if data is False else data)
+                for part, data in self.parts.items():
+                    if data is not None:
+                        out.writestr(part, data)
+            if path is None:
+                shutil.copymode(self.path, temp_path)
+                os.replace(temp_path, self.path)
+        except BaseException:
+            if path is None:
+                os.unlink(temp_path)
+            raise
+        finally:
+            self.zip.close()
+
+    def close(self):
+        self.zip.close()
+
+
+def _merge_row(number, values, columns, old=None, styles=None):
+    """
+    Cells for row ``number`` of a rewritten sheet: ``values`` in
+    ``columns``, merged with the cells of ``old`` (the row it replaces, as
+    (number, cells, values)). An unchanged row keeps all of its cells; a
+    changed one keeps its styles and the columns the user added.
+    """
+    if old is None:
+        old_cells = {}
+    else:
+        old_number, old_cells, old_values = old
+        if old_number != number and any(cell.formula is not None for cell in old_cells.values()):
+            old_cells = {column: cell.moved() for column, cell in old_cells.items()}
+        if old_values == values:
+            return old_cells
+    generated = set(columns)
+    cells = {column: cell for column, cell in old_cells.items() if column not in generated}
+    for column, value in zip(columns, values):
+        old_cell = old_cells.get(column)
+        style = old_cell.style if old_cell is not None else (styles or {}).get(column)
+        cell = _XlsxCell.of(value, style)
+        if cell is not None:
+            cells[column] = cell
+    return cells
+
+
+def _without_line_number(values):
+    label = values[0]
+    return (label.partition(". ")[2] if isinstance(label, str) else label,) + values[1:]
+
+
+def _pair_rows(old_rows, items, new_rows):
+    """
+    The old row each item continues (or None), in items order.
+
+    Rows pair on identical values first, then on identical values but for
+    the line number; the rest are paired with diff_estimates() on the items
+    they hold. So a row (and any note beside it) stays with its item when
+    lines are renumbered, reworded or have their quantities changed. Rows
+    that no longer parse as an item (edited by hand) aren't paired.
+    """
+    paired = [None] * len(new_rows)
+    leftover = old_rows
+    for key in (tuple, _without_line_number):
+        same = {}
+        for row in leftover:
+            same.setdefault(key(row[2]), collections.deque()).append(row)
+        for idx, values in enumerate(new_rows):
+            if paired[idx] is None and same.get(key(values)):
+                paired[idx] = same[key(values)].popleft()
+        leftover = sorted((row for rows in same.values() for row in rows), key=lambda row: row[0])
+    unpaired = [idx for idx, row in enumerate(paired) if row is None]
+    if not leftover or not unpaired:
+        return paired
+
+    old_items = []
+    row_of = {}
+    for row in leftover:
+        try:
+            item = LineItem.from_row(row[2])
+        except (ValueError, TypeError, AttributeError, ArithmeticError):
+            continue
+        old_items.append(item)
+        row_of[id(item)] = row
+    index_of = {id(items[idx]): idx for idx in unpaired}
+    for entry in diff_estimates(old_items, [items[idx] for idx in unpaired]):
+        if entry.original is not None and entry.revised is not None:
+            paired[index_of[id(entry.revised)]] = row_of[id(entry.original)]
+    return paired
+
+
+def _rewrite_sheet(package, name, sheet, rows, footer=(), bold=None):
+    """
+    Write ``rows`` and then ``footer`` (both (values, old row) pairs) under
+    ``sheet``'s header, followed by the rows the user added. Footer rows
+    with no old row to take styles from are set in ``bold``.
+    """
+    cells = [sheet.header]
+    styles = sheet.data_styles()
+    for values, old in rows:
+        cells.append(_merge_row(len(cells) + 1, values, sheet.columns, old, styles))
+    bold_styles = {column: bold for column in sheet.columns}
+    for values, old in footer:
+        cells.append(_merge_row(len(cells) + 1, values, sheet.columns, old, bold_styles))
+    for old in sheet.user_rows:
+        cells.append(_merge_row(len(cells) + 1, old[2], sheet.columns, old))
+    package.write_sheet(name, cells)
+
+
+def _notes_lost(sheet, rows):
+    """How many of ``sheet``'s rows with something in an added column aren't carried into ``rows``."""
+    kept = {id(old) for _, old in rows if old is not None}
+    added = set(sheet.added)
+    return sum(1 for row in sheet.rows if id(row) not in kept
+               and any(cell.value is not None for column, cell in row[1].items() if column in added))
+
+
+def _check_sheet(excel_path, name, sheet):
+    if sheet is None:
+        raise ValueError(f"{excel_path} has no {name} sheet; only workbooks xactparse wrote can be updated")
+    if sheet.missing:
+        raise ValueError(f"{excel_path}: the {name} sheet has no {', '.join(sheet.missing)} column")
+    return sheet
+
+
+def _update_trade_sheet(package, trade, items, new_rows, trade_total, bold):
+    """Rewrite the sheet for ``trade``; returns how many noted rows were dropped."""
+    from openpyxl.utils import get_column_letter
+
+    name = trade[:31]
+    trade_idx = HEADERS.index("TRADE")
+    sheet = _check_sheet(package.path, name, package.read_sheet(name, HEADERS))
+    old_rows = [row for row in sheet.rows if row[2][trade_idx] not in TRADE_TOTAL_LABELS]
+    old_totals = {row[2][trade_idx]: row for row in sheet.rows if row[2][trade_idx] in TRADE_TOTAL_LABELS}
+    if not sheet.complete:
+        old_rows, old_totals = [], {}
+
+    rows = list(zip(new_rows, _pair_rows(old_rows, items, new_rows)))
+    total_row_num = len(rows) + 2
+    rcv_col = get_column_letter(sheet.columns[HEADERS.index("RCV")])
+    total = dict(trade_total, TRADE="TOTAL")
+    # With its result cached: a workbook Excel saved isn't recalculated on opening
+    budget_formula = _XlsxCell(None, "n", repr(trade_total["RCV"] * BUDGET_RATE),
+                               f"{rcv_col}{total_row_num}*{BUDGET_RATE}")
+    budget = {"TRADE": "TOTAL BUDGET", "RCV": budget_formula}
+    footer = [(tuple(total.get(col) for col in HEADERS), old_totals.get("TOTAL")),
+              (tuple(budget.get(col) for col in HEADERS), old_totals.get("TOTAL BUDGET"))]
+    _rewrite_sheet(package, name, sheet, rows, footer, bold)
+    return _notes_lost(sheet, rows + footer)
+
+
+def _restructure_workbook(path, added, removed, by_trade, trade_totals, trade_sheets, rcv_col):
+    """
+    Add the sheets of ``added`` trades and remove those of ``removed`` ones
+    with openpyxl, which takes care of the workbook part, relationships and
+    content types, then draw the Totals pie chart again over its new rows.
+    openpyxl reads charts and images back in but not shapes or text boxes,
+    so those are lost from any sheet that has them.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path)
+    active = wb.active.title if wb.active is not None else None
+    for trade in removed:
+        wb.remove(wb[trade[:31]])
+        trade_sheets.discard(trade[:31])
+    totals_by_trade = {row["TRADE"]: row for row in trade_totals}
+    for trade in added:
+        name = trade[:31]
+        sheet = _write_trade_sheet(wb, HEADERS, by_trade[trade], totals_by_trade[trade])
+        after = max((other for other in trade_sheets if other < name), default="Master")
+        wb.move_sheet(sheet.ws, wb.index(wb[after]) + 1 - wb.index(sheet.ws))
+        trade_sheets.add(name)
+    if active not in wb.sheetnames:
+        wb.active = wb["Master"]
+        wb["Master"].sheet_view.tabSelected = True
+    else:
+        wb.active = wb[active]
+    wb["Totals"]._charts.clear()
+    _add_rcv_pie_chart(wb["Totals"], rcv_col, len(trade_totals) + 2)
+    wb.save(path)
+
+
+def _save_restructured(package, excel_path, *restructure):
+    """package.save() then _restructure_workbook(), replacing ``excel_path`` only once both succeed."""
+    import tempfile
+
+    fd, temp_path = tempfile.mkstemp(suffix=".xlsx", dir=os.path.dirname(os.path.abspath(excel_path)))
+    os.close(fd)
+    try:
+        package.save(temp_path)
+        _restructure_workbook(temp_path, *restructure)
+        shutil.copymode(excel_path, temp_path)
+        os.replace(temp_path, excel_path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def update_excel_workbook(data, excel_path, quiet=False, metrics=None):
+    """
+    Update a workbook written by save_to_excel_with_budget() (or the
+    streaming writer) in place for a revised estimate.
+
+    ``data`` is extract_xactimate_items() output for the revision. Only the
+    trade sheets whose rows differ are rewritten, along with Master and
+    Totals; every other part of the file (unchanged trade sheets, the
+    user's own sheets) is copied across as it is. Which sheets changed is
+    read from the row digests the writers stamp into the workbook; in a
+    workbook without them, every trade sheet counts as changed.
+
+    Columns the user added next to the generated ones (notes, headed or
+    not) survive: on a sheet that has them, each row keeps its cells and
+    follows its item (see _pair_rows()), and Totals rows follow their trade.
+    Other rewritten sheets are regenerated under their existing header row.
+    When trades are added or removed, their sheets are added or removed
+    through openpyxl and the pie chart is redrawn (see _restructure_workbook).
+
+    Raises ValueError if ``excel_path`` isn't a single-estimate workbook
+    xactparse wrote. Returns the GRAND TOTAL row as a dict.
+    """
+    items = [item if isinstance(item, LineItem) else LineItem.from_row(item) for item in data[1:]]
+    by_trade = {}
+    new_by_trade = {}
+    new_rows = []
+    totals = TradeTotals()
+    digests = collections.defaultdict(hashlib.sha256)
+    for item in items:
+        row = item.row()
+        _digest_row(digests["Master"], row)
+        _digest_row(digests[item.trade[:31]], row)
+        row = tuple(row)
+        new_rows.append(row)
+        by_trade.setdefault(item.trade, []).append(item)
+        new_by_trade.setdefault(item.trade, []).append(row)
+        totals.add(item)
+    digests = {name: digest.hexdigest() for name, digest in digests.items()}
+    trade_totals = totals.trade_rows()
+    grand_total = totals.grand_total()
+
+    package = _XlsxPackage(excel_path)
+    try:
+        with ParseMetrics.maybe(metrics, "excel.read"):
+            old_digests = package.sheet_digests()
+            master = _check_sheet(excel_path, "Master",
+                                  package.read_sheet("Master", HEADERS, complete="Master" not in old_digests))
+            if any(cell.text == "SOURCE" for cell in master.header.values()):
+                raise ValueError(f"{excel_path} is a consolidated workbook; rebuild it with xactparse consolidate")
+            totals_sheet = _check_sheet(excel_path, "Totals",
+                                        package.read_sheet("Totals", TOTALS_HEADERS, complete=True))
+        old_totals = {row[2][0]: row for row in totals_sheet.rows}
+        old_trades = [trade for trade in old_totals if trade != "GRAND TOTAL"]
+        trade_sheets = {trade[:31] for trade in old_trades if trade[:31] in package.sheet_parts}
+        added = [trade for trade in sorted(by_trade) if trade[:31] not in trade_sheets]
+        removed = [trade for trade in old_trades if trade not in by_trade and trade[:31] in trade_sheets]
+        # Without digests (a workbook from an older xactparse) every sheet is rewritten once
+        master_changed = old_digests.get("Master") != digests["Master"]
+        changed = [trade for trade in sorted(by_trade) if trade[:31] in trade_sheets
+                   and old_digests.get(trade[:31]) != digests[trade[:31]]]
+
+        if not master_changed and not changed and not added and not removed:
+            logging.info(f"{excel_path} is already up to date")
+        else:
+            with ParseMetrics.maybe(metrics, "excel.sheets"):
+                grand_total_row = old_totals.get("GRAND TOTAL")
+                bold = grand_total_row[1][totals_sheet.columns[0]].style if grand_total_row else None
+                old_rows = master.rows if master.complete else []
+                rows = list(zip(new_rows, _pair_rows(old_rows, items, new_rows)))
+                lost = _notes_lost(master, rows)
+                _rewrite_sheet(package, "Master", master, rows)
+
+                totals_by_trade = {row["TRADE"]: row for row in trade_totals}
+                for trade in changed:
+                    lost += _update_trade_sheet(package, trade, by_trade[trade], new_by_trade[trade],
+                                                totals_by_trade[trade], bold)
+                for trade in removed:
+                    lost += _notes_lost(package.read_sheet(trade[:31], HEADERS), [])
+
+                rows = [(tuple(row[col] for col in TOTALS_HEADERS), old_totals.get(row["TRADE"]))
+                        for row in trade_totals]
+                footer = [(tuple(grand_total[col] for col in TOTALS_HEADERS), grand_total_row)]
+                lost += _notes_lost(totals_sheet, rows + footer)
+                _rewrite_sheet(package, "Totals", totals_sheet, rows, footer, bold)
+                package.stamp_digests(digests)
+
+            if lost:
+                logging.warning(f"{lost} rows with notes in added columns belonged to items that "
+                                f"are gone from the estimate; those notes were dropped")
+            untouched = len(package.sheet_parts) - 2 - len(changed) - len(removed)
+            with ParseMetrics.maybe(metrics, "excel.save"):
+                if added or removed:
+                    drawn = [name for name, part in package.sheet_parts.items() if name != "Totals"
+                             and any(rel_type.endswith("/drawing") for rel_type, _ in package.rels(part).values())]
+                    if drawn:
+                        logging.warning(f"Adding or removing trade sheets re-saves the workbook through "
+                                        f"openpyxl; shapes and text boxes on {', '.join(drawn)} are dropped")
+                    rcv_col = totals_sheet.columns[TOTALS_HEADERS.index("RCV")]
+                    _save_restructured(package, excel_path, added, removed, by_trade, trade_totals,
+                                       trade_sheets, rcv_col)
+                else:
+                    package.save()
+            logging.info(f"Updated {excel_path}: rewrote Master, Totals and {len(changed)} trade "
+                         f"sheets, added {len(added)}, removed {len(removed)}; "
+                         f"{untouched} sheets untouched")
+            logging.debug(f"Rewritten trade sheets: {'; '.join(changed)}")
+    finally:
+        package.close()
+
+    if not quiet:
+        print_contractor_summary(grand_total, trade_totals)
+    return grand_total
+
+
+OUTPUT_FORMATS = ["xlsx", "xlsx-stream", "csv", "jsonl", "parquet"]
+OUTPUT_EXTENSIONS = {"xlsx": ".xlsx", "xlsx-stream": ".xlsx", "csv": ".csv",
+                     "jsonl": ".jsonl", "parquet": ".parquet"}
+# Columns of the flat (csv/jsonl/parquet) item output
+ITEM_FIELDS = ["page", "line_number", "description", "trade", "quantity", "unit"] + MONEY_FIELDS
+PARQUET_BATCH_ROWS = 10000
+
+
+def totals_path(path):
+    """Companion per-trade summary file for a flat output, e.g. out.csv -> out.totals.csv."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.totals{ext}"
+
+
+def _write_items_csv(items, path, totals):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(ITEM_FIELDS)
+        for item in items:
+            writer.writerow([item.page, item.line_number, item.description, item.trade,
+                             item.quantity, item.unit,
+                             *(cents_to_decimal(getattr(item, field)) for field in MONEY_FIELDS)])
+            totals.add(item)
+
+
+def _write_items_jsonl(items, path, totals):
+    with open(path, "w") as f:
+        for item in items:
+            record = {"page": item.page, "line_number": item.line_number,
+                      "description": item.description, "trade": item.trade,
+                      "quantity": float(item.quantity), "unit": item.unit}
+            for field in MONEY_FIELDS:
+                record[field] = cents_to_float(getattr(item, field))
+            f.write(json.dumps(record) + "\n")
+            totals.add(item)
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet output needs pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+def _write_items_parquet(items, path, totals):
+    pa = _pyarrow()
+    money = pa.decimal128(14, 2)
+    schema = pa.schema([("page", pa.int32()), ("line_number", pa.int32()),
+                        ("description", pa.string()), ("trade", pa.string()),
+                        ("quantity", pa.float64()), ("unit", pa.string())]
+                       + [(field, money) for field in MONEY_FIELDS])
+    columns = {name: [] for name in ITEM_FIELDS}
+
+    def flush(writer):
+        writer.write_table(pa.table(columns, schema=schema))
+        for values in columns.values():
+            values.clear()
+
+    with pa.parquet.ParquetWriter(path, schema) as writer:
+        for item in items:
+            columns["page"].append(item.page)
+            columns["line_number"].append(item.line_number)
+            columns["description"].append(item.description)
+            columns["trade"].append(item.trade)
+            columns["quantity"].append(float(item.quantity))
+            columns["unit"].append(item.unit)
+            for field in MONEY_FIELDS:
+                columns[field].append(cents_to_decimal(getattr(item, field)))
+            totals.add(item)
+            if len(columns["page"]) >= PARQUET_BATCH_ROWS:
+                flush(writer)
+        if columns["page"] or not totals.item_count:
+            flush(writer)
+
+
+def _write_totals(rows, path, output_format):
+    if output_format == "csv":
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=TOTALS_HEADERS)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({col: row[col] if col == "TRADE" else f"{row[col]:.2f}"
+                                 for col in TOTALS_HEADERS})
+    elif output_format == "jsonl":
+        with open(path, "w") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+    else:
+        pa = _pyarrow()
+        pa.parquet.write_table(pa.Table.from_pylist(rows), path)
+
+
+_ITEM_WRITERS = {"csv": _write_items_csv, "jsonl": _write_items_jsonl,
+                 "parquet": _write_items_parquet}
+
+
+def write_items(items, path, output_format, quiet=False, metrics=None):
+    """
+    Stream LineItems to ``path`` as csv, jsonl or parquet, one row per item.
+
+    Rows are written as items arrive (Parquet in row groups of
+    PARQUET_BATCH_ROWS), so memory stays flat. Money is exact dollars (decimal
+    strings in CSV, decimal128 in Parquet, numbers in JSON Lines). Per-trade
+    rows and the GRAND TOTAL go to a companion file (see totals_path()).
+
+    Returns the GRAND TOTAL row as a dict.
+    """
+    totals = TradeTotals()
+    with ParseMetrics.maybe(metrics, f"{output_format}.items"):
+        _ITEM_WRITERS[output_format](items, path, totals)
+    trade_totals = totals.trade_rows()
+    grand_total = totals.grand_total()
+    with ParseMetrics.maybe(metrics, f"{output_format}.totals"):
+        _write_totals(trade_totals + [grand_total], totals_path(path), output_format)
+    if not quiet:
+        print_contractor_summary(grand_total, trade_totals)
+    logging.info(f"Saved {totals.item_count} items to {path} and trade totals to {totals_path(path)}")
+    return grand_total
+
+
+def write_estimate(items, path, output_format="xlsx", quiet=False, metrics=None):
+    """Write LineItems in any OUTPUT_FORMATS format; returns the GRAND TOTAL row."""
+    if output_format == "xlsx":
+        return save_to_excel_with_budget([HEADERS] + list(items), path, quiet=quiet, metrics=metrics)
+    if output_format == "xlsx-stream":
+        return save_to_excel_streaming(items, path, quiet=quiet, metrics=metrics)
+    return write_items(items, path, output_format, quiet=quiet, metrics=metrics)
+
+
+MANIFEST_FIELDS = ["pdf", "excel", "status", "format", "items", "no_match", "elapsed_s", "error"]
+
+
+def collect_pdfs(spec):
+    """Expand a directory or glob pattern into a sorted list of PDF paths."""
+    spec = os.path.expanduser(spec)
+    if os.path.isdir(spec):
+        return sorted(
+            os.path.join(spec, name) for name in os.listdir(spec)
+            if name.lower().endswith(".pdf")
+        )
+    return sorted(path for path in glob.glob(spec, recursive=True) if os.path.isfile(path))
+
+
+def collect_sources(sources):
+    """
+    Expand each of ``sources`` (files, directories or glob patterns) with
+    collect_pdfs, in the order given. Warns if nothing was found.
+    """
+    pdf_paths = []
+    for source in sources:
+        pdf_paths.extend(collect_pdfs(source))
+    if not pdf_paths:
+        logging.warning(f"No PDF files found for {' '.join(sources)}")
+    return pdf_paths
+
+
+def _manifest_row(pdf_path, excel_path, error=None):
+    row = {"pdf": pdf_path, "excel": excel_path, "status": "ok", "format": "",
+           "items": 0, "no_match": 0, "elapsed_s": 0.0, "error": ""}
+    if error is not None:
+        row.update(status="error", excel="", error=error)
+    return row
+
+
+def batch_output_paths(pdf_paths, out_dir, extension):
+    """
+    Output path for each PDF: its path relative to the PDFs' common directory,
+    under ``out_dir``, so same-named PDFs from different folders don't collide.
+
+    Raises ValueError if two PDFs would still write the same file (e.g.
+    ``x.pdf`` and ``x.PDF``).
+    """
+    if not pdf_paths:
+        return []
+    dirs = [os.path.dirname(os.path.abspath(path)) for path in pdf_paths]
+    root = os.path.commonpath(dirs)
+    outputs = []
+    seen = {}
+    for pdf_path in pdf_paths:
+        relative = os.path.relpath(os.path.abspath(pdf_path), root)
+        out = os.path.join(out_dir, os.path.splitext(relative)[0] + extension)
+        key = os.path.normcase(out).lower()
+        if key in seen:
+            raise ValueError(f"{seen[key]} and {pdf_path} would both be written to {out}")
+        seen[key] = pdf_path
+        outputs.append(out)
+    return outputs
+
+
+def run_pool_jobs(fn, jobs, workers=None):
+    """
+    Run ``fn(*args)`` for each ``(key, args)`` in ``jobs`` on a process pool,
+    yielding ``(key, result, error)`` as each finishes (``error`` is the
+    exception it raised, else None).
+
+    A worker that dies (out of memory, a crash in pdfminer) breaks the whole
+    pool, so at most two jobs per worker are handed over at a time. On a
+    break, the jobs that were handed over are retried one at a time on a
+    fresh single-worker pool, so only the job that kills its worker is
+    reported failed (with BrokenProcessPool), and the rest carry on on a new
+    pool.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    from concurrent.futures.process import BrokenProcessPool
+
+    workers = workers or os.cpu_count() or 1
+    pending = collections.deque(jobs)
+    suspects = collections.deque()
+    while pending or suspects:
+        isolate = bool(suspects)
+        queue = suspects if isolate else pending
+        limit = 1 if isolate else 2 * workers
+        with ProcessPoolExecutor(max_workers=1 if isolate else workers) as pool:
+            running = {}
+            broken = False
+            while (queue or running) and not broken:
+                while queue and len(running) < limit:
+                    key, args = queue.popleft()
+                    running[pool.submit(fn, *args)] = (key, args)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, args = running.pop(future)
+                    try:
+                        yield key, future.result(), None
+                    except BrokenProcessPool as e:
+                        broken = True
+                        if isolate:
+                            yield key, None, e
+                        else:
+                            suspects.append((key, args))
+                    except Exception as e:
+                        yield key, None, e
+            if broken:
+                logging.warning(f"A worker process died; retrying {len(suspects) + len(running)} "
+                                f"unfinished files one at a time")
+                suspects.extend(running.values())
+
+
+def process_estimate(pdf_path, excel_path, cache=None, ocr=None, output_format="xlsx",
+                     crop_tables=False):
+    """
+    Batch worker: parse one PDF and write its workbook (or ``output_format`` file).
+
+    Never raises; failures are reported in the returned manifest row so one
+    bad PDF does not take down the rest of the batch.
+    """
+    start = time.perf_counter()
+    row = _manifest_row(pdf_path, excel_path)
+    try:
+        stats = {}
+        if output_format == "xlsx":
+            data = extract_xactimate_items(pdf_path, stats=stats, cache=cache, ocr=ocr,
+                                           crop_tables=crop_tables)
+            if len(data) > 1:
+                save_to_excel_with_budget(data, excel_path, quiet=True)
+        else:
+            write_estimate(iter_estimate_items(pdf_path, stats=stats, cache=cache, ocr=ocr,
+                                               crop_tables=crop_tables),
+                           excel_path, output_format, quiet=True)
+        row["items"] = stats["items"]
+        row["no_match"] = stats["no_match"]
+        row["format"] = stats["format"] or ""
+        if not stats["items"]:
+            row["status"] = "empty"
+            if output_format != "xlsx":
+                os.remove(excel_path)
+                if os.path.exists(totals_path(excel_path)):
+                    os.remove(totals_path(excel_path))
+            row["excel"] = ""
+    except Exception as e:
+        row["status"] = "error"
+        row["excel"] = ""
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["elapsed_s"] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def run_batch(pdf_paths, out_dir, workers=None, manifest_path=None, cache=None, ocr=None,
+              output_format="xlsx", crop_tables=False):
+    """
+    Parse many PDFs on a process pool, one workbook (or ``output_format``
+    file) per PDF in ``out_dir``.
+
+    Each worker process imports pdfplumber/openpyxl once and then
+    handles as many files as it is given. Writes a CSV manifest (one row per
+    PDF) and returns the manifest rows in input order. A worker that dies
+    (out of memory, a crash in pdfminer) fails only the file that killed it
+    (see run_pool_jobs()); the manifest is written regardless.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    if manifest_path is None:
+        manifest_path = os.path.join(out_dir, "manifest.csv")
+
+    jobs = list(zip(pdf_paths, batch_output_paths(pdf_paths, out_dir, OUTPUT_EXTENSIONS[output_format])))
+    for _, out in jobs:
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+
+    rows = {}
+    try:
+        results = run_pool_jobs(process_estimate, [((pdf, out), (pdf, out, cache, ocr, output_format,
+                                                                 crop_tables))
+                                                   for pdf, out in jobs], workers)
+        for (pdf, out), row, error in results:
+            if error is not None:
+                row = _manifest_row(pdf, out, error=f"{type(error).__name__}: {error}")
+            rows[pdf] = row
+            logging.info(f"[{len(rows)}/{len(jobs)}] {row['status']}: {row['pdf']} "
+                         f"({row['items']} items, {row['no_match']} no match, {row['elapsed_s']}s)")
+    finally:
+        ordered = [rows.get(pdf) or _manifest_row(pdf, out, error="not processed")
+                   for pdf, out in jobs]
+        with open(manifest_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=MANIFEST_FIELDS)
+            writer.writeheader()
+            writer.writerows(ordered)
+        logging.info(f"Wrote batch manifest to {manifest_path}")
+    return ordered
+
+
+def batch_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="xactparse batch",
+        description="Parse a directory (or glob) of Xactimate PDFs in parallel.")
+    parser.add_argument("source", help="Directory of PDFs or a glob pattern (quote it)")
+    parser.add_argument("--out", required=True, help="Output directory for the Excel files")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="xlsx",
+                        help="Output format (default: %(default)s)")
+    add_workers_argument(parser)
+    parser.add_argument("--manifest", default=None,
+                        help="Manifest CSV path (default: <out>/manifest.csv)")
+    add_ocr_argument(parser)
+    add_crop_tables_argument(parser)
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.format == "parquet":
+        try:
+            _pyarrow()
+        except ImportError as e:
+            parser.error(str(e))
+    pdf_paths = collect_sources([args.source])
+    if not pdf_paths:
+        return 1
+    cache = cache_from_args(args)
+    ocr = pool_ocr_from_args(args, cache)
+    try:
+        rows = run_batch(pdf_paths, args.out, workers=args.workers, manifest_path=args.manifest,
+                         cache=cache, ocr=ocr, output_format=args.format,
+                         crop_tables=args.crop_tables)
+    except ValueError as e:
+        logging.error(str(e))
+        return 1
+    by_format = {}
+    for row in rows:
+        if row["status"] == "ok":
+            totals = by_format.setdefault(row["format"] or "unknown", [0, 0, 0.0])
+            totals[0] += 1
+            totals[1] += row["items"]
+            totals[2] += row["elapsed_s"]
+    for fmt, (files, items, elapsed) in sorted(by_format.items()):
+        rate = items / elapsed if elapsed else 0.0
+        logging.info(f"  {fmt}: {files} files, {items} items, {rate:,.0f} items/s")
+    failed = sum(1 for row in rows if row["status"] == "error")
+    logging.info(f"Batch complete: {len(rows) - failed} ok, {failed} failed")
+    return 1 if failed else 0
+
+
+TRIAGE_SAMPLE_PAGES = 4
+TRIAGE_ROUTES = ["text", "ocr", "reject"]
+
+
+class TriageResult(collections.namedtuple("TriageResult", [
+        "pdf", "route", "reason", "pages", "sampled", "text_pages", "table_pages", "format",
+        "estimated_items", "estimated_items_max", "elapsed_ms"])):
+    """
+    Pre-flight routing decision for one PDF (see triage_pdf).
+
+    ``route`` is one of TRIAGE_ROUTES. ``sampled``, ``text_pages`` and
+    ``table_pages`` count the sampled pages, those with a text layer and
+    those with a line-item column header. ``estimated_items`` and
+    ``estimated_items_max`` bound a sizing hint extrapolated from the sample,
+    not a count.
+    """
+    __slots__ = ()
+
+    def to_json(self):
+        return self._asdict()
+
+
+def _triage_sample(page_total, sample_pages):
+    """
+    Pages to sample: the first two (cover, first line items), the rest spread
+    evenly. At least one page is sampled, whatever ``sample_pages`` says.
+    """
+    sample_pages = max(1, sample_pages)
+    if page_total <= sample_pages:
+        return list(range(1, page_total + 1))
+    head = [1, 2][:sample_pages]
+    rest = sample_pages - len(head)
+    spread = [2 + round((page_total - 2) * step / (rest + 1)) for step in range(1, rest + 1)]
+    return sorted(set(head + spread))
+
+
+def _sample_page_texts(source, sample_pages):
+    """
+    (page_total, {page_number: text}) for the triage sample, read by pdfium
+    (installed with pdfplumber). A page without a text layer gets "".
+    """
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(source)
+    try:
+        page_total = len(pdf)
+        texts = {}
+        for page_number in _triage_sample(page_total, sample_pages):
+            page = pdf[page_number - 1]
+            textpage = page.get_textpage()
+            texts[page_number] = (textpage.get_text_range().replace("\r\n", "\n")
+                                  if textpage.count_chars() else "")
+            textpage.close()
+            page.close()
+        return page_total, texts
+    finally:
+        pdf.close()
+
+
+def _table_text(text):
+    """A page's text from the column header line down, or None without a header."""
+    lines = text.split("\n")
+    for idx, line in enumerate(lines):
+        if TABLE_HEADER_REGEX.search(line.upper().replace(" ", "")):
+            return "\n".join(lines[idx:])
+    return None
+
+
+def triage_pdf(source, sample_pages=TRIAGE_SAMPLE_PAGES):
+    """
+    Decide how a PDF (path or bytes) should be handled, from a few pages.
+
+    The sampled pages' text layer is read with pdfium, which takes about a
+    millisecond a page and doesn't load pdfplumber: whether each page has
+    text, the line-item column header and which line items it matches.
+    Routes to "text" if any sampled page has a table header or line items,
+    "ocr" if no sampled page has text at all, and "reject" otherwise (not an
+    estimate, or not a readable PDF). Only when text was found but no header
+    or items are the text pages laid out again with pdfplumber, whose reading
+    order can recover a table pdfium's breaks up. Never raises for a bad file.
+
+    Items are extrapolated from the first sampled page with items to the
+    last one (``estimated_items``) and, for the high end, up to the next
+    sampled page without any (``estimated_items_max``); the pages past that
+    are taken to be photo, recap and summary pages. Without line numbers
+    that run through the estimate, a partly filled last page of items makes
+    both ends run a little high.
+    """
+    start = time.perf_counter()
+    name = _pdf_name(source)
+    detector = FormatDetector()
+    texts = {}
+    page_total = text_pages = table_pages = max_line = max_line_page = 0
+    item_counts = {}
+    continuous = True
+
+    def check(page_number, text):
+        nonlocal table_pages, max_line, max_line_page, continuous
+        table = _table_text(text)
+        page_items, _ = _parse_page_text(table or text, detector, page_number,
+                                         classify=lambda description: "", log_misses=False)
+        table_pages += table is not None
+        if page_items:
+            item_counts[page_number] = len(page_items)
+            numbers = [item.line_number for item in page_items]
+            # Numbering that restarts (per section) can't be extrapolated
+            continuous = continuous and min(numbers) > max_line
+            max_line, max_line_page = max((max_line, max_line_page), (max(numbers), page_number))
+
+    try:
+        page_total, texts = _sample_page_texts(source, sample_pages)
+        text_pages = sum(1 for text in texts.values() if text.strip())
+        for page_number, text in texts.items():
+            if text.strip():
+                check(page_number, text)
+        if text_pages and not table_pages and not item_counts:
+            with open_pdf(source) as pdf:
+                for page_number, text in texts.items():
+                    if text.strip():
+                        page = pdf.pages[page_number - 1]
+                        top = find_table_top(page)
+                        check(page_number, page.filter(lambda obj: obj["top"] >= top).extract_text()
+                              if top is not None else page.extract_text())
+                        page.close()
+    except Exception as e:
+        route, reason = "reject", f"not a readable PDF: {type(e).__name__}: {e}"
+    else:
+        if not page_total:
+            route, reason = "reject", "no pages"
+        elif table_pages or item_counts:
+            route, reason = "text", "text layer with line items"
+            if text_pages < len(texts):
+                reason += f"; {len(texts) - text_pages} sampled page(s) without text, consider --ocr"
+        elif not text_pages:
+            route, reason = "ocr", "no text layer on sampled pages"
+        else:
+            route, reason = "reject", "text but no line-item table on sampled pages"
+
+    low = high = 0
+    if item_counts:
+        first, last = min(item_counts), max(item_counts)
+        end = min([page_number for page_number in texts if page_number > last], default=page_total + 1)
+        if continuous:
+            # Line numbers count every item up to the page they were seen on
+            low = max_line
+            per_page = max_line / (max_line_page - first + 1)
+        else:
+            per_page = sum(item_counts.values()) / len(item_counts)
+            low = round(per_page * (last - first + 1))
+        high = low + round(per_page * (end - 1 - last))
+    return TriageResult(name, route, reason, page_total, len(texts), text_pages, table_pages,
+                        detector.format, low, high,
+                        round((time.perf_counter() - start) * 1000, 1))
+
+
+def triage_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="xactparse triage",
+        description="Sample a few pages of each PDF and route it: text parse, OCR, or reject.")
+    parser.add_argument("sources", nargs="+", help="PDF files, directories or glob patterns (quoted)")
+    parser.add_argument("--sample-pages", type=int, default=TRIAGE_SAMPLE_PAGES,
+                        help="Pages to sample per PDF (default: %(default)s)")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per PDF")
+    args = parser.parse_args(argv)
+    if args.sample_pages < 1:
+        parser.error("--sample-pages must be at least 1")
+
+    pdf_paths = collect_sources(args.sources)
+    if not pdf_paths:
+        return 1
+    results = []
+    for pdf_path in pdf_paths:
+        result = triage_pdf(pdf_path, sample_pages=args.sample_pages)
+        if args.json:
+            print(json.dumps(result.to_json()), flush=True)
+        results.append(result)
+    if not args.json:
+        columns = ["PDF", "ROUTE", "PAGES", "ITEMS~", "FORMAT", "MS", "REASON"]
+        print_table(columns, [[result.pdf, result.route, result.pages,
+                               f"{result.estimated_items}-{result.estimated_items_max}"
+                               if result.estimated_items_max > result.estimated_items
+                               else result.estimated_items,
+                               result.format or "-", result.elapsed_ms, result.reason]
+                              for result in results])
+    routes = collections.Counter(result.route for result in results)
+    logging.info(f"Triaged {len(results)} PDFs: " + ", ".join(f"{routes[route]} {route}"
+                                                             for route in TRIAGE_ROUTES))
+    return 0
+
+
+CONSOLIDATED_HEADERS = ["SOURCE"] + HEADERS
+SOURCE_TOTALS_HEADERS = ["SOURCE"] + NUMERIC_COLUMNS + ["BUDGET"]
+
+
+def source_names(pdf_paths):
+    """Short SOURCE labels: file names, or the paths as given if two names collide."""
+    names = [os.path.basename(path) for path in pdf_paths]
+    if len(set(names)) < len(names):
+        return list(pdf_paths)
+    return names
+
+
+def _spool_estimate(pdf_path, spool_path, cache=None, ocr=None, crop_tables=False):
+    """Consolidate worker: parse one PDF into a JSON-lines spool file; returns its stats."""
+    stats = {}
+    with open(spool_path, "w") as f:
+        for item in iter_estimate_items(pdf_path, stats=stats, cache=cache, ocr=ocr,
+                                        crop_tables=crop_tables):
+            f.write(json.dumps(item.to_json(), separators=(",", ":")) + "\n")
+    return stats
+
+
+def _iter_spool(spool_path):
+    with open(spool_path) as f:
+        for line in f:
+            yield LineItem.from_json(json.loads(line))
+
+
+def consolidate_estimates(pdf_paths, excel_path, workers=None, cache=None, ocr=None,
+                          crop_tables=False, quiet=False):
+    """
+    Parse several PDFs of one claim in parallel into a single workbook.
+
+    Master and the per-trade sheets hold every source's items with a SOURCE
+    column; Totals has the per-trade rows across all sources, the GRAND
+    TOTAL and then one row per source. Workers spool their items to temp
+    files; sources are then streamed into a write-only workbook in input
+    order while later ones are still parsing, and every total comes from
+    TradeTotals accumulators, so memory stays flat however many estimates
+    are combined.
+
+    Returns (grand_total, source_rows), both with TOTALS_HEADERS money keys.
+    Raises the first parse error, without writing the workbook.
+    """
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    from openpyxl import Workbook
+
+    names = source_names(pdf_paths)
+    wb = Workbook(write_only=True)
+    master = _StreamingSheetWriter(wb, "Master", CONSOLIDATED_HEADERS)
+    sheets = {}
+    totals = TradeTotals()
+    source_rows = []
+    with tempfile.TemporaryDirectory(prefix="xactparse-") as spool_dir, \
+            ProcessPoolExecutor(max_workers=workers) as pool:
+        spools = [os.path.join(spool_dir, f"{idx}.jsonl") for idx in range(len(pdf_paths))]
+        futures = [pool.submit(_spool_estimate, pdf_path, spool, cache, ocr, crop_tables)
+                   for pdf_path, spool in zip(pdf_paths, spools)]
+        try:
+            for name, spool, future in zip(names, spools, futures):
+                stats = future.result()
+                source_totals = TradeTotals()
+                for item in _iter_spool(spool):
+                    row = [name] + item.row()
+                    master.append(row)
+                    sheet = sheets.get(item.trade)
+                    if sheet is None:
+                        sheet = sheets[item.trade] = _StreamingSheetWriter(
+                            wb, item.trade[:31], CONSOLIDATED_HEADERS)
+                    sheet.append(row)
+                    totals.add(item)
+                    source_totals.add(item)
+                os.remove(spool)
+                if not source_totals.item_count:
+                    logging.warning(f"No line items extracted from {name}")
+                source_rows.append({**source_totals.grand_total(), "SOURCE": name})
+                logging.info(f"[{len(source_rows)}/{len(names)}] {name}: {source_totals.item_count} "
+                             f"items ({stats['format'] or 'unknown'} format, {stats['no_match']} no match)")
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            # Close the half-written sheets so their temp files aren't left open
+            for ws in wb.worksheets:
+                ws.close()
+            raise
+
+    trade_totals = totals.trade_rows()
+    _finish_streaming_trade_sheets(wb, sheets, trade_totals, CONSOLIDATED_HEADERS)
+    grand_total = totals.grand_total()
+    totals_sheet = _StreamingSheetWriter(wb, "Totals", TOTALS_HEADERS)
+    for row in trade_totals:
+        totals_sheet.append([row[col] for col in TOTALS_HEADERS])
+    grand_total_row = totals_sheet.append([grand_total[col] for col in TOTALS_HEADERS], bold=True)
+    totals_sheet.append([])
+    totals_sheet.append(SOURCE_TOTALS_HEADERS, bold=True)
+    for row in source_rows:
+        totals_sheet.append([row[col] for col in SOURCE_TOTALS_HEADERS])
+    _add_rcv_pie_chart(totals_sheet.ws, TOTALS_HEADERS.index("RCV") + 1, grand_total_row,
+                       anchor_row=totals_sheet.rows)
+
+    if not quiet:
+        print_contractor_summary(grand_total, trade_totals)
+        print("\nBy source:")
+        columns = ["SOURCE", "RCV", "ACV", "DEPREC.", "BUDGET"]
+        print_table(columns, [[row["SOURCE"]] + [f"{row[col]:.2f}" for col in columns[1:]]
+                              for row in source_rows])
+    wb.save(excel_path)
+    logging.info(f"Saved consolidated workbook for {len(names)} estimates to {excel_path}")
+    return grand_total, source_rows
+
+
+def consolidate_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="xactparse consolidate",
+        description="Combine several estimate PDFs (one claim) into a single workbook.")
+    parser.add_argument("sources", nargs="+", help="PDF files, directories or glob patterns (quoted)")
+    parser.add_argument("--out", required=True, help="Output Excel file")
+    add_workers_argument(parser)
+    add_ocr_argument(parser)
+    add_crop_tables_argument(parser)
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+
+    pdf_paths = collect_sources(args.sources)
+    if not pdf_paths:
+        return 1
+    cache = cache_from_args(args)
+    ocr = pool_ocr_from_args(args, cache)
+    try:
+        consolidate_estimates(pdf_paths, args.out, workers=args.workers, cache=cache, ocr=ocr,
+                              crop_tables=args.crop_tables)
+    except Exception as e:
+        logging.error(f"Consolidation failed, no workbook written: {type(e).__name__}: {e}")
+        return 1
+    return 0
+
+
+def summarize_estimate(pdf_path, stats=None, workers=None, cache=None, ocr=None, crop_tables=False):
+    """
+    Return a TradeTotals for one PDF without building a workbook.
+
+    Items are streamed straight into the accumulator, so nothing but the
+    per-trade sums is held. With a ParseCache a previously parsed PDF is
+    summed from the cache without opening it (or importing pdfplumber).
+    """
+    totals = TradeTotals()
+    for item in iter_estimate_items(pdf_path, stats=stats, workers=workers, cache=cache, ocr=ocr,
+                                    crop_tables=crop_tables):
+        totals.add(item)
+    return totals
+
+
+def summary_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="xactparse summary",
+        description="Print the contractor summary for an estimate without writing Excel.")
+    parser.add_argument("pdf_file", help="Path to the input PDF file")
+    parser.add_argument("--json", action="store_true",
+                        help="Print the grand total and per-trade rows as JSON")
+    parser.add_argument("--page-workers", type=int, default=None,
+                        help="Extract page text on N processes (for large PDFs)")
+    add_ocr_argument(parser)
+    add_crop_tables_argument(parser)
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+
+    cache = cache_from_args(args)
+    ocr = OcrEngine(cache=cache) if args.ocr else None
+    stats = {}
+    totals = summarize_estimate(args.pdf_file, stats=stats, workers=args.page_workers,
+                                cache=cache, ocr=ocr, crop_tables=args.crop_tables)
+    if not totals.item_count:
+        logging.warning("No line items extracted.")
+        return 1
+    if args.json:
+        print(json.dumps({**stats, "summary": totals.grand_total(),
+                          "trades": totals.trade_rows()}, indent=2))
+    else:
+        print_contractor_summary(totals.grand_total(), totals.trade_rows())
+    return 0
+
+
+DIFF_FIELDS = ["quantity", "unit"] + MONEY_FIELDS
+DIFF_FUZZY_THRESHOLD = 85
+DIFF_STATUSES = ["added", "removed", "changed", "unchanged"]
+
+
+class ItemDiff(collections.namedtuple("ItemDiff", ["status", "original", "revised", "score"])):
+    """
+    One row of an estimate diff.
+
+    ``status`` is one of DIFF_STATUSES. ``original`` and ``revised`` are the
+    paired LineItems (None on the missing side for added/removed items).
+    ``score`` is 100 for exact description matches, else the fuzzy
+    similarity (0-100) the pair was matched at.
+    """
+    __slots__ = ()
+
+    @property
+    def changes(self):
+        """Names of the DIFF_FIELDS that differ, plus "description" for fuzzy pairs."""
+        if self.original is None or self.revised is None:
+            return []
+        changed = [field for field in DIFF_FIELDS
+                   if getattr(self.original, field) != getattr(self.revised, field)]
+        if _diff_key(self.original) != _diff_key(self.revised):
+            changed.insert(0, "description")
+        return changed
+
+    def delta(self, field):
+        """Revised minus original for a money field, in cents (a missing side counts as 0)."""
+        before = getattr(self.original, field) if self.original is not None else 0
+        after = getattr(self.revised, field) if self.revised is not None else 0
+        return after - before
+
+    def to_json(self):
+        return {"status": self.status, "score": self.score, "changes": self.changes,
+                "original": self.original.to_json() if self.original is not None else None,
+                "revised": self.revised.to_json() if self.revised is not None else None,
+                "rcv_delta": cents_to_float(self.delta("rcv")),
+                "acv_delta": cents_to_float(self.delta("acv"))}
+
+
+def _diff_key(item):
+    return normalize_description(item.description)
+
+
+def _fuzzy_scorer():
+    """
+    Return score(a, b, cutoff) -> 0-100 for two normalized descriptions.
+
+    Uses rapidfuzz's token_sort_ratio when it is installed, else the same
+    idea (sorted tokens) with difflib, skipping pairs whose cheap upper
+    bounds are already below the cutoff.
+    """
+    try:
+        from rapidfuzz import fuzz
+    except ImportError:
+        pass
+    else:
+        return lambda a, b, cutoff: fuzz.token_sort_ratio(a, b, processor=None, score_cutoff=cutoff)
+
+    def score(a, b, cutoff):
+        matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+        bound = cutoff / 100
+        if matcher.real_quick_ratio() < bound or matcher.quick_ratio() < bound:
+            return 0
+        return matcher.ratio() * 100
+    return score
+
+
+def diff_estimates(original, revised, threshold=DIFF_FUZZY_THRESHOLD):
+    """
+    Pair up the line items of two estimates (e.g. an original and a supplement).
+
+    ``original`` and ``revised`` are extract_xactimate_items() output (the
+    header row is skipped) or plain lists of LineItems. Items are paired in
+    two steps:
+
+    1. A hash join on normalize_description(). Within a description,
+       identical lines pair first, so a line repeated in several rooms lines
+       up with its own counterpart; the rest pair in page order.
+    2. Leftovers are fuzzy-matched, only against leftovers with the same
+       trade and unit, so there's no all-pairs comparison. Pairs scoring at
+       least ``threshold`` are taken best-first.
+
+    Returns ItemDiff rows: the revised estimate's items in order, followed by
+    the removed items in their original order.
+    """
+    original = [item for item in original if isinstance(item, LineItem)]
+    revised = [item for item in revised if isinstance(item, LineItem)]
+    pairs = {}  # revised index -> (original index, score)
+
+    original_by_key = {}
+    for idx, item in enumerate(original):
+        original_by_key.setdefault(_diff_key(item), []).append(idx)
+    revised_by_key = {}
+    for idx, item in enumerate(revised):
+        revised_by_key.setdefault(_diff_key(item), []).append(idx)
+    for key, revised_idxs in revised_by_key.items():
+        original_idxs = original_by_key.get(key)
+        if not original_idxs:
+            continue
+        identical = {}
+        for idx in original_idxs:
+            identical.setdefault(original[idx][3:11], collections.deque()).append(idx)
+        unpaired = []
+        for idx in revised_idxs:
+            same = identical.get(revised[idx][3:11])
+            if same:
+                pairs[idx] = (same.popleft(), 100)
+            else:
+                unpaired.append(idx)
+        remaining = sorted(idx for same in identical.values() for idx in same)
+        for revised_idx, original_idx in zip(unpaired, remaining):
+            pairs[revised_idx] = (original_idx, 100)
+
+    # Fuzzy pass over the leftovers, blocked by (trade, unit)
+    paired_original = {original_idx for original_idx, _ in pairs.values()}
+    blocks = {}
+    for idx, item in enumerate(original):
+        if idx not in paired_original:
+            blocks.setdefault((item.trade, item.unit), ([], []))[0].append(idx)
+    for idx, item in enumerate(revised):
+        if idx not in pairs and (item.trade, item.unit) in blocks:
+            blocks[(item.trade, item.unit)][1].append(idx)
+    score = _fuzzy_scorer()
+    for original_idxs, revised_idxs in blocks.values():
+        if not revised_idxs:
+            continue
+        original_keys = [" ".join(sorted(_diff_key(original[idx]).split())) for idx in original_idxs]
+        candidates = []
+        for revised_idx in revised_idxs:
+            revised_key = " ".join(sorted(_diff_key(revised[revised_idx]).split()))
+            for original_idx, original_key in zip(original_idxs, original_keys):
+                similarity = score(original_key, revised_key, threshold)
+                if similarity >= threshold:
+                    candidates.append((-similarity, revised_idx, original_idx))
+        candidates.sort()
+        taken = set()
+        for negative_score, revised_idx, original_idx in candidates:
+            if revised_idx in pairs or original_idx in taken:
+                continue
+            pairs[revised_idx] = (original_idx, round(-negative_score, 1))
+            taken.add(original_idx)
+
+    diffs = []
+    for idx, item in enumerate(revised):
+        if idx not in pairs:
+            diffs.append(ItemDiff("added", None, item, 0))
+            continue
+        original_idx, similarity = pairs[idx]
+        entry = ItemDiff("changed", original[original_idx], item, similarity)
+        if not entry.changes:
+            entry = entry._replace(status="unchanged")
+        diffs.append(entry)
+    paired_original = {original_idx for original_idx, _ in pairs.values()}
+    diffs.extend(ItemDiff("removed", item, None, 0)
+                 for idx, item in enumerate(original) if idx not in paired_original)
+    return diffs
+
+
+def diff_summary(diffs):
+    """Counts per status plus RCV/ACV totals (floats) for both sides and their deltas."""
+    summary = {status: 0 for status in DIFF_STATUSES}
+    totals = {"original_rcv": 0, "revised_rcv": 0, "original_acv": 0, "revised_acv": 0}
+    for entry in diffs:
+        summary[entry.status] += 1
+        for side, item in (("original", entry.original), ("revised", entry.revised)):
+            if item is not None:
+                totals[f"{side}_rcv"] += item.rcv
+                totals[f"{side}_acv"] += item.acv
+    totals["rcv_delta"] = totals["revised_rcv"] - totals["original_rcv"]
+    totals["acv_delta"] = totals["revised_acv"] - totals["original_acv"]
+    summary.update({name: cents_to_float(cents) for name, cents in totals.items()})
+    return summary
+
+
+def _format_diff_item(item):
+    return f"{item.label} ({item.quantity_text}, {item.trade})"
+
+
+def print_diff_report(diffs, show_unchanged=False):
+    """Print added, removed and changed items with their RCV/ACV deltas."""
+    summary = diff_summary(diffs)
+    print("\n" + "="*60)
+    print("ESTIMATE DIFF")
+    print("="*60)
+    for status, marker in (("added", "+"), ("removed", "-"), ("changed", "~"), ("unchanged", "=")):
+        if status == "unchanged" and not show_unchanged:
+            continue
+        entries = [entry for entry in diffs if entry.status == status]
+        print(f"\n{status.upper()} ({len(entries)})")
+        for entry in entries:
+            item = entry.revised if entry.revised is not None else entry.original
+            print(f"  {marker} {_format_diff_item(item)}")
+            if status == "changed":
+                if "description" in entry.changes:
+                    print(f"      was: {entry.original.label}  (match {entry.score:g}%)")
+                for field in entry.changes:
+                    if field == "description":
+                        continue
+                    before, after = getattr(entry.original, field), getattr(entry.revised, field)
+                    if field in MONEY_FIELDS:
+                        before, after = f"{cents_to_float(before):,.2f}", f"{cents_to_float(after):,.2f}"
+                    print(f"      {field}: {before} -> {after}")
+            if status != "unchanged":
+                print(f"      RCV {cents_to_float(entry.delta('rcv')):+,.2f}   "
+                      f"ACV {cents_to_float(entry.delta('acv')):+,.2f}")
+    print("\n" + "="*60)
+    print(f"RCV: ${summary['original_rcv']:,.2f} -> ${summary['revised_rcv']:,.2f} "
+          f"({summary['rcv_delta']:+,.2f})")
+    print(f"ACV: ${summary['original_acv']:,.2f} -> ${summary['revised_acv']:,.2f} "
+          f"({summary['acv_delta']:+,.2f})")
+    print(f"{summary['added']} added, {summary['removed']} removed, "
+          f"{summary['changed']} changed, {summary['unchanged']} unchanged")
+    print("="*60)
+
+
+def diff_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="xactparse diff",
+        description="Compare two estimates (e.g. original vs. supplement) line by line.")
+    parser.add_argument("original", help="Original estimate PDF")
+    parser.add_argument("revised", help="Revised estimate / supplement PDF")
+    parser.add_argument("--threshold", type=float, default=DIFF_FUZZY_THRESHOLD,
+                        help="Minimum fuzzy similarity (0-100) to pair reworded items "
+                             "(default: %(default)s)")
+    parser.add_argument("--all", action="store_true", help="Also list unchanged items")
+    parser.add_argument("--json", action="store_true", help="Print the diff as JSON")
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+
+    cache = cache_from_args(args)
+    original = extract_xactimate_items(args.original, cache=cache)
+    revised = extract_xactimate_items(args.revised, cache=cache)
+    start = time.perf_counter()
+    diffs = diff_estimates(original, revised, threshold=args.threshold)
+    logging.info(f"Compared {len(original) - 1} vs {len(revised) - 1} items "
+                 f"in {time.perf_counter() - start:.2f}s")
+    if args.json:
+        entries = diffs if args.all else [entry for entry in diffs if entry.status != "unchanged"]
+        print(json.dumps({"summary": diff_summary(diffs),
+                          "items": [entry.to_json() for entry in entries]}, indent=2))
+    else:
+        print_diff_report(diffs, show_unchanged=args.all)
+    return 0
+
+
+def default_warehouse_path():
+    if os.environ.get("XACTPARSE_DB"):
+        return os.environ["XACTPARSE_DB"]
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "xactparse", "warehouse.sqlite")
+
+
+WAREHOUSE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS estimates (
+    id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    carrier TEXT,
+    format TEXT,
+    created TEXT,
+    ingested_at TEXT NOT NULL,
+    parser TEXT NOT NULL,
+    pages INTEGER NOT NULL,
+    items INTEGER NOT NULL,
+    no_match INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    estimate_id INTEGER NOT NULL REFERENCES estimates (id) ON DELETE CASCADE,
+    page INTEGER NOT NULL,
+    line_number INTEGER NOT NULL,
+    description TEXT NOT NULL,
+    normalized TEXT NOT NULL,
+    trade TEXT NOT NULL,
+    quantity TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    unit_price INTEGER NOT NULL,
+    tax INTEGER NOT NULL,
+    o_p INTEGER NOT NULL,
+    rcv INTEGER NOT NULL,
+    deprec INTEGER NOT NULL,
+    acv INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS estimate_trades (
+    estimate_id INTEGER NOT NULL REFERENCES estimates (id) ON DELETE CASCADE,
+    trade TEXT NOT NULL,
+    items INTEGER NOT NULL,
+    rcv INTEGER NOT NULL,
+    deprec INTEGER NOT NULL,
+    acv INTEGER NOT NULL,
+    PRIMARY KEY (estimate_id, trade)
+);
+CREATE INDEX IF NOT EXISTS items_estimate ON items (estimate_id);
+CREATE INDEX IF NOT EXISTS items_trade ON items (trade);
+-- unit, price and estimate ride along so the unit-price query reads only the index
+CREATE INDEX IF NOT EXISTS items_normalized ON items (normalized, unit, unit_price, estimate_id);
+"""
+
+# Canned queries: name -> (help, SQL). Money columns come back in cents;
+# ``--description`` fills :prefix with a normalized description prefix.
+WAREHOUSE_QUERIES = {
+    "trades": (
+        "RCV, depreciation and ACV by trade across every estimate",
+        "SELECT trade AS TRADE, COUNT(DISTINCT estimate_id) AS ESTIMATES, SUM(items) AS ITEMS,"
+        " SUM(rcv) AS RCV, SUM(deprec) AS \"DEPREC.\", SUM(acv) AS ACV"
+        " FROM estimate_trades GROUP BY trade ORDER BY SUM(rcv) DESC"),
+    "monthly": (
+        "RCV by trade per month (the PDF's creation date, else when it was ingested)",
+        "SELECT substr(COALESCE(e.created, e.ingested_at), 1, 7) AS MONTH, t.trade AS TRADE,"
+        " SUM(t.items) AS ITEMS, SUM(t.rcv) AS RCV"
+        " FROM estimate_trades t JOIN estimates e ON e.id = t.estimate_id"
+        " GROUP BY MONTH, TRADE ORDER BY MONTH, RCV DESC"),
+    "unit-price": (
+        "Unit price per carrier and unit for items whose description starts with --description",
+        "SELECT COALESCE(e.carrier, e.format, 'unknown') AS CARRIER, i.unit AS UNIT,"
+        " COUNT(*) AS ITEMS, CAST(ROUND(AVG(i.unit_price)) AS INTEGER) AS \"AVG PRICE\","
+        " MIN(i.unit_price) AS \"MIN PRICE\", MAX(i.unit_price) AS \"MAX PRICE\""
+        " FROM items i JOIN estimates e ON e.id = i.estimate_id"
+        " WHERE i.normalized >= :prefix AND i.normalized < :prefix || char(1114111)"
+        " GROUP BY CARRIER, UNIT ORDER BY CARRIER, UNIT"),
+    "estimates": (
+        "Every ingested estimate with its totals",
+        "SELECT e.id AS ID, e.path AS PDF, COALESCE(e.carrier, '') AS CARRIER,"
+        " COALESCE(e.format, '') AS FORMAT, substr(COALESCE(e.created, e.ingested_at), 1, 10) AS DATE,"
+        " e.items AS ITEMS, COALESCE(SUM(t.rcv), 0) AS RCV, COALESCE(SUM(t.acv), 0) AS ACV"
+        " FROM estimates e LEFT JOIN estimate_trades t ON t.estimate_id = e.id"
+        " GROUP BY e.id ORDER BY e.id"),
+}
+WAREHOUSE_MONEY_COLUMNS = {"RCV", "DEPREC.", "ACV", "AVG PRICE", "MIN PRICE", "MAX PRICE"}
+
+
+class Warehouse:
+    """
+    SQLite store of parsed estimates, for questions across many claims.
+
+    ``estimates`` has one row per ingested PDF, unique by content hash;
+    ``items`` one row per LineItem (money in integer cents, quantity as exact
+    decimal text), indexed on estimate, trade and normalized description;
+    ``estimate_trades`` the per-estimate trade sums, so trade and monthly
+    rollups read a few rows per estimate instead of every item.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_warehouse_path()
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(WAREHOUSE_SCHEMA)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def has(self, pdf_hash):
+        return self.conn.execute("SELECT 1 FROM estimates WHERE sha256 = ?", (pdf_hash,)).fetchone() is not None
+
+    def add(self, pdf_path, pdf_hash, items, stats, carrier=None, created=None):
+        """Insert one parsed estimate and its items in a single transaction; returns its id."""
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO estimates (sha256, path, carrier, format, created, ingested_at, parser,"
+                " pages, items, no_match) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (pdf_hash, os.path.abspath(pdf_path), carrier, stats.get("format"), created,
+                 datetime.datetime.now().isoformat(timespec="seconds"), parser_fingerprint(),
+                 stats.get("pages", 0), len(items), stats.get("no_match", 0)))
+            estimate_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((estimate_id, item.page, item.line_number, item.description,
+                  normalize_description(item.description), item.trade, str(item.quantity), item.unit,
+                  *item[5:11]) for item in items))
+            self.conn.execute(
+                "INSERT INTO estimate_trades SELECT estimate_id, trade, COUNT(*), SUM(rcv), SUM(deprec),"
+                " SUM(acv) FROM items WHERE estimate_id = ? GROUP BY trade", (estimate_id,))
+        return estimate_id
+
+    def query(self, name, description=""):
+        """Run a canned query from WAREHOUSE_QUERIES; returns (columns, rows)."""
+        cursor = self.conn.execute(WAREHOUSE_QUERIES[name][1],
+                                   {"prefix": normalize_description(description)})
+        return [column[0] for column in cursor.description], cursor.fetchall()
+
+
+def pdf_creation_date(source):
+    """The PDF's CreationDate metadata as YYYY-MM-DD, or None."""
+    with open_pdf(source) as pdf:
+        value = pdf.metadata.get("CreationDate")
+    if isinstance(value, bytes):
+        value = value.decode("latin-1")
+    match = re.match(r"(?:D:)?(\d{4})(\d{2})(\d{2})", value or "")
+    return "-".join(match.groups()) if match else None
+
+
+def _parse_for_ingest(pdf_path, cache=None, ocr=None, crop_tables=False):
+    """Ingest worker: parse one PDF; returns (items, stats, created date)."""
+    stats = {}
+    items = extract_xactimate_items(pdf_path, stats=stats, cache=cache, ocr=ocr,
+                                    crop_tables=crop_tables)[1:]
+    return items, stats, pdf_creation_date(pdf_path)
+
+
+def ingest_estimates(pdf_paths, warehouse, workers=None, cache=None, ocr=None, carrier=None,
+                     crop_tables=False):
+    """
+    Parse PDFs on a process pool and add them to ``warehouse``.
+
+    Files whose content hash is already in the warehouse (or that repeat an
+    earlier file in ``pdf_paths``) are skipped without being parsed. Workers
+    only parse; every insert happens here, one transaction per estimate, so
+    an interrupted run leaves no partial estimates behind. A PDF that fails
+    to parse (or kills its worker) is logged and counted, and the rest carry
+    on. Returns counts: ingested, skipped, failed, items.
+    """
+    counts = {"ingested": 0, "skipped": 0, "failed": 0, "items": 0}
+    pending = {}
+    seen = set()
+    for pdf_path in pdf_paths:
+        pdf_hash = file_sha256(pdf_path)
+        if pdf_hash in seen or warehouse.has(pdf_hash):
+            counts["skipped"] += 1
+        else:
+            pending[pdf_path] = pdf_hash
+        seen.add(pdf_hash)
+    if not pending:
+        return counts
+
+    jobs = [(pdf_path, (pdf_path, cache, ocr, crop_tables)) for pdf_path in pending]
+    for pdf_path, result, error in run_pool_jobs(_parse_for_ingest, jobs, workers):
+        if error is not None:
+            counts["failed"] += 1
+            logging.warning(f"Failed to parse {pdf_path}: {type(error).__name__}: {error}")
+            continue
+        items, stats, created = result
+        warehouse.add(pdf_path, pending[pdf_path], items, stats, carrier=carrier, created=created)
+        counts["ingested"] += 1
+        counts["items"] += len(items)
+        logging.info(f"[{counts['ingested'] + counts['failed']}/{len(pending)}] {pdf_path}: "
+                     f"{len(items)} items")
+    return counts
+
+
+def add_warehouse_argument(parser):
+    parser.add_argument("--db", default=None,
+                        help="Warehouse database (default: $XACTPARSE_DB or "
+                             "~/.local/share/xactparse/warehouse.sqlite)")
+
+
+def ingest_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="xactparse ingest",
+        description="Parse Xactimate PDFs into the SQLite line-item warehouse.")
+    parser.add_argument("sources", nargs="+", help="PDF files, directories or glob patterns (quoted)")
+    add_warehouse_argument(parser)
+    parser.add_argument("--carrier", default=None,
+                        help="Carrier name to record for these estimates (queries fall back to "
+                             "the detected layout)")
+    add_workers_argument(parser)
+    add_ocr_argument(parser)
+    add_crop_tables_argument(parser)
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+
+    pdf_paths = collect_sources(args.sources)
+    if not pdf_paths:
+        return 1
+    cache = cache_from_args(args)
+    ocr = pool_ocr_from_args(args, cache)
+    warehouse = Warehouse(args.db)
+    start = time.perf_counter()
+    counts = ingest_estimates(pdf_paths, warehouse, workers=args.workers, cache=cache, ocr=ocr,
+                              carrier=args.carrier, crop_tables=args.crop_tables)
+    warehouse.close()
+    logging.info(f"Ingested {counts['ingested']} estimates ({counts['items']} items), skipped "
+                 f"{counts['skipped']} already ingested, {counts['failed']} failed, "
+                 f"in {time.perf_counter() - start:.1f}s -> {warehouse.path}")
+    return 1 if counts["failed"] else 0
+
+
+def print_table(columns, rows, money_columns=()):
+    """Print query rows as right-aligned columns, cents shown as dollars."""
+    cells = [[f"{cents_to_float(value):,.2f}" if column in money_columns and value is not None
+              else str(value) for column, value in zip(columns, row)] for row in rows]
+    widths = [max(len(column), *(len(row[idx]) for row in cells)) for idx, column in enumerate(columns)]
+    print(" ".join(column.rjust(width) for column, width in zip(columns, widths)))
+    for row in cells:
+        print(" ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def query_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="xactparse query",
+        description="Run a canned aggregate query against the line-item warehouse.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="queries:\n" + "\n".join(f"  {name:<12}{help_text}"
+                                         for name, (help_text, _) in WAREHOUSE_QUERIES.items()))
+    parser.add_argument("query", choices=list(WAREHOUSE_QUERIES))
+    parser.add_argument("--description", default="",
+                        help='Description prefix for unit-price, e.g. "R&R Vinyl window"')
+    parser.add_argument("--json", action="store_true", help="Print rows as JSON (money in dollars)")
+    add_warehouse_argument(parser)
+    args = parser.parse_args(argv)
+
+    if args.query == "unit-price" and not args.description:
+        parser.error("unit-price needs --description")
+    path = args.db or default_warehouse_path()
+    if not os.path.exists(path):
+        parser.error(f"no warehouse at {path}; run xactparse ingest first")
+    warehouse = Warehouse(path)
+    start = time.perf_counter()
+    columns, rows = warehouse.query(args.query, args.description)
+    logging.info(f"{len(rows)} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+    warehouse.close()
+    if args.json:
+        print(json.dumps([{column: cents_to_float(value) if column in WAREHOUSE_MONEY_COLUMNS else value
+                           for column, value in zip(columns, row)} for row in rows], indent=2))
+    elif rows:
+        print_table(columns, rows, WAREHOUSE_MONEY_COLUMNS)
+    return 0
+
+
+class EstimateResult(collections.namedtuple("EstimateResult", [
+        "items", "trades", "summary", "stats", "excel", "elapsed_s"])):
+    """
+    Everything a caller needs from one parse, without anything printed.
+
+    ``items`` are the LineItems, ``trades`` one TOTALS_HEADERS dict per trade
+    and ``summary`` the GRAND TOTAL row (RCV, ACV, DEPREC., BUDGET, ...).
+    ``stats`` holds the parse counters and detected format. ``excel`` is the
+    workbook as bytes if it was asked for, else None.
+    """
+    __slots__ = ()
+
+
+def parse_estimate_sync(source, cache=None, ocr=None, excel=False):
+    """
+    Parse a PDF path or in-memory PDF bytes into an EstimateResult.
+
+    The blocking core of parse_estimate(); nothing is printed. With
+    ``excel`` the workbook is built in memory and returned as bytes.
+    """
+    start = time.perf_counter()
+    stats = {}
+    data = extract_xactimate_items(source, stats=stats, cache=cache, ocr=ocr)
+    totals = TradeTotals()
+    for item in data[1:]:
+        totals.add(item)
+    workbook = None
+    if excel and len(data) > 1:
+        buffer = io.BytesIO()
+        save_to_excel_with_budget(data, buffer, quiet=True)
+        workbook = buffer.getvalue()
+    return EstimateResult(data[1:], totals.trade_rows(), totals.grand_total(), stats, workbook,
+                          round(time.perf_counter() - start, 3))
+
+
+DEFAULT_ASYNC_CONCURRENCY = 4
+
+
+class AsyncEstimateParser:
+    """
+    Parse estimates from asyncio code without blocking the event loop.
+
+    Jobs run on ``executor`` (any concurrent.futures executor, thread or
+    process pool; by default a process pool of ``max_concurrency`` workers,
+    created on first use and shut down by close()). At most
+    ``max_concurrency`` jobs run at once per event loop; later ones wait
+    their turn. ``timeout`` (seconds) bounds how long a caller waits for one
+    job, queueing included; on expiry asyncio.TimeoutError is raised. A job
+    already running in a worker can't be interrupted, so it finishes in the
+    background and its result is dropped. Its concurrency slot is freed at
+    the timeout, though, so until it finishes it still occupies an executor
+    worker and the next job admitted may queue in the executor instead.
+    """
+
+    def __init__(self, executor=None, max_concurrency=DEFAULT_ASYNC_CONCURRENCY, timeout=None,
+                 cache=None, ocr=None):
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.cache = cache
+        self.ocr = ocr
+        self._own_executor = executor is None
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def parse(self, source, excel=False, timeout=None):
+        """
+        Parse a PDF path or bytes into an EstimateResult.
+
+        ``timeout`` overrides the parser's default for this call.
+        """
+        import asyncio
+
+        if isinstance(source, (bytearray, memoryview)):
+            source = bytes(source)
+        if self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=self.max_concurrency)
+        loop = asyncio.get_running_loop()
+
+        async def run():
+            async with self._semaphore():
+                return await loop.run_in_executor(
+                    self.executor, parse_estimate_sync, source, self.cache, self.ocr, excel)
+
+        return await asyncio.wait_for(run(), timeout if timeout is not None else self.timeout)
+
+    def close(self):
+        if self._own_executor and self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+
+_default_async_parser = None
+
+
+async def parse_estimate(path_or_bytes, excel=False, timeout=None):
+    """
+    Parse an estimate from asyncio code: ``await parse_estimate(pdf_bytes)``.
+
+    Uses a shared AsyncEstimateParser with the default settings (process pool,
+    DEFAULT_ASYNC_CONCURRENCY jobs at a time, parse cache on). Create your
+    own AsyncEstimateParser for a different executor, limit or timeout.
+    """
+    global _default_async_parser
+    if _default_async_parser is None:
+        _default_async_parser = AsyncEstimateParser(cache=ParseCache())
+    return await _default_async_parser.parse(path_or_bytes, excel=excel, timeout=timeout)
+
+
+DEFAULT_SERVER_QUEUE = 16
+
+
+SOCKET_HELP = ("Socket path (default: $XACTPARSE_SOCKET, else $XDG_RUNTIME_DIR/xactparse.sock, "
+               "else xactparse.sock in the cache directory)")
+
+
+def default_socket_path():
+    if os.environ.get("XACTPARSE_SOCKET"):
+        return os.environ["XACTPARSE_SOCKET"]
+    base = os.environ.get("XDG_RUNTIME_DIR") or default_cache_dir()
+    return os.path.join(base, "xactparse.sock")
+
+
+def run_parse_job(pdf_path, excel_path=None, cache=None, ocr=None):
+    """
+    Daemon worker: parse one PDF, optionally write its workbook, and return
+    the numbers the CLI prints (grand total and per-trade rows) as a dict.
+    """
+    stats = {}
+    data = extract_xactimate_items(pdf_path, stats=stats, cache=cache, ocr=ocr)
+    response = {"status": "ok", "pdf": pdf_path, "excel": excel_path, **stats}
+    if len(data) <= 1:
+        response["status"] = "empty"
+        return response
+    totals = TradeTotals()
+    for item in data[1:]:
+        totals.add(item)
+    if excel_path:
+        save_to_excel_with_budget(data, excel_path, quiet=True)
+    response["summary"] = totals.grand_total()
+    response["trades"] = totals.trade_rows()
+    return response
+
+
+class _ParseRequestHandler(socketserver.StreamRequestHandler):
+    """One JSON request line in, one JSON response line out."""
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            response = self.server.dispatch(request)
+        except Exception as e:
+            response = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+def _ignore_shutdown_signals():
+    """Pool initializer: leave SIGINT/SIGTERM handling to the serving process."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+
+class ParseServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Long-running parse daemon on a Unix socket.
+
+    Jobs run on a process pool of ``workers`` whose processes keep pdfplumber
+    and openpyxl imported between jobs. At most ``workers + queue_size`` jobs
+    are admitted at once; beyond that a request is answered with
+    {"status": "busy"} straight away so clients can back off or run locally.
+    A worker that dies breaks the pool; it is replaced, and the jobs that
+    were in flight are each rerun alone, so only the job that kills its
+    worker is answered {"status": "crashed"}.
+
+    The socket is created 0600 and connections from other users are refused
+    (where the OS reports peer credentials). Jobs must name absolute paths,
+    inside ``allowed_dirs`` when that is given.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, workers=None, queue_size=DEFAULT_SERVER_QUEUE, cache=None,
+                 allowed_dirs=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = self._new_pool(self.workers)
+        self.pool_lock = threading.Lock()
+        self.capacity = self.workers + queue_size
+        self.slots = threading.BoundedSemaphore(self.capacity)
+        self.cache = cache
+        self.allowed_dirs = [os.path.realpath(path) for path in allowed_dirs or []]
+        super().__init__(socket_path, _ParseRequestHandler)
+
+    @staticmethod
+    def _new_pool(workers):
+        from concurrent.futures import ProcessPoolExecutor
+
+        return ProcessPoolExecutor(max_workers=workers, initializer=_ignore_shutdown_signals)
+
+    def _replace_pool(self, broken):
+        with self.pool_lock:
+            if self.pool is broken:
+                logging.warning("A worker process died; starting a new pool")
+                broken.shutdown(wait=False)
+                self.pool = self._new_pool(self.workers)
+
+    def server_bind(self):
+        old_umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.server_address, 0o600)
+
+    def verify_request(self, request, client_address):
+        """Only serve the daemon's own user (and root)."""
+        if not hasattr(socket, "SO_PEERCRED"):
+            return True
+        credentials = request.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        _, uid, _ = struct.unpack("3i", credentials)
+        if uid not in (os.getuid(), 0):
+            logging.warning(f"Refused a connection from uid {uid}")
+            return False
+        return True
+
+    def check_paths(self, pdf_path, excel_path):
+        """Why a job's paths are refused, or None if they are acceptable."""
+        for name, path in (("pdf", pdf_path), ("excel", excel_path)):
+            if path is None and name == "excel":
+                continue
+            if not isinstance(path, str) or not os.path.isabs(path):
+                return f"{name} must be an absolute path"
+            real = os.path.realpath(path)
+            if self.allowed_dirs and not any(os.path.commonpath([real, allowed]) == allowed
+                                             for allowed in self.allowed_dirs):
+                return f"{path} is outside the directories this daemon serves"
+        if not os.path.isfile(pdf_path):
+            return f"Not a file: {pdf_path}"
+        if excel_path is not None:
+            if not excel_path.lower().endswith(".xlsx"):
+                return f"Not an .xlsx path: {excel_path}"
+            if os.path.lexists(excel_path) and not os.path.isfile(excel_path):
+                return f"Not a file: {excel_path}"
+            if not os.path.isdir(os.path.dirname(excel_path)):
+                return f"No such directory: {os.path.dirname(excel_path)}"
+        return None
+
+    def dispatch(self, request):
+        command = request.get("command", "parse")
+        if command == "ping":
+            return {"status": "ok", "pid": os.getpid(), "capacity": self.capacity}
+        if command != "parse":
+            return {"status": "error", "error": f"Unknown command: {command}"}
+        refused = self.check_paths(request.get("pdf"), request.get("excel"))
+        if refused:
+            return {"status": "error", "error": refused}
+        if not self.slots.acquire(blocking=False):
+            return {"status": "busy"}
+        try:
+            from concurrent.futures.process import BrokenProcessPool
+
+            ocr = OcrEngine(workers=1, cache=self.cache) if request.get("ocr") else None
+            cache = None if request.get("no_cache") else self.cache
+            job = (run_parse_job, request["pdf"], request.get("excel"), cache, ocr)
+            pool = self.pool
+            try:
+                return pool.submit(*job).result()
+            except BrokenProcessPool:
+                self._replace_pool(pool)
+            # Every job in flight sees the break; rerun this one on a pool of
+            # its own so only the job that kills a worker fails
+            with self._new_pool(1) as solo:
+                try:
+                    return solo.submit(*job).result()
+                except BrokenProcessPool as e:
+                    logging.warning(f"{request['pdf']} killed its worker process")
+                    return {"status": "crashed", "error": f"{type(e).__name__}: {e}"}
+        finally:
+            self.slots.release()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(cancel_futures=True)
+
+
+def send_request(request, socket_path=None, timeout=None):
+    """
+    Send one request to a running daemon and return its response dict, or
+    None if no daemon is listening on ``socket_path``.
+    """
+    socket_path = socket_path or default_socket_path()
+    if not os.path.exists(socket_path):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return None
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    return json.loads(line) if line else None
+
+
+def serve_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="xactparse serve",
+        description="Keep a warm parse daemon running on a Unix socket.")
+    parser.add_argument("--socket", default=None, help=SOCKET_HELP)
+    add_workers_argument(parser)
+    parser.add_argument("--queue", type=int, default=DEFAULT_SERVER_QUEUE,
+                        help="Jobs allowed to wait for a worker before clients get 'busy'")
+    parser.add_argument("--allow-dir", action="append", default=[], metavar="DIR",
+                        help="Only read PDFs from and write workbooks under DIR (repeatable; "
+                             "default: anywhere the daemon's user can)")
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+
+    socket_path = args.socket or default_socket_path()
+    if send_request({"command": "ping"}, socket_path) is not None:
+        logging.error(f"A daemon is already listening on {socket_path}")
+        return 1
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)  # Stale socket from a daemon that didn't shut down cleanly
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+    if os.stat(socket_dir).st_mode & 0o077:
+        logging.warning(f"{socket_dir} is open to other users; the socket itself is owner-only")
+
+    server = ParseServer(socket_path, workers=args.workers, queue_size=args.queue,
+                         cache=cache_from_args(args), allowed_dirs=args.allow_dir)
+    logging.info(f"Serving on {socket_path} ({server.workers} workers, "
+                 f"{server.capacity} job slots)")
+    # Shut down cleanly (and remove the socket) on SIGTERM as well as Ctrl-C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+    return 0
+
+
+def client_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="xactparse client",
+        description="Parse via a running 'xactparse serve' daemon, or locally if none is running.")
+    parser.add_argument("pdf_file", help="Path to the input PDF file")
+    parser.add_argument("excel_file", nargs="?", help="Path to the output Excel file (optional)")
+    parser.add_argument("--socket", default=None, help=SOCKET_HELP)
+    parser.add_argument("--json", action="store_true", help="Print the raw JSON response")
+    add_ocr_argument(parser)
+    parser.add_argument("--no-cache", action="store_true", help="Don't use the parse cache")
+    args = parser.parse_args(argv)
+
+    request = {
+        "command": "parse",
+        "pdf": os.path.abspath(args.pdf_file),
+        "excel": os.path.abspath(args.excel_file) if args.excel_file else None,
+        "ocr": args.ocr,
+        "no_cache": args.no_cache,
+    }
+    response = send_request(request, args.socket)
+    if response is None or response["status"] in ("busy", "crashed"):
+        logging.info("No daemon available; parsing locally")
+        cache = None if args.no_cache else ParseCache()
+        ocr = OcrEngine(cache=cache) if args.ocr else None
+        response = run_parse_job(request["pdf"], request["excel"], cache, ocr)
+
+    if args.json:
+        print(json.dumps(response, indent=2))
+    elif response["status"] == "ok":
+        print_contractor_summary(response["summary"], response["trades"])
+    elif response["status"] == "empty":
+        logging.warning("No line items extracted.")
+    else:
+        logging.error(response.get("error", response["status"]))
+    return 0 if response["status"] in ("ok", "empty") else 1
+
+
+def add_cache_arguments(parser):
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Don't read or write the parse cache")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Empty the parse cache before running")
+
+
+def add_workers_argument(parser):
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: number of CPUs)")
+
+
+def add_ocr_argument(parser):
+    parser.add_argument("--ocr", action="store_true",
+                        help="OCR pages without a text layer (needs tesseract)")
+
+
+def add_crop_tables_argument(parser):
+    parser.add_argument("--crop-tables", action="store_true",
+                        help="Extract only the line-item table on each page, skipping pages "
+                             "without a column header (cover, photo and summary pages)")
+
+
+def cache_from_args(args):
+    """Build the ParseCache for a command (None with --no-cache), clearing it if asked."""
+    if args.clear_cache:
+        ParseCache().clear()
+        logging.info("Cleared parse cache")
+    if args.no_cache:
+        return None
+    return ParseCache()
+
+
+def pool_ocr_from_args(args, cache):
+    """
+    The OcrEngine for a command that spreads files over a worker pool (None
+    without --ocr). Files are already spread over the pool, so each worker
+    OCRs its pages inline.
+    """
+    return OcrEngine(workers=1, cache=cache) if args.ocr else None
+
+
+def main():
+    # Configured here rather than on import, so applications that import
+    # xactparse keep their own logging setup
+    logging.basicConfig(level=logging.INFO)
+    commands = {"batch": batch_main, "summary": summary_main, "diff": diff_main,
+                "triage": triage_main, "consolidate": consolidate_main,
+                "ingest": ingest_main, "query": query_main,
+                "serve": serve_main, "client": client_main}
+    if len(sys.argv) > 1 and sys.argv[1] in commands:
+        sys.exit(commands[sys.argv[1]](sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(
+        description="Extract Xactimate line items from PDF to Excel by trade with totals.")
+    parser.add_argument("pdf_file", nargs="?", help="Path to the input PDF file")
+    parser.add_argument("excel_file", nargs="?",
+                        help="Path to the output Excel file (or --format file)")
+    parser.add_argument("--update", metavar="WORKBOOK",
+                        help="Refresh WORKBOOK, made from an earlier version of this estimate, in place: "
+                             "only sheets whose items changed are rewritten and columns you added are kept")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="xlsx",
+                        help="Output format: xlsx (default), xlsx-stream (constant memory), "
+                             "or csv/jsonl/parquet with a .totals companion file")
+    parser.add_argument("--page-workers", type=int, default=None,
+                        help="Extract page text on N processes (for large PDFs)")
+    add_ocr_argument(parser)
+    parser.add_argument("--ocr-workers", type=int, default=None,
+                        help="Processes for OCR (default: number of CPUs)")
+    add_crop_tables_argument(parser)
+    parser.add_argument("--metrics-json", metavar="FILE",
+                        help="Write stage timings, pattern hits and per-page stats as JSON")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="Write a cProfile dump of the run (view with python -m pstats FILE)")
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+
+    cache = cache_from_args(args)
+    if args.pdf_file is None and args.clear_cache:
+        return
+    if args.update is not None:
+        if args.excel_file is not None:
+            parser.error("give either excel_file or --update, not both")
+        if args.format != "xlsx":
+            parser.error("--update only works with the xlsx format")
+    if args.pdf_file is None or (args.excel_file or args.update) is None:
+        parser.error("pdf_file and excel_file are required")
+    if args.format == "parquet":
+        try:
+            _pyarrow()
+        except ImportError as e:
+            parser.error(str(e))
+
+    metrics = ParseMetrics() if args.metrics_json else None
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+
+    logging.info(f"Extracting line items from {args.pdf_file} ...")
+    ocr = OcrEngine(workers=args.ocr_workers, cache=cache) if args.ocr else None
+    if args.format == "xlsx":
+        data = extract_xactimate_items(args.pdf_file, workers=args.page_workers, cache=cache,
+                                       metrics=metrics, ocr=ocr, crop_tables=args.crop_tables)
+        if len(data) <= 1:
+            logging.warning("No line items extracted.")
+        elif args.update is not None and os.path.exists(args.update):
+            try:
+                update_excel_workbook(data, args.update, metrics=metrics)
+            except ValueError as e:
+                logging.error(str(e))
+                sys.exit(1)
+        else:
+            save_to_excel_with_budget(data, args.excel_file or args.update, metrics=metrics)
+    else:
+        items = iter_estimate_items(args.pdf_file, workers=args.page_workers, cache=cache,
+                                    metrics=metrics, ocr=ocr, crop_tables=args.crop_tables)
+        first = next(items, None)
+        if first is None:
+            logging.warning("No line items extracted.")
+        else:
+            write_estimate(itertools.chain([first], items), args.excel_file, args.format,
+                           metrics=metrics)
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        logging.info(f"Wrote profile to {args.profile}")
+    if metrics is not None:
+        metrics.write_json(args.metrics_json)
+        logging.info(f"Wrote metrics to {args.metrics_json}")
 
 
 if __name__ == "__main__":